@@ -1,81 +1,119 @@
 import streamlit as st
 
-import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from io import StringIO
+from hub_utils.charts import bar_spec, box_spec, counts_table, pie_spec
+from hub_utils.compaction import show_memory_report
+from hub_utils.datastore import dataset_key, load_csv
+from hub_utils.histogram import histogram_spec, sort_column
+from hub_utils.ingest import open_spilled, out_of_core_toggle
+from hub_utils.preview import paginated_dataframe
+from hub_utils.profile import TOP_K, frame_profile, spilled_profile
+from hub_utils.shards import upload_dataset
+from hub_utils.summary import partitions, sorted_mode, summarize_chunks
+from hub_utils.tracing import span
+
+# Every numerical statistic and the box plot come from one cached pass per column
+@st.cache_data(max_entries=64, show_spinner=False)
+def numerical_summary(data_key, column, _chunks):
+    return summarize_chunks(_chunks)
+
+
+# Sorted once per column and shared, so any bin count is a searchsorted away
+@st.cache_resource(max_entries=8, show_spinner="Sorting column...")
+def sorted_column(data_key, column, _data):
+    return sort_column(_data)
+
+
+# The slider reruns only this fragment, not the summary and box plot below it
+@st.fragment
+def numerical_histogram(column, sorted_values):
+    bins = st.slider("Select number of bins for the histogram:", min_value=5, max_value=50, value=10)
+    if not len(sorted_values):
+        st.info(f"Column '{column}' has no numerical values to plot.")
+        return
+    with span("emit"):
+        st.vega_lite_chart(sorted_values.table(bins), histogram_spec(column))
+
 
 # Set up the app
 st.title("Basic Stats App")
 st.write("Upload your dataset and perform basic statistical analysis.")
 
 # File uploader
-uploaded_file = st.file_uploader("Upload your dataset (CSV format)", type=["csv"])
+uploaded_file = upload_dataset()
 
 if uploaded_file:
     # Read the uploaded file into a DataFrame
     try:
-        df = pd.read_csv(uploaded_file)
-        st.write("Here's a preview of your dataset:")
-        st.dataframe(df)
+        large_mode = out_of_core_toggle(uploaded_file)
+        if large_mode:
+            dataset = open_spilled(uploaded_file)
+            st.write(f"Here's a preview of the first rows ({dataset.n_rows:,} rows in total):")
+            st.dataframe(dataset.head())
+            profile = spilled_profile(dataset_key(uploaded_file), dataset)
+        else:
+            df = load_csv(uploaded_file)
+            st.write("Here's a preview of your dataset:")
+            paginated_dataframe(df, key="stats_preview", signature=dataset_key(uploaded_file))
+            show_memory_report(dataset_key(uploaded_file))
+            profile = frame_profile(dataset_key(uploaded_file), df)
 
         # Allow the user to select a column
-        column = st.selectbox("Select a column to analyze:", df.columns)
+        column = st.selectbox("Select a column to analyze:", profile.columns)
 
-        # Check the column type
-        if df[column].dtype == "object":
+        # Check the column type (text may be stored as object, str or category)
+        if profile.kinds[column] not in ("numeric", "bool"):
             st.write(f"Column '{column}' is categorical.")
-            
+
+            # Counted once per dataset and column, in the shared profile
+            stats = profile.stats(column)
+            counts = stats.top
+            table = counts_table(counts)
+            if not stats.is_complete:
+                st.caption(f"The charts and counts show the {TOP_K:,} most frequent of {stats.n_unique:,} values.")
+
             # Categorical Histogram
             st.write("### Categorical Histogram")
-            fig, ax = plt.subplots()
-            df[column].value_counts().plot(kind="bar", ax=ax)
-            ax.set_title(f"Histogram of {column}")
-            ax.set_xlabel(column)
-            ax.set_ylabel("Count")
-            st.pyplot(fig)
+            # The counts are sent as they are and the browser draws the chart
+            with span("emit"):
+                st.vega_lite_chart(table, bar_spec(column, f"Histogram of {column}"))
 
             # Pie chart
             st.write("### Pie Chart")
-            fig, ax = plt.subplots()
-            df[column].value_counts().plot(kind="pie", autopct='%1.1f%%', ax=ax)
-            ax.set_ylabel("")
-            ax.set_title(f"Pie Chart of {column}")
-            st.pyplot(fig)
+            with span("emit"):
+                st.vega_lite_chart(table, pie_spec(column, f"Pie Chart of {column}"))
 
             # Categorical Summary
             st.write("### Summary Statistics for Categorical Data")
-            st.write(df[column].value_counts())
+            st.write(counts)
 
         else:
             st.write(f"Column '{column}' is numerical.")
 
+            # Everything below only needs the selected column
+            data = dataset.read([column])[column] if large_mode else df[column]
+
             # Numerical Histogram
             st.write("### Numerical Histogram")
-            bins = st.slider("Select number of bins for the histogram:", min_value=5, max_value=50, value=10)
-            fig, ax = plt.subplots()
-            df[column].plot(kind="hist", bins=bins, ax=ax)
-            ax.set_title(f"Histogram of {column}")
-            ax.set_xlabel(column)
-            ax.set_ylabel("Frequency")
-            st.pyplot(fig)
-
-            # Summary Statistics
+            sorted_values = sorted_column(dataset_key(uploaded_file), column, data)
+            numerical_histogram(column, sorted_values)
+
+            # Summary Statistics (one pass over the column, streamed from disk in large file mode)
+            chunks = (chunk[column] for chunk in dataset.iter_chunks([column])) if large_mode else partitions(data)
+            summary = numerical_summary(dataset_key(uploaded_file), column, chunks)
             st.write("### Summary Statistics for Numerical Data")
-            st.write(f"Mean: {df[column].mean():.2f}")
-            st.write(f"Median: {df[column].median():.2f}")
-            st.write(f"Mode: {df[column].mode()[0]:.2f}")
-            st.write(f"Standard Deviation: {df[column].std():.2f}")
-            st.write(f"Minimum: {df[column].min():.2f}")
-            st.write(f"Maximum: {df[column].max():.2f}")
-
-            # Box Plot
+            st.write(f"Mean: {summary.mean:.2f}")
+            st.write(f"Median: {summary.median:.2f}")
+            # The one-pass mode is approximate on columns with many distinct values
+            mode = summary.mode if summary.mode_is_exact else sorted_mode(sorted_values.values)
+            st.write(f"Mode: {mode:.2f}")
+            st.write(f"Standard Deviation: {summary.std:.2f}")
+            st.write(f"Minimum: {summary.min:.2f}")
+            st.write(f"Maximum: {summary.max:.2f}")
+
+            # Box Plot (drawn from the summary's quartiles instead of the raw column)
             st.write("### Box Plot")
-            fig, ax = plt.subplots()
-            sns.boxplot(y=df[column], ax=ax)
-            ax.set_title(f"Box Plot of {column}")
-            st.pyplot(fig)
+            with span("emit"):
+                st.vega_lite_chart(None, box_spec([summary.box_stats(column)], column, f"Box Plot of {column}"))
 
     except Exception as e:
         st.error(f"Error loading file: {e}")
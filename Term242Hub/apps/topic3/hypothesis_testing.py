@@ -1,73 +1,179 @@
 
 import streamlit as st
-import pandas as pd
-from scipy.stats import shapiro, ttest_ind, mannwhitneyu
+from scipy.stats import ttest_ind, mannwhitneyu
+
+from hub_utils.compaction import show_memory_report
+from hub_utils.datastore import dataset_key, load_csv
+from hub_utils.ingest import open_spilled, out_of_core_toggle
+from hub_utils.jobs import background_result
+from hub_utils.normality import SHAPIRO_MAX_N, test_columns
+from hub_utils.pairwise import CORRECTIONS, adjust_matrix, all_pairs_tests, pairs_table
+from hub_utils.pools import make_pool
+from hub_utils.preview import paginated_dataframe
+from hub_utils.profile import frame_profile, spilled_profile
+from hub_utils.resampling import RESAMPLING_WORKERS, bootstrap_ci, permutation_test
+from hub_utils.shards import upload_dataset
+
+
+# Cached per dataset and column set
+@st.cache_data(max_entries=32, show_spinner="Testing for normality...")
+def normality_tests(data_key, columns, _load_columns):
+    return test_columns(_load_columns(columns), columns)
+
+
+# One worker pool per server process for the resampling tests
+@st.cache_resource
+def get_resampling_pool():
+    return make_pool("resampling", RESAMPLING_WORKERS)
+
 
 # Title
 st.title("Hypothesis Testing App")
 st.write("Upload your dataset and perform hypothesis tests.")
 
 # File uploader
-uploaded_file = st.file_uploader("Upload your dataset (CSV format)", type=["csv"])
+uploaded_file = upload_dataset()
 
 if uploaded_file:
     # Read the uploaded file into a DataFrame
     try:
-        df = pd.read_csv(uploaded_file)
-        st.write("Here's a preview of your dataset:")
-        st.dataframe(df)
+        large_mode = out_of_core_toggle(uploaded_file)
+        if large_mode:
+            dataset = open_spilled(uploaded_file)
+            st.write(f"Here's a preview of the first rows ({dataset.n_rows:,} rows in total):")
+            st.dataframe(dataset.head())
+
+            profile = spilled_profile(dataset_key(uploaded_file), dataset)
+        else:
+            df = load_csv(uploaded_file)
+            st.write("Here's a preview of your dataset:")
+            paginated_dataframe(df, key="hypothesis_preview", signature=dataset_key(uploaded_file))
+            show_memory_report(dataset_key(uploaded_file))
+
+            profile = frame_profile(dataset_key(uploaded_file), df)
 
         # Extract numerical columns
-        numerical_columns = df.select_dtypes(include=['number']).columns
+        numerical_columns = profile.numeric_columns()
+
+        def load_columns(columns):
+            # In large file mode only the requested columns are read from disk
+            return dataset.read(columns) if large_mode else df[list(columns)]
 
         if len(numerical_columns) < 2:
             st.error("The dataset must contain at least two numerical columns for hypothesis testing.")
         else:
             # Ask user to select columns for normality testing
-            st.subheader("Shapiro-Wilk Test for Normality")
+            st.subheader("Tests for Normality")
+            st.write(
+                f"Shapiro-Wilk runs on a random sample of {SHAPIRO_MAX_N:,} values for longer columns; "
+                "D'Agostino-Pearson, Jarque-Bera and Anderson-Darling use every value."
+            )
             selected_columns = st.multiselect(
                 "Select columns to test for normality:", numerical_columns
             )
 
             if selected_columns:
-                normality_results = {}
-                for col in selected_columns:
-                    stat, p_value = shapiro(df[col])
-                    normality_results[col] = {
-                        "Test Statistic": stat,
-                        "P-value": p_value,
-                        "Conclusion": "Data is not Normal" if p_value > 0.05 else "Data is Normal",
-                    }
+                normality_results = normality_tests(dataset_key(uploaded_file), tuple(selected_columns), load_columns)
 
                 st.write("### Normality Test Results")
-                st.dataframe(pd.DataFrame.from_dict(normality_results, orient='index'))
+                st.dataframe(normality_results)
 
             # Ask user to select two columns for difference in means testing
             st.subheader("Difference in Means Tests")
-            col1 = st.selectbox("Select the first column:", numerical_columns)
-            col2 = st.selectbox("Select the second column:", numerical_columns)
-
-            if col1 and col2 and col1 != col2:
-                st.write(f"Selected columns: {col1} and {col2}")
-
-                # Test 1: Student's t-test
-                st.write("### Student's t-test")
-                variances_known = st.checkbox("Assume equal variances (default: unchecked)")
-                t_stat, t_p_value = ttest_ind(df[col1], df[col2], equal_var=variances_known)
-                t_conclusion = "Fail to Reject Null Hypothesis => The two population means are not significantly different" if t_p_value > 0.05 else "Reject Null Hypothesis => The two population means are significantly different"
-
-                st.write(f"T-test Statistic: {t_stat:.4f}")
-                st.write(f"P-value: {t_p_value:.4f}")
-                st.write(f"Conclusion: {t_conclusion}")
-
-                # Test 2: Mann-Whitney U Test
-                st.write("### Mann-Whitney U Test")
-                u_stat, u_p_value = mannwhitneyu(df[col1], df[col2])
-                u_conclusion = "Fail to Reject Null Hypothesis => The two population means are not significantly different" if u_p_value > 0.05 else "Reject Null Hypothesis => The two population means are significantly different"
-
-                st.write(f"U-test Statistic: {u_stat:.4f}")
-                st.write(f"P-value: {u_p_value:.4f}")
-                st.write(f"Conclusion: {u_conclusion}")
+            comparison_mode = st.radio("Comparison mode:", ["Single pair", "All pairs"], horizontal=True)
+
+            if comparison_mode == "Single pair":
+                col1 = st.selectbox("Select the first column:", numerical_columns)
+                col2 = st.selectbox("Select the second column:", numerical_columns)
+
+                if col1 and col2 and col1 != col2:
+                    st.write(f"Selected columns: {col1} and {col2}")
+                    # float64, so compacted float32 columns are summed at full precision
+                    pair_data = load_columns([col1, col2]).astype(float)
+
+                    # Test 1: Student's t-test
+                    st.write("### Student's t-test")
+                    variances_known = st.checkbox("Assume equal variances (default: unchecked)")
+                    t_stat, t_p_value = ttest_ind(pair_data[col1], pair_data[col2], equal_var=variances_known)
+                    t_conclusion = "Fail to Reject Null Hypothesis => The two population means are not significantly different" if t_p_value > 0.05 else "Reject Null Hypothesis => The two population means are significantly different"
+
+                    st.write(f"T-test Statistic: {t_stat:.4f}")
+                    st.write(f"P-value: {t_p_value:.4f}")
+                    st.write(f"Conclusion: {t_conclusion}")
+
+                    # Test 2: Mann-Whitney U Test
+                    st.write("### Mann-Whitney U Test")
+                    u_stat, u_p_value = mannwhitneyu(pair_data[col1], pair_data[col2])
+                    u_conclusion = "Fail to Reject Null Hypothesis => The two population means are not significantly different" if u_p_value > 0.05 else "Reject Null Hypothesis => The two population means are significantly different"
+
+                    st.write(f"U-test Statistic: {u_stat:.4f}")
+                    st.write(f"P-value: {u_p_value:.4f}")
+                    st.write(f"Conclusion: {u_conclusion}")
+
+                    # Test 3: Permutation test and bootstrap confidence interval
+                    st.write("### Permutation Test and Bootstrap Confidence Interval")
+                    st.write("Resampling tests make no assumption about the shape of the two distributions.")
+                    n_resamples = st.select_slider(
+                        "Number of resamples:", options=[1000, 2000, 5000, 10000, 20000, 50000], value=5000
+                    )
+                    seed = st.number_input("Random seed:", min_value=0, value=0, step=1)
+                    results = st.session_state.setdefault("resampling_results", {})
+                    results_key = (dataset_key(uploaded_file), col1, col2, n_resamples, seed)
+
+                    if st.button("Run resampling tests"):
+                        x, y = pair_data[col1].dropna(), pair_data[col2].dropna()
+                        progress_bar = st.progress(0.0, text="Permutation test...")
+                        perm = permutation_test(
+                            x, y, n_resamples, seed, pool=get_resampling_pool(),
+                            progress=lambda done, total, p: progress_bar.progress(
+                                done / total, text=f"Permutation test: {done:,} resamples, p-value so far {p:.4f}"
+                            ),
+                        )
+                        boot = bootstrap_ci(
+                            x, y, n_resamples, seed=seed, pool=get_resampling_pool(),
+                            progress=lambda done, total, _: progress_bar.progress(
+                                done / total, text=f"Bootstrap: {done:,} of {total:,} resamples"
+                            ),
+                        )
+                        progress_bar.empty()
+                        results[results_key] = (perm, boot)
+
+                    if results_key in results:
+                        perm, boot = results[results_key]
+                        perm_conclusion = "Fail to Reject Null Hypothesis => The two population means are not significantly different" if perm.p_value > 0.05 else "Reject Null Hypothesis => The two population means are significantly different"
+                        stop_note = " (stopped early, the estimate had converged)" if perm.stopped_early else ""
+                        st.write(f"Observed Difference in Means: {perm.observed:.4f}")
+                        st.write(f"Permutation P-value: {perm.p_value:.4f} from {perm.n_resamples:,} resamples{stop_note}")
+                        st.write(f"Conclusion: {perm_conclusion}")
+                        st.write(f"95% Bootstrap Confidence Interval for the Difference: [{boot.low:.4f}, {boot.high:.4f}]")
+            else:
+                # Every pair at once, from statistics computed once per column
+                pair_columns = st.multiselect(
+                    "Select columns to compare:", numerical_columns, default=list(numerical_columns)
+                )
+                equal_var = st.checkbox("Assume equal variances (default: unchecked)", key="all_pairs_equal_var")
+                correction = st.selectbox("Multiple-comparison correction:", CORRECTIONS)
+
+                if len(pair_columns) < 2:
+                    st.info("Select at least two columns to compare.")
+                else:
+                    def show_t_tests(partial):
+                        st.write(f"### Student's t-test: {correction}-adjusted P-values")
+                        st.dataframe(adjust_matrix(partial[1], correction))
+
+                    # Runs in the background, keyed by its inputs, so changing the correction is instant
+                    results = background_result(
+                        "all_pairs", ("all_pairs", dataset_key(uploaded_file), tuple(pair_columns), equal_var),
+                        all_pairs_tests, load_columns, tuple(pair_columns), equal_var,
+                        label="Testing every pair of columns...", render_partial=show_t_tests,
+                    )
+                    if results is not None:
+                        t_stat, t_p, u_stat, u_p = results
+                        show_t_tests(results)
+                        st.write(f"### Mann-Whitney U Test: {correction}-adjusted P-values")
+                        st.dataframe(adjust_matrix(u_p, correction))
+                        st.write("### All Pairs")
+                        st.dataframe(pairs_table(t_stat, t_p, u_stat, u_p, correction))
 
     except Exception as e:
         st.error(f"Error loading file: {e}")
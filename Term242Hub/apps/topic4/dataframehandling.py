@@ -1,21 +1,33 @@
 import streamlit as st
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
 
-# Set up the Streamlit app
-st.title("DataFrame Handling & Visualization App")
-st.write("Upload a dataset to explore, slice, and visualize your data.")
+from hub_utils.backends import backend_selector, get_backend
+from hub_utils.charts import plot_chart
+from hub_utils.compaction import show_memory_report
+from hub_utils.datastore import dataset_key, load_csv
+from hub_utils.export import export_controls, frame_batches, spilled_batches
+from hub_utils.filters import OPERATORS, Condition, build_tree, get_engine
+from hub_utils.fragments import publish_signature
+from hub_utils.ingest import load_columns, open_spilled, out_of_core_toggle
+from hub_utils.jobs import background_result
+from hub_utils.preview import paginated_dataframe
+from hub_utils.profile import TOP_K, frame_profile
+from hub_utils.render import PLOT_TYPES, PlotSpec, render_plots, submit_plots
+from hub_utils.shards import upload_dataset
+from hub_utils.tracing import span
 
-# Step 1: File Upload
-uploaded_file = st.file_uploader("Upload your dataset (CSV format)", type=["csv"])
+# The page is split into fragments: a widget in the filter block, the
+# summaries or one plot reruns only that section. Changing the slice reruns
+# the whole page, since the summaries and plots depend on it.
 
-if uploaded_file:
-    df = pd.read_csv(uploaded_file)
-    st.write("### Full Dataset Preview:")
-    st.dataframe(df)
 
-    # Step 2: Data Slicing Interface
+# Aggregated once per data, slice and plot; only the small table is sent to the browser
+@st.cache_data(max_entries=64, show_spinner=False)
+def native_chart(cache_key, _data, _spec):
+    return plot_chart(_data, _spec)
+
+
+@st.fragment
+def filter_section(df, data_signature, profile, backend, dataset=None):
     st.subheader("Data Slicing")
 
     # Select columns to display
@@ -23,103 +35,227 @@ if uploaded_file:
 
     # User-friendly filtering interface
     st.write("### Apply Filters")
-    
-    filters = []
+
+    engine = get_engine(data_signature, df)
+    conditions = []
     num_filters = st.number_input("Number of conditions:", min_value=0, max_value=5, value=0, step=1)
 
     logic_operators = ["AND"] * (num_filters - 1)  # Default to AND between conditions
 
     for i in range(num_filters):
         col = st.selectbox(f"Select column {i+1}:", df.columns, key=f"col_{i}")
-        condition = st.selectbox(f"Select condition for {col}:", ["=", "!=", ">", "<", ">=", "<="], key=f"cond_{i}")
-        
+        condition = st.selectbox(f"Select condition for {col}:", OPERATORS, key=f"cond_{i}")
+
         if condition == "=":
-            unique_values = df[col].dropna().unique().tolist()
-            value = st.multiselect(f"Select value(s) for {col}:", unique_values, key=f"val_{i}")
-            value_str = " | ".join([f'`{col}` == {v}' if isinstance(v, (int, float)) else f'`{col}` == "{v}"' for v in value]) if value else ""
+            # Columns with too many distinct values offer the most frequent ones and accept typed-in values
+            stats = profile.stats(col)
+            value = st.multiselect(f"Select value(s) for {col}:", stats.options(), key=f"val_{i}",
+                                   accept_new_options=stats.values is None)
+            conditions.append(Condition(col, condition, tuple(value)) if value else None)
         else:
             value = st.text_input(f"Enter value for {col}:", key=f"val_{i}")
-            value_str = f'`{col}` {condition} "{value}"' if value else ""
-        
-        filters.append(value_str)
+            conditions.append(Condition(col, condition, value) if value else None)
 
         if i < num_filters - 1:
             logic_operators[i] = st.selectbox(f"Select logical operator after condition {i+1}:", ["AND", "OR"], key=f"logic_{i}")
-    
+
     filtered_df = df[selected_columns]  # Default is all selected columns
-    
-    if filters:
-        non_empty_filters = [f for f in filters if f]
-        query_string = f' {logic_operators[0]} '.join(non_empty_filters) if logic_operators and non_empty_filters else " ".join(non_empty_filters)
-        
-        try:
-            if query_string:
-                filtered_df = df.query(query_string)[selected_columns]
-        except Exception as e:
-            st.error(f"Invalid condition: {e}")
+    filter_signature = (tuple(selected_columns),)  # Identifies the slice in the plot cache
+    tree = build_tree([], [])  # No conditions
+
+    try:
+        # Typed-in values are converted to the column's type before filtering
+        conditions = [engine.parse_condition(c) if c else c for c in conditions]
+        candidate = build_tree(conditions, logic_operators)
+        if candidate[1]:
+            filtered_df = backend.select(candidate, selected_columns)
+            filter_signature += (tuple(conditions), tuple(logic_operators))
+            tree = candidate
+    except Exception as e:
+        st.error(f"Invalid condition: {e}")
+
+    # Half-typed conditions leave the slice unchanged and rerun only this section
+    publish_signature("slice", (data_signature, filter_signature))
 
     st.write("### Sliced DataFrame Preview:")
-    st.dataframe(filtered_df)
+    paginated_dataframe(filtered_df, key="sliced_preview", signature=(data_signature, filter_signature))
 
-    # Step 3: Statistical Summaries
+    # The export is written on click; in large file mode it streams from the spilled file
+    if dataset is None:
+        make_batches = lambda: frame_batches(filtered_df)
+    else:
+        make_batches = lambda: spilled_batches(dataset, selected_columns, backend.positions(tree))
+    export_controls(make_batches, key="slice_export")
+    return filtered_df, filter_signature, tree
+
+
+@st.fragment
+def summaries_section(filtered_df, profile, backend, tree, data_signature, filter_signature):
     st.subheader("Statistical Summaries")
 
-    categorical_cols = filtered_df.select_dtypes(include=["object"]).columns
-    numerical_cols = filtered_df.select_dtypes(include=["number"]).columns
+    categorical_cols = [col for col in filtered_df.columns if profile.kinds[col] == "text"]
+    numerical_cols = [col for col in filtered_df.columns if profile.kinds[col] == "numeric"]
 
     if len(numerical_cols) > 0:
         st.write("### Numerical Column Summary:")
-        st.write(filtered_df[numerical_cols].describe())
+        # Summarized in the background; the rest of the page renders meanwhile
+        summary = background_result(
+            "numeric_summary", ("describe", backend.name, data_signature, filter_signature, tuple(numerical_cols)),
+            backend.describe, tree, tuple(numerical_cols),
+            label="Summarizing numerical columns...", render_partial=st.write,
+        )
+        if summary is not None:
+            st.write(summary)
 
     if len(categorical_cols) > 0:
         st.write("### Categorical Column Summary:")
         for col in categorical_cols:
             st.write(f"**{col} Value Counts:**")
-            st.write(filtered_df[col].value_counts())
+            if tree[1]:
+                counts = backend.value_counts(tree, col)
+                n_unique = len(counts)
+            else:
+                # The whole column was counted once, in the profile
+                stats = profile.stats(col)
+                counts, n_unique = stats.top, stats.n_unique
+            st.write(counts.head(TOP_K))
+            if n_unique > TOP_K:
+                st.caption(f"The {TOP_K:,} most frequent of {n_unique:,} values.")
+
+
+def plot_request(df, filtered_df, data_signature, filter_signature, data_choice, plot_type, x_col, y_col, hue_col):
+    """(cache_key, data, spec) of a plot from its widget values."""
+    plot_data = df if data_choice == "Full Data" else filtered_df
+    spec = PlotSpec(plot_type, x_col, y_col, hue_col if hue_col != "None" else None)
+    cache_key = (data_signature, None if data_choice == "Full Data" else filter_signature, spec)
+    return cache_key, plot_data, spec
+
+
+def prefetch_plots(count, df, filtered_df, data_signature, filter_signature):
+    """Submit the PNG plots the fragments below will ask for, from their widgets' last values.
+
+    The renders run side by side in the worker pool while the page goes on;
+    each fragment then only waits for its own plot.
+    """
+    state = st.session_state
+    requests = []
+    for i in range(count):
+        if f"plot_type_{i}" not in state:
+            # Not drawn yet: its widgets have no values
+            continue
+        plot_type = state[f"plot_type_{i}"]
+        y_col = state.get(f"y_col_{i}") if plot_type in ("Scatterplot", "Lineplot") else None
+        cache_key, plot_data, spec = plot_request(
+            df, filtered_df, data_signature, filter_signature, state.get(f"data_choice_{i}", "Full Data"),
+            plot_type, state.get(f"x_col_{i}"), y_col, state.get(f"hue_col_{i}", "None"))
+        if any(col is not None and col not in plot_data.columns for col in spec[1:]):
+            continue
+        try:
+            if native_chart(cache_key, plot_data, spec) is not None:
+                continue
+        except Exception:
+            # The fragment shows the error
+            continue
+        requests.append((cache_key, plot_data, spec))
+    submit_plots(requests)
+
+
+@st.fragment
+def plot_section(i, df, filtered_df, data_signature, filter_signature):
+    st.write(f"### Plot {i+1}")
+
+    data_choice = st.radio(f"Choose dataset for Plot {i+1}:", ["Full Data", "Sliced Data"], key=f"data_choice_{i}")
+    plot_data = df if data_choice == "Full Data" else filtered_df
+
+    plot_type = st.selectbox(f"Select plot type for Plot {i+1}:",
+                             PLOT_TYPES,
+                             key=f"plot_type_{i}")
+    y_col = None
+
+    if plot_type in ["Histogram", "Countplot", "Boxplot"]:
+        x_col = st.selectbox(f"Select a categorical or numerical column for Plot {i+1}:",
+                             plot_data.columns, key=f"x_col_{i}")
+        hue_col = st.selectbox(f"Optional: Select hue column for Plot {i+1}:",
+                               ["None"] + list(plot_data.columns), key=f"hue_col_{i}")
+
+    elif plot_type in ["Scatterplot", "Lineplot"]:
+        x_col = st.selectbox(f"Select X-axis column for Plot {i+1}:",
+                             plot_data.columns, key=f"x_col_{i}")
+        y_col = st.selectbox(f"Select Y-axis column for Plot {i+1}:",
+                             plot_data.columns, key=f"y_col_{i}")
+        hue_col = st.selectbox(f"Optional: Select hue column for Plot {i+1}:",
+                               ["None"] + list(plot_data.columns), key=f"hue_col_{i}")
+
+    cache_key, plot_data, spec = plot_request(df, filtered_df, data_signature, filter_signature,
+                                              data_choice, plot_type, x_col, y_col, hue_col)
+    # Histograms, countplots and box plots are drawn by the browser; the rest as PNGs
+    try:
+        chart = native_chart(cache_key, plot_data, spec)
+    except Exception as e:
+        st.error(f"Could not draw this plot: {e}")
+        return
+    if chart is not None:
+        with span("emit"):
+            st.vega_lite_chart(*chart)
+        return
+    result, = render_plots([(cache_key, plot_data, spec)])
+    if isinstance(result, Exception):
+        st.error(f"Could not draw this plot: {result}")
+    else:
+        st.image(result)
+
+
+# Set up the Streamlit app
+st.title("DataFrame Handling & Visualization App")
+st.write("Upload a dataset to explore, slice, and visualize your data.")
+
+# Step 1: File Upload
+uploaded_file = upload_dataset()
+
+if uploaded_file:
+    if out_of_core_toggle(uploaded_file):
+        dataset = open_spilled(uploaded_file)
+        st.write(f"### Dataset Preview (first rows of {dataset.n_rows:,}):")
+        st.dataframe(dataset.head())
+
+        # Only the columns picked here are read from disk
+        loaded_columns = st.multiselect("Select columns to load:", dataset.columns, default=dataset.columns[:5])
+        if not loaded_columns:
+            st.info("Select at least one column to load.")
+            st.stop()
+        df, data_signature = load_columns(uploaded_file, dataset, loaded_columns)
+    else:
+        dataset = None
+        df = load_csv(uploaded_file)
+        data_signature = dataset_key(uploaded_file)
+        st.write("### Full Dataset Preview:")
+        paginated_dataframe(df, key="full_preview", signature=data_signature)
+        show_memory_report(dataset_key(uploaded_file))
+
+    # Column kinds, distinct values and counts, computed once per dataset
+    profile = frame_profile(data_signature, df)
+
+    # Filtering and summaries give the same results on every backend
+    backend_name = backend_selector()
+    backend = get_backend(backend_name, data_signature, df)
+    if backend.name != backend_name:
+        st.caption(f"This dataset cannot be queried with {backend_name}; using {backend.name} instead.")
+
+    # Step 2: Data Slicing Interface
+    filtered_df, filter_signature, tree = filter_section(df, data_signature, profile, backend, dataset)
+
+    # Step 3: Statistical Summaries
+    summaries_section(filtered_df, profile, backend, tree, data_signature, filter_signature)
 
     # Step 4: Interactive Plotting Dashboard
     if "plot_count" not in st.session_state:
         st.session_state["plot_count"] = 1
 
     st.subheader("Plotting Dashboard")
-    
+
+    prefetch_plots(st.session_state["plot_count"], df, filtered_df, data_signature, filter_signature)
     for i in range(st.session_state["plot_count"]):
-        st.write(f"### Plot {i+1}")
-
-        data_choice = st.radio(f"Choose dataset for Plot {i+1}:", ["Full Data", "Sliced Data"], key=f"data_choice_{i}")
-        plot_data = df if data_choice == "Full Data" else filtered_df
-
-        plot_type = st.selectbox(f"Select plot type for Plot {i+1}:", 
-                                 ["Histogram", "Countplot", "Boxplot", "Scatterplot", "Lineplot"], 
-                                 key=f"plot_type_{i}")
-
-        if plot_type in ["Histogram", "Countplot", "Boxplot"]:
-            x_col = st.selectbox(f"Select a categorical or numerical column for Plot {i+1}:", 
-                                 plot_data.columns, key=f"x_col_{i}")
-            hue_col = st.selectbox(f"Optional: Select hue column for Plot {i+1}:", 
-                                   ["None"] + list(plot_data.columns), key=f"hue_col_{i}")
-
-        elif plot_type in ["Scatterplot", "Lineplot"]:
-            x_col = st.selectbox(f"Select X-axis column for Plot {i+1}:", 
-                                 plot_data.columns, key=f"x_col_{i}")
-            y_col = st.selectbox(f"Select Y-axis column for Plot {i+1}:", 
-                                 plot_data.columns, key=f"y_col_{i}")
-            hue_col = st.selectbox(f"Optional: Select hue column for Plot {i+1}:", 
-                                   ["None"] + list(plot_data.columns), key=f"hue_col_{i}")
-
-        fig, ax = plt.subplots()
-        if plot_type == "Histogram":
-            sns.histplot(data=plot_data, x=x_col, hue=hue_col if hue_col != "None" else None, ax=ax, bins=20)
-        elif plot_type == "Countplot":
-            sns.countplot(data=plot_data, x=x_col, hue=hue_col if hue_col != "None" else None, ax=ax)
-        elif plot_type == "Boxplot":
-            sns.boxplot(data=plot_data, x=x_col, y=hue_col if hue_col != "None" else None, ax=ax)
-        elif plot_type == "Scatterplot":
-            sns.scatterplot(data=plot_data, x=x_col, y=y_col, hue=hue_col if hue_col != "None" else None, ax=ax)
-        elif plot_type == "Lineplot":
-            sns.lineplot(data=plot_data, x=x_col, y=y_col, hue=hue_col if hue_col != "None" else None, ax=ax)
-
-        st.pyplot(fig)
+        plot_section(i, df, filtered_df, data_signature, filter_signature)
 
     if st.button("Add another plot"):
         st.session_state["plot_count"] += 1
@@ -1,12 +1,132 @@
 import streamlit as st
 import numpy as np
-import matplotlib.pyplot as plt
 import matplotlib
 from sklearn.decomposition import PCA
 
+from hub_utils.compaction import show_memory_report
+from hub_utils.datastore import array_key, dataset_key, load_csv
+from hub_utils.ingest import open_spilled, out_of_core_toggle
+from hub_utils.jobs import background_result
+from hub_utils.render import cached_figure
+from hub_utils.pca import SOLVERS, choose_solver, fit_in_memory, fit_streaming, loadings_table, scree_table
+from hub_utils.profile import frame_profile, spilled_profile
+from hub_utils.shards import upload_dataset
+
 # Ensure Matplotlib uses a non-interactive backend for Streamlit
 matplotlib.use("Agg")
 
+@st.cache_data(max_entries=16, show_spinner=False)
+def example_pca(data):
+    pca = PCA(n_components=2)
+    pca.fit(data)
+    return pca, pca.transform(data)
+
+
+def show_figure(key, draw):
+    # Figures are drawn once per data hash and settings, then served as PNGs
+    st.image(cached_figure(("PCA",) + key, draw))
+
+
+def uploaded_pca(columns, n_components, standardize, solver, n_rows, load_chunks, df=None, progress=None):
+    if solver == "Incremental" and df is None:
+        return fit_streaming(load_chunks, columns, n_components, n_rows, standardize, progress=progress)
+    return fit_in_memory(df, columns, n_components, standardize, solver, progress=progress)
+
+
+def uploaded_data_section():
+    st.header("PCA of Your Own Dataset")
+    st.markdown("""
+    Upload a CSV file to run PCA on its numerical columns. The solver is picked from the shape of the data:
+    - **Incremental:** large files are streamed from disk chunk by chunk, so the full matrix is never loaded.
+    - **Randomized SVD:** wide data where only a few components are needed.
+    - **Full SVD:** everything else.
+    """)
+
+    uploaded_file = upload_dataset()
+    if not uploaded_file:
+        return
+
+    large_mode = out_of_core_toggle(uploaded_file)
+    if large_mode:
+        dataset = open_spilled(uploaded_file)
+        numeric_columns = spilled_profile(dataset_key(uploaded_file), dataset).numeric_columns()
+        n_rows = dataset.n_rows
+        df = None
+    else:
+        df = load_csv(uploaded_file)
+        show_memory_report(dataset_key(uploaded_file))
+        numeric_columns = frame_profile(dataset_key(uploaded_file), df).numeric_columns()
+        n_rows = len(df)
+
+    columns = st.multiselect("Select numerical columns for PCA:", numeric_columns, default=numeric_columns)
+    if len(columns) < 2 or n_rows < 2:
+        st.warning("PCA needs at least two numerical columns and two rows.")
+        return
+
+    max_components = min(len(columns), n_rows)
+    n_components = st.slider("Number of components:", min_value=1, max_value=max_components, value=min(max_components, 10))
+    standardize = st.checkbox("Standardize columns (PCA on the correlation matrix)", value=True)
+
+    auto_solver = choose_solver(n_rows, len(columns), n_components, streamed=large_mode)
+    if large_mode:
+        solver = auto_solver
+    else:
+        solver = st.selectbox("Solver:", SOLVERS, index=SOLVERS.index(auto_solver))
+    st.caption(f"Suggested solver for {n_rows:,} rows × {len(columns)} columns: {auto_solver}")
+
+    load_chunks = lambda: dataset.iter_chunks(columns)
+    fit_key = (dataset_key(uploaded_file), tuple(columns), n_components, standardize, solver)
+    try:
+        # Fits run in the background and are reused per dataset and settings,
+        # so moving a slider elsewhere is free
+        result = background_result(
+            "pca_fit", fit_key + (n_rows,), uploaded_pca,
+            list(columns), n_components, standardize, solver, n_rows, load_chunks, df=df,
+            label="Fitting PCA...",
+        )
+    except ValueError as e:
+        st.error(f"Could not fit PCA: {e}")
+        return
+    if result is None:
+        return
+    st.write(f"Fitted with {result.solver} on {result.n_rows:,} complete rows.")
+
+    # Scree plot from the fitted model only
+    st.subheader("Scree Plot")
+    scree = scree_table(result)
+
+    def draw_scree(fig):
+        ax4 = fig.subplots()
+        ax4.bar(scree.index, scree["Explained Variance Ratio"], color="steelblue", label="Per component")
+        ax4.plot(scree.index, scree["Cumulative Ratio"], color="red", marker="o", label="Cumulative")
+        ax4.set_ylabel("Explained Variance Ratio")
+        ax4.set_title("Variance Explained by Each Principal Component")
+        ax4.legend()
+        ax4.grid(True)
+
+    show_figure(fit_key + ("scree",), draw_scree)
+    st.write(scree)
+
+    # Projection of a random sample of rows
+    if n_components >= 2:
+        st.subheader("Projection: PC1 vs. PC2")
+        st.markdown(f"Showing {len(result.scores):,} randomly sampled rows projected onto the first two principal components.")
+
+        def draw_projection(fig):
+            ax5 = fig.subplots()
+            ax5.scatter(result.scores["PC1"], result.scores["PC2"], s=5, alpha=0.5)
+            ax5.set_xlabel("PC1")
+            ax5.set_ylabel("PC2")
+            ax5.set_title("Data Projected onto the First Two Principal Components")
+            ax5.grid(True)
+
+        show_figure(fit_key + ("projection",), draw_projection)
+
+    st.subheader("Loadings")
+    st.markdown("Each row shows how much every original column contributes to a principal component.")
+    st.write(loadings_table(result, columns))
+
+
 def main():
     st.title("Principal Component Analysis (PCA) of Customer Movie Preferences")
 
@@ -49,20 +169,20 @@ def main():
     st.subheader("Original Data: Action Movies vs. Comedy Movies")
     st.markdown("This plot shows the raw data points, where each color represents a different customer.")
 
-    fig1, ax1 = plt.subplots()
-    ax1.scatter(data[:, 0], data[:, 1], c=colors)
-    ax1.set_xlabel("Action Movies Watched")
-    ax1.set_ylabel("Comedy Movies Watched")
-    ax1.set_title("Color-Coded Customer Movie Preferences")
-    ax1.grid(True)
-    
-    st.pyplot(fig1)
-    plt.close(fig1)  # Ensure figure is closed after displaying
+    data_key = array_key(data)
+
+    def draw_original(fig):
+        ax1 = fig.subplots()
+        ax1.scatter(data[:, 0], data[:, 1], c=colors)
+        ax1.set_xlabel("Action Movies Watched")
+        ax1.set_ylabel("Comedy Movies Watched")
+        ax1.set_title("Color-Coded Customer Movie Preferences")
+        ax1.grid(True)
+
+    show_figure((data_key, "original"), draw_original)
 
     # PCA Calculation
-    pca = PCA(n_components=2)
-    pca.fit(data)
-    principal_components = pca.transform(data)
+    pca, principal_components = example_pca(data)
 
     # Debugging output
     st.write("PCA Components:", pca.components_)
@@ -72,35 +192,35 @@ def main():
     st.subheader("PCA Transformed Data: PC1 vs. PC2")
     st.markdown("This plot shows the data transformed into the principal component space. PC1 and PC2 represent the directions of maximum variance.")
 
-    fig2, ax2 = plt.subplots()
-    ax2.scatter(principal_components[:, 0], principal_components[:, 1], c=colors)
-    ax2.set_xlabel("PC1")
-    ax2.set_ylabel("PC2")
-    ax2.set_title("PCA of Customer Movie Preferences (Color-Coded)")
-    ax2.grid(True)
-    
-    st.pyplot(fig2)
-    plt.close(fig2)
+    def draw_transformed(fig):
+        ax2 = fig.subplots()
+        ax2.scatter(principal_components[:, 0], principal_components[:, 1], c=colors)
+        ax2.set_xlabel("PC1")
+        ax2.set_ylabel("PC2")
+        ax2.set_title("PCA of Customer Movie Preferences (Color-Coded)")
+        ax2.grid(True)
+
+    show_figure((data_key, "transformed"), draw_transformed)
 
     # PCA with Vectors on Original Data
     st.subheader("PCA Vectors on Original Data")
     st.markdown("This plot shows the original data with the principal component vectors overlaid. The vectors indicate the directions of maximum variance.")
 
-    fig3, ax3 = plt.subplots()
-    ax3.scatter(data[:, 0], data[:, 1], c=colors)
-    ax3.set_xlabel("Action Movies Watched")
-    ax3.set_ylabel("Comedy Movies Watched")
-    ax3.set_title("Customer Movie Preferences with Principal Components (Color-Coded)")
-    ax3.grid(True)
+    def draw_vectors(fig):
+        ax3 = fig.subplots()
+        ax3.scatter(data[:, 0], data[:, 1], c=colors)
+        ax3.set_xlabel("Action Movies Watched")
+        ax3.set_ylabel("Comedy Movies Watched")
+        ax3.set_title("Customer Movie Preferences with Principal Components (Color-Coded)")
+        ax3.grid(True)
 
-    # Plot PCA vectors (principal components)
-    for length, vector in zip(pca.explained_variance_ratio_, pca.components_):
-        v = vector * np.sqrt(length) * 3  # Scaling adjustment
-        ax3.arrow(pca.mean_[0], pca.mean_[1], v[0], v[1],
-                  head_width=0.2, head_length=0.2, color='red')
+        # Plot PCA vectors (principal components)
+        for length, vector in zip(pca.explained_variance_ratio_, pca.components_):
+            v = vector * np.sqrt(length) * 3  # Scaling adjustment
+            ax3.arrow(pca.mean_[0], pca.mean_[1], v[0], v[1],
+                      head_width=0.2, head_length=0.2, color='red')
 
-    st.pyplot(fig3)
-    plt.close(fig3)
+    show_figure((data_key, "vectors"), draw_vectors)
 
     # Display PCA Results
     st.subheader("PCA Results")
@@ -109,5 +229,7 @@ def main():
     st.write("Explained Variance Ratio:")
     st.write(pca.explained_variance_ratio_)
 
-if __name__ == "__main__":
-    main()
+    uploaded_data_section()
+
+# The hub runs this page under its own module name, so main() is not guarded
+main()
@@ -1,8 +1,55 @@
+import io
+
 import streamlit as st
 import numpy as np
-import matplotlib.pyplot as plt
+import pandas as pd
 from sklearn.decomposition import PCA
 
+from hub_utils.datastore import array_key, dataset_key
+from hub_utils.pca import (PROJECTION_SAMPLE, SPARSE_METHODS, dense_nbytes, fit_sparse, load_npz_ratings,
+                           ratings_matrix, sparse_nbytes)
+from hub_utils.render import cached_figure
+
+# The fit and every derived quantity are computed once per dataset
+@st.cache_data(max_entries=16, show_spinner=False)
+def pca_analysis(data, n_components=2):
+    pca = PCA(n_components=n_components)
+    pca.fit(data)
+    principal_components = pca.transform(data)
+    X_centered = data - np.mean(data, axis=0)
+    movie_diff = data[:, 0] - data[:, 1]
+    total_movies = data[:, 0] + data[:, 1]
+    return {
+        "pca": pca,
+        "principal_components": principal_components,
+        "X_centered": X_centered,
+        "pca_scores": X_centered @ pca.components_.T,
+        "movie_diff": movie_diff,
+        "total_movies": total_movies,
+        "correlation_pc1": np.corrcoef(movie_diff, principal_components[:, 0])[0, 1],
+        "correlation_pc2": np.corrcoef(total_movies, principal_components[:, 1])[0, 1],
+    }
+
+
+# The sparse matrix is shared, not copied, between reruns and sessions
+@st.cache_resource(max_entries=4, show_spinner="Building the sparse ratings matrix...")
+def load_ratings(ratings_key, user_col, item_col, rating_col, _uploaded_file):
+    if _uploaded_file.name.endswith(".npz"):
+        return load_npz_ratings(io.BytesIO(_uploaded_file.getvalue()))
+    triplets = pd.read_csv(io.BytesIO(_uploaded_file.getvalue()), usecols=[user_col, item_col, rating_col])
+    return ratings_matrix(triplets, user_col, item_col, rating_col)
+
+
+@st.cache_data(max_entries=16, show_spinner="Reducing the ratings matrix...")
+def sparse_pca(ratings_key, ratings_columns, n_components, method, _matrix):
+    return fit_sparse(_matrix, n_components, method)
+
+
+def show_figure(name, draw, **figure_kwargs):
+    # Figures depend only on the data, so each one is drawn once per dataset
+    st.image(cached_figure(("PCAmoviesEX", data_key, name), draw, **figure_kwargs))
+
+
 # Streamlit App Setup
 st.title("PCA Visualization App")
 st.write("This interactive application demonstrates Principal Component Analysis (PCA) applied to customer movie preferences. PCA is used to reduce the dimensionality of data while preserving the most critical information.")
@@ -20,67 +67,75 @@ data = np.array([
     [5, 5]
 ])
 colors = ['red', 'green', 'blue', 'purple', 'orange', 'black']
+data_key = array_key(data)
+analysis = pca_analysis(data)
 
 # Scatter plot of original data
-fig, ax = plt.subplots()
-ax.scatter(data[:, 0], data[:, 1], c=colors)
-ax.set_xlabel("Action Movies Watched")
-ax.set_ylabel("Comedy Movies Watched")
-ax.set_title("Customer Movie Preferences")
-ax.grid(True)
-st.pyplot(fig)
+def draw_original(fig):
+    ax = fig.subplots()
+    ax.scatter(data[:, 0], data[:, 1], c=colors)
+    ax.set_xlabel("Action Movies Watched")
+    ax.set_ylabel("Comedy Movies Watched")
+    ax.set_title("Customer Movie Preferences")
+    ax.grid(True)
+
+show_figure("original", draw_original)
 
 # Compute PCA
 st.subheader("PCA Computation")
 st.write("PCA finds a new set of axes (principal components) that best explain the variance in the data.")
-pca = PCA(n_components=2)
-pca.fit(data)
-principal_components = pca.transform(data)
+pca = analysis["pca"]
+principal_components = analysis["principal_components"]
 
 # Scatter plot of PCA-transformed data
 st.subheader("Comparison: PCA Representation vs. Original Data")
 st.write("To better understand how PCA transforms the data, we compare the PCA scatter plot with the original dataset side by side.")
 
-fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
-ax1.scatter(data[:, 0], data[:, 1], c=colors)
-ax1.set_xlabel("Action Movies Watched")
-ax1.set_ylabel("Comedy Movies Watched")
-ax1.set_title("Original Data")
-ax1.grid(True)
+def draw_comparison(fig):
+    ax1, ax2 = fig.subplots(1, 2)
+    ax1.scatter(data[:, 0], data[:, 1], c=colors)
+    ax1.set_xlabel("Action Movies Watched")
+    ax1.set_ylabel("Comedy Movies Watched")
+    ax1.set_title("Original Data")
+    ax1.grid(True)
+
+    ax2.scatter(principal_components[:, 0], principal_components[:, 1], c=colors)
+    ax2.set_xlabel("PC1")
+    ax2.set_ylabel("PC2")
+    ax2.set_title("PCA Transformed Data")
+    ax2.grid(True)
 
-ax2.scatter(principal_components[:, 0], principal_components[:, 1], c=colors)
-ax2.set_xlabel("PC1")
-ax2.set_ylabel("PC2")
-ax2.set_title("PCA Transformed Data")
-ax2.grid(True)
-st.pyplot(fig)
+show_figure("comparison", draw_comparison, figsize=(12, 5))
 
 st.subheader("Transformed Data (PCA Representation)")
 st.write("After applying PCA, the data is rotated to align with the directions of maximum variance. The axes now represent the principal components.")
-fig, ax = plt.subplots()
-ax.scatter(principal_components[:, 0], principal_components[:, 1], c=colors)
-ax.set_xlabel("PC1")
-ax.set_ylabel("PC2")
-ax.set_title("PCA of Customer Movie Preferences")
-ax.grid(True)
-st.pyplot(fig)
+def draw_transformed(fig):
+    ax = fig.subplots()
+    ax.scatter(principal_components[:, 0], principal_components[:, 1], c=colors)
+    ax.set_xlabel("PC1")
+    ax.set_ylabel("PC2")
+    ax.set_title("PCA of Customer Movie Preferences")
+    ax.grid(True)
+
+show_figure("transformed", draw_transformed)
 
 # Visualizing principal component vectors on the original data
 st.subheader("Principal Components on Original Data")
 st.write("The arrows represent the directions of the principal components, showing how PCA reorients the data along axes of maximum variance.")
-fig, ax = plt.subplots()
-ax.scatter(data[:, 0], data[:, 1], c=colors)
-ax.set_xlabel("Action Movies Watched")
-ax.set_ylabel("Comedy Movies Watched")
-ax.set_title("Customer Movie Preferences with Principal Components")
-ax.grid(True)
+def draw_vectors(fig):
+    ax = fig.subplots()
+    ax.scatter(data[:, 0], data[:, 1], c=colors)
+    ax.set_xlabel("Action Movies Watched")
+    ax.set_ylabel("Comedy Movies Watched")
+    ax.set_title("Customer Movie Preferences with Principal Components")
+    ax.grid(True)
 
-for length, vector in zip(pca.explained_variance_, pca.components_):
-    v = vector * 3 * np.sqrt(length)
-    ax.arrow(pca.mean_[0], pca.mean_[1], v[0], v[1],
-              head_width=0.3, head_length=0.3, color='red')
+    for length, vector in zip(pca.explained_variance_, pca.components_):
+        v = vector * 3 * np.sqrt(length)
+        ax.arrow(pca.mean_[0], pca.mean_[1], v[0], v[1],
+                  head_width=0.3, head_length=0.3, color='red')
 
-st.pyplot(fig)
+show_figure("vectors", draw_vectors)
 
 # Display PCA results with explanations
 st.subheader("Interpreting Principal Component 1")
@@ -125,11 +180,9 @@ Where:
 Let's apply this transformation to compute the PCA scores:
 """)
 
-# Compute centered data
-X_centered = data - np.mean(data, axis=0)
-
-# Apply PCA transformation
-pca_scores = X_centered @ pca.components_.T
+# Centered data and the PCA transformation, from the cached analysis
+X_centered = analysis["X_centered"]
+pca_scores = analysis["pca_scores"]
 
 # Display results
 st.write("### PCA Transformation Results")
@@ -183,46 +236,52 @@ st.write("The explained variance ratio tells us how much of the total variance i
 st.subheader("Further Confirmation: Correlation Analysis")
 st.write("To further validate our interpretation, we can examine the correlation between PC1 and the difference between Action and Comedy movies watched (Action - Comedy). If PC1 truly represents a 'Taste Preference Score,' we should observe a strong correlation.")
 
-# Compute the difference between Action and Comedy
-movie_diff = data[:, 0] - data[:, 1]
+# The difference between Action and Comedy
+movie_diff = analysis["movie_diff"]
 
 # Scatter plot to visualize correlation
-fig, ax = plt.subplots()
-ax.scatter(movie_diff, principal_components[:, 0], c=colors)
-ax.set_xlabel("Action - Comedy Movies Watched")
-ax.set_ylabel("PC1 Value")
-ax.set_title("Correlation between Movie Preference Difference and PC1")
-ax.grid(True)
-st.pyplot(fig)
-
-correlation_pc1 = np.corrcoef(movie_diff, principal_components[:, 0])[0, 1]
+def draw_pc1_correlation(fig):
+    ax = fig.subplots()
+    ax.scatter(movie_diff, principal_components[:, 0], c=colors)
+    ax.set_xlabel("Action - Comedy Movies Watched")
+    ax.set_ylabel("PC1 Value")
+    ax.set_title("Correlation between Movie Preference Difference and PC1")
+    ax.grid(True)
+
+show_figure("pc1_correlation", draw_pc1_correlation)
+
+correlation_pc1 = analysis["correlation_pc1"]
 st.write(f"The Pearson correlation coefficient between PC1 and (Action - Comedy) is: {correlation_pc1:.2f}. This strong correlation supports our interpretation that PC1 represents the customer's taste preference.")
 
 st.subheader("Further Confirmation: PC2 and Total Movies Watched")
 st.write("To validate our interpretation of PC2, we can examine its correlation with the total number of movies watched (Action + Comedy). If PC2 represents overall movie-watching behavior, we should see a strong correlation.")
 
-# Compute the total number of movies watched
-total_movies = data[:, 0] + data[:, 1]
+# The total number of movies watched
+total_movies = analysis["total_movies"]
 
 # Scatter plot to visualize correlation
-fig, ax = plt.subplots()
-ax.scatter(total_movies, principal_components[:, 1], c=colors)
-ax.set_xlabel("Total Movies Watched")
-ax.set_ylabel("PC2 Value")
-ax.set_title("Correlation between Total Movies Watched and PC2")
-ax.grid(True)
-st.pyplot(fig)
-
-correlation_pc2 = np.corrcoef(total_movies, principal_components[:, 1])[0, 1]
+def draw_pc2_correlation(fig):
+    ax = fig.subplots()
+    ax.scatter(total_movies, principal_components[:, 1], c=colors)
+    ax.set_xlabel("Total Movies Watched")
+    ax.set_ylabel("PC2 Value")
+    ax.set_title("Correlation between Total Movies Watched and PC2")
+    ax.grid(True)
+
+show_figure("pc2_correlation", draw_pc2_correlation)
+
+correlation_pc2 = analysis["correlation_pc2"]
 st.write(f"The Pearson correlation coefficient between PC2 and total movies watched is: {correlation_pc2:.2f}. This confirms our interpretation that PC2 represents overall movie-watching behavior.")
 
 st.subheader("Variance Explained by Each Principal Component")
 st.write("The following bar chart represents the proportion of total variance explained by each principal component.")
-fig, ax = plt.subplots()
-ax.bar(["PC1", "PC2"], pca.explained_variance_ratio_, color=['blue', 'green'])
-ax.set_ylabel("Proportion of Variance Explained")
-ax.set_title("Variance Explained by Principal Components")
-st.pyplot(fig)
+def draw_variance(fig):
+    ax = fig.subplots()
+    ax.bar(["PC1", "PC2"], pca.explained_variance_ratio_, color=['blue', 'green'])
+    ax.set_ylabel("Proportion of Variance Explained")
+    ax.set_title("Variance Explained by Principal Components")
+
+show_figure("variance", draw_variance)
 
 st.write("### Understanding Variance Preservation:")
 st.write("The total variance in the original dataset is equal to the sum of the variances in the principal components. This means that while PCA transforms the data, it retains all the variance present in the original dimensions.")
@@ -230,3 +289,93 @@ st.write("The total variance in the original dataset is equal to the sum of the
 st.write("Mathematically, this is given by:")
 st.latex(r"\sum Var_{original} = \sum Var_{PCs}")
 st.write("This confirms that PCA is a lossless transformation in terms of variance distribution across dimensions.")
+
+
+st.subheader("From the Example to a Real Ratings Matrix")
+st.write("""
+A real ratings dataset has one row per user and one column per movie, and most users have rated only a tiny fraction of the movies. Stored as a dense array, almost all of its memory would hold zeros.
+
+Upload a ratings file to run the same analysis on a **sparse** users × movies matrix:
+- a CSV with one rating per row (user, movie, rating), or
+- a `.npz` file saved with `scipy.sparse.save_npz`.
+
+Only the stored ratings are kept in memory. **Centered PCA** subtracts the column means implicitly, without filling in the zeros, and **Truncated SVD** skips the centering step altogether.
+""")
+
+ratings_file = st.file_uploader("Upload a ratings file (CSV triplets or .npz)", type=["csv", "npz"], key="ratings_file")
+if ratings_file:
+    ratings_key = dataset_key(ratings_file)
+    if ratings_file.name.endswith(".npz"):
+        ratings_columns = (None, None, None)
+    else:
+        header = pd.read_csv(io.BytesIO(ratings_file.getvalue()), nrows=0).columns.tolist()
+        user_col = st.selectbox("User column:", header, index=0)
+        item_col = st.selectbox("Movie column:", header, index=min(1, len(header) - 1))
+        rating_col = st.selectbox("Rating column:", header, index=min(2, len(header) - 1))
+        ratings_columns = (user_col, item_col, rating_col)
+
+    ratings = load_ratings(ratings_key, *ratings_columns, ratings_file)
+    matrix = ratings.matrix
+    n_users, n_movies = matrix.shape
+    st.write(
+        f"{n_users:,} users × {n_movies:,} movies with {matrix.nnz:,} stored ratings "
+        f"({matrix.nnz / max(n_users * n_movies, 1):.4%} filled). "
+        f"The sparse matrix takes {sparse_nbytes(matrix) / 1e6:,.1f} MB, a dense array would take {dense_nbytes(matrix) / 1e6:,.1f} MB."
+    )
+
+    if min(n_users, n_movies) < 3:
+        st.warning("The ratings matrix needs at least 3 users and 3 movies.")
+    else:
+        max_components = min(20, min(n_users, n_movies) - 1)
+        if max_components > 2:
+            n_components = st.slider("Number of components:", min_value=2, max_value=max_components, value=min(5, max_components))
+        else:
+            # A slider needs a range; with 3 users or movies only 2 components fit
+            n_components = max_components
+        method = st.selectbox("Method:", SPARSE_METHODS)
+        sparse_result = sparse_pca(ratings_key, ratings_columns, n_components, method, matrix)
+        sparse_figure_key = ("PCAmoviesEX", ratings_key) + ratings_columns + (n_components, method)
+
+        st.write("### Variance Explained by Each Principal Component")
+
+        def draw_sparse_variance(fig):
+            ax = fig.subplots()
+            ratio = sparse_result.model.explained_variance_ratio_
+            ax.bar([f"PC{i + 1}" for i in range(len(ratio))], ratio, color="steelblue")
+            ax.set_ylabel("Proportion of Variance Explained")
+            ax.set_title("Variance Explained by Principal Components")
+
+        st.image(cached_figure(sparse_figure_key + ("variance",), draw_sparse_variance))
+
+        st.write("### PC1 and the Action − Comedy Difference")
+        st.write("Pick the movies that count as Action and as Comedy. As in the example above, if PC1 is a taste preference score it should correlate strongly with how much more Action than Comedy each user rated.")
+        movie_names = [str(movie) for movie in ratings.items]
+        action_default = [m for m in movie_names if "action" in m.lower()][:50]
+        comedy_default = [m for m in movie_names if "comedy" in m.lower()][:50]
+        action_movies = st.multiselect("Action movies:", movie_names, default=action_default or movie_names[:1])
+        comedy_movies = st.multiselect("Comedy movies:", movie_names, default=comedy_default or movie_names[1:2])
+
+        if action_movies and comedy_movies:
+            positions = {name: i for i, name in enumerate(movie_names)}
+            # Column sums of the sparse matrix, one value per user
+            action_total = np.asarray(matrix[:, [positions[m] for m in action_movies]].sum(axis=1)).ravel()
+            comedy_total = np.asarray(matrix[:, [positions[m] for m in comedy_movies]].sum(axis=1)).ravel()
+            sparse_diff = action_total - comedy_total
+            pc1 = sparse_result.scores["PC1"].to_numpy()
+
+            def draw_sparse_correlation(fig):
+                shown = np.arange(n_users)
+                if n_users > PROJECTION_SAMPLE:
+                    shown = np.random.default_rng(0).choice(n_users, PROJECTION_SAMPLE, replace=False)
+                ax = fig.subplots()
+                ax.scatter(sparse_diff[shown], pc1[shown], s=5, alpha=0.5)
+                ax.set_xlabel("Action - Comedy Ratings")
+                ax.set_ylabel("PC1 Value")
+                ax.set_title("Correlation between Movie Preference Difference and PC1")
+                ax.grid(True)
+
+            groups_key = (tuple(action_movies), tuple(comedy_movies))
+            st.image(cached_figure(sparse_figure_key + groups_key + ("pc1_correlation",), draw_sparse_correlation))
+            if np.std(sparse_diff) > 0:
+                sparse_correlation = np.corrcoef(sparse_diff, pc1)[0, 1]
+                st.write(f"The Pearson correlation coefficient between PC1 and (Action - Comedy) is: {sparse_correlation:.2f}. The sign of a principal component is arbitrary, so a strong negative value supports the same interpretation.")
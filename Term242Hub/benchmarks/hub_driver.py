@@ -0,0 +1,33 @@
+# Script run by AppTest: serve the benchmark CSV from every dataset uploader,
+# then run the hub exactly as `streamlit run main_hub.py` would
+import os
+import sys
+
+import streamlit as st
+from streamlit.runtime.uploaded_file_manager import UploadedFile, UploadedFileRec
+
+HUB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSV_PATH = os.environ["HUB_BENCH_CSV"]
+
+
+def benchmark_uploader(label, *args, **kwargs):
+    # Only the dataset uploaders get the CSV; other uploaders (e.g. ratings) stay empty
+    if "dataset" not in label.lower():
+        return [] if kwargs.get("accept_multiple_files") else None
+    if "file" not in st.session_state.setdefault("_bench_upload", {}):
+        with open(CSV_PATH, "rb") as f:
+            record = UploadedFileRec(file_id=CSV_PATH, name=os.path.basename(CSV_PATH), type="text/csv", data=f.read())
+        st.session_state["_bench_upload"]["file"] = UploadedFile(record, None)
+    uploaded = st.session_state["_bench_upload"]["file"]
+    uploaded.seek(0)
+    return [uploaded] if kwargs.get("accept_multiple_files") else uploaded
+
+
+st.file_uploader = benchmark_uploader
+
+# main_hub.py resolves the apps folder relative to the repository root
+os.chdir(os.path.dirname(HUB_DIR))
+sys.path.insert(0, HUB_DIR)
+main_hub = os.path.join(HUB_DIR, "main_hub.py")
+with open(main_hub, encoding="utf-8") as f:
+    exec(compile(f.read(), main_hub, "exec"), {"__name__": "__main__", "__file__": main_hub})
@@ -0,0 +1,234 @@
+"""Headless performance benchmarks for the hub and its sub-apps.
+
+Every sub-app is opened through `main_hub.py` with Streamlit's `AppTest`,
+on synthetic CSVs of increasing size, and driven through a scripted list of
+interactions (selecting a column, moving a slider, adding a filter or a
+plot...). Each step records the wall time of its rerun, the process's peak
+and current RSS and the number of open pyplot figures. Every (app, rows)
+scenario runs in a fresh Python process so caches start cold and peak RSS
+belongs to that scenario alone.
+
+    python Term242Hub/benchmarks/run_benchmarks.py --rows 10000 100000
+    python Term242Hub/benchmarks/run_benchmarks.py --output new.json --baseline old.json
+
+With `--baseline`, steps that got slower than `--tolerance` times the
+baseline (and by at least `--min-delta` seconds, to ignore noise on fast
+steps) are listed and the exit status is 1.
+"""
+import argparse
+import importlib.metadata
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import matplotlib.pyplot as plt
+
+from synthetic import dataset_path, make_dataset
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DRIVER = os.path.join(BENCH_DIR, "hub_driver.py")
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000, 10_000_000]
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), "term242hub_bench")
+RERUN_TIMEOUT = 1800
+LIBRARIES = ["streamlit", "pandas", "numpy", "matplotlib", "seaborn", "scipy", "scikit-learn", "pyarrow",
+             "duckdb", "polars"]
+
+
+def find(elements, label=None, key=None):
+    for element in elements:
+        if (key is not None and element.key == key) or (label is not None and element.label == label):
+            return element
+    raise LookupError(f"No widget with label={label!r} key={key!r}")
+
+
+def select_pair(at):
+    find(at.selectbox, "Select the first column:").set_value("value_a")
+    find(at.selectbox, "Select the second column:").set_value("value_b")
+
+
+def set_filter_column(at):
+    find(at.selectbox, key="col_0").set_value("value_a")
+    find(at.selectbox, key="cond_0").set_value(">")
+
+
+def set_plot_columns(at):
+    find(at.selectbox, key="x_col_1").set_value("value_a")
+    find(at.selectbox, key="y_col_1").set_value("value_b")
+
+
+# Scripted interactions per sub-app, run in order after the app is opened
+SCENARIOS = {
+    ("topic3", "Basic_stats_app.py"): [
+        ("select numerical column", lambda at: find(at.selectbox, "Select a column to analyze:").set_value("value_a")),
+        ("change histogram bins", lambda at: find(at.slider, "Select number of bins for the histogram:").set_value(30)),
+        ("select categorical column", lambda at: find(at.selectbox, "Select a column to analyze:").set_value("group")),
+    ],
+    ("topic3", "hypothesis_testing.py"): [
+        ("select normality columns", lambda at: find(at.multiselect, "Select columns to test for normality:").set_value(["value_a", "value_b"])),
+        ("select column pair", select_pair),
+        ("all pairs mode", lambda at: find(at.radio, "Comparison mode:").set_value("All pairs")),
+    ],
+    ("topic4", "dataframehandling.py"): [
+        ("add filter", lambda at: find(at.number_input, "Number of conditions:").set_value(1)),
+        ("set filter condition", set_filter_column),
+        ("enter filter value", lambda at: find(at.text_input, key="val_0").input("50")),
+        ("add plot", lambda at: find(at.button, "Add another plot").click()),
+        ("choose plot type", lambda at: find(at.selectbox, key="plot_type_1").set_value("Scatterplot")),
+        ("choose plot columns", set_plot_columns),
+    ],
+    ("topic6", "PCA.py"): [
+        ("change components", lambda at: find(at.slider, "Number of components:").set_value(2)),
+    ],
+    ("topic6", "PCAmoviesEX.py"): [],
+}
+
+
+def memory_mb():
+    """Peak and current RSS of this process in MB (current is Linux only)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    peak_mb = peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+    try:
+        with open("/proc/self/statm") as f:
+            current_mb = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        current_mb = None
+    return peak_mb, current_mb
+
+
+def timed_run(at, step, record):
+    start = time.perf_counter()
+    at.run(timeout=RERUN_TIMEOUT)
+    wall = time.perf_counter() - start
+    peak_mb, current_mb = memory_mb()
+    record.append({
+        "step": step,
+        "wall_s": round(wall, 4),
+        "peak_rss_mb": round(peak_mb, 1),
+        "rss_mb": None if current_mb is None else round(current_mb, 1),
+        "open_figures": len(plt.get_fignums()),
+        "exceptions": [str(e.value) for e in at.exception],
+        "errors": [str(e.value) for e in at.error],
+    })
+
+
+def run_scenario(topic, sub_app, csv_path):
+    """Open one sub-app through the hub and play its interactions."""
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["HUB_BENCH_CSV"] = csv_path
+    at = AppTest.from_file(DRIVER, default_timeout=RERUN_TIMEOUT)
+    steps = []
+    timed_run(at, "open hub", steps)
+
+    find(at.sidebar.selectbox, "Choose a Topic").set_value(topic)
+    timed_run(at, "choose topic", steps)
+    find(at.sidebar.selectbox, "Choose a Sub-App").set_value(sub_app)
+    timed_run(at, "open app", steps)
+    # Rerunning with nothing changed shows what the caches save
+    timed_run(at, "rerun unchanged", steps)
+
+    for name, interact in SCENARIOS[(topic, sub_app)]:
+        try:
+            interact(at)
+        except LookupError as e:
+            steps.append({"step": name, "skipped": str(e)})
+            continue
+        timed_run(at, name, steps)
+    return steps
+
+
+def run_in_subprocess(topic, sub_app, csv_path):
+    command = [sys.executable, __file__, "--scenario", topic, sub_app, csv_path]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return [{"step": "scenario", "error": completed.stderr.strip().splitlines()[-1:]}]
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def library_version(name):
+    try:
+        return importlib.metadata.version(name)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def compare(results, baseline, tolerance, min_delta):
+    """Steps whose wall time grew by more than `tolerance` times the baseline."""
+    def index(entries):
+        return {
+            (e["app"], e["rows"], e["step"]): e["wall_s"]
+            for e in entries if "wall_s" in e
+        }
+
+    old = index(baseline["results"])
+    regressions = []
+    for key, wall in index(results).items():
+        if key in old and old[key] > 0 and wall > tolerance * old[key] and wall - old[key] >= min_delta:
+            regressions.append({"app": key[0], "rows": key[1], "step": key[2],
+                                "baseline_s": old[key], "wall_s": wall, "ratio": round(wall / old[key], 2)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+    parser.add_argument("--apps", nargs="+", help="Sub-app file names to run (default: all)")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25)
+    parser.add_argument("--min-delta", type=float, default=0.05)
+    parser.add_argument("--scenario", nargs=3, metavar=("TOPIC", "SUB_APP", "CSV"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        # Child process: run one scenario and print its steps as JSON
+        print(json.dumps(run_scenario(*args.scenario)))
+        return 0
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = []
+    for n_rows in args.rows:
+        print(f"Generating {n_rows:,} rows...", file=sys.stderr)
+        csv_path = make_dataset(dataset_path(args.data_dir, n_rows), n_rows)
+        for topic, sub_app in SCENARIOS:
+            if args.apps and sub_app not in args.apps:
+                continue
+            print(f"  {topic}/{sub_app}", file=sys.stderr)
+            for step in run_in_subprocess(topic, sub_app, csv_path):
+                results.append({"app": f"{topic}/{sub_app}", "rows": n_rows, **step})
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "libraries": {name: library_version(name) for name in LIBRARIES},
+            "query_backend": os.environ.get("HUB_QUERY_BACKEND", "pandas"),
+        },
+        "results": results,
+    }
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(results, json.load(f), args.tolerance, args.min_delta)
+        for r in report["regressions"]:
+            print(f"REGRESSION {r['app']} {r['rows']:,} rows, {r['step']}: "
+                  f"{r['baseline_s']:.3f}s -> {r['wall_s']:.3f}s ({r['ratio']}x)", file=sys.stderr)
+        status = 1 if report["regressions"] else 0
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} measurements to {args.output}", file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""Synthetic CSV datasets for the benchmarks.
+
+Every dataset has the same mixed schema (numeric, integer, boolean and
+categorical columns, with a few missing values) so results for different
+row counts are comparable. Files are written in chunks and reused when they
+already exist.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 1_000_000
+GROUPS = ["alpha", "beta", "gamma", "delta", "epsilon"]
+CITIES = [f"city_{i:02d}" for i in range(50)]
+NUMERIC_COLUMNS = ["value_a", "value_b", "count", "ratio"]
+CATEGORICAL_COLUMNS = ["group", "city", "flag"]
+
+
+def synthetic_chunk(rng, n_rows, start):
+    group = rng.integers(0, len(GROUPS), n_rows)
+    ratio = rng.uniform(0, 1, n_rows)
+    ratio[rng.uniform(0, 1, n_rows) < 0.01] = np.nan
+    return pd.DataFrame({
+        "id": np.arange(start, start + n_rows),
+        "value_a": rng.normal(50, 10, n_rows) + 2 * group,
+        "value_b": rng.normal(52, 12, n_rows),
+        "count": rng.poisson(4, n_rows),
+        "ratio": ratio,
+        "group": np.array(GROUPS)[group],
+        "city": np.array(CITIES)[rng.integers(0, len(CITIES), n_rows)],
+        "flag": rng.uniform(0, 1, n_rows) < 0.3,
+    })
+
+
+def make_dataset(path, n_rows, seed=0):
+    """Write an `n_rows` synthetic CSV to `path` unless it already exists."""
+    if os.path.exists(path):
+        return path
+    rng = np.random.default_rng(seed)
+    partial = path + ".partial"
+    with open(partial, "w", newline="") as f:
+        for start in range(0, n_rows, CHUNK_ROWS):
+            chunk = synthetic_chunk(rng, min(CHUNK_ROWS, n_rows - start), start)
+            chunk.to_csv(f, header=start == 0, index=False)
+    os.replace(partial, path)
+    return path
+
+
+def dataset_path(data_dir, n_rows):
+    return os.path.join(data_dir, f"synthetic_{n_rows}.csv")
@@ -0,0 +1 @@
+# Shared helpers used by the hub and its sub-apps.
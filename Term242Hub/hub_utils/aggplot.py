@@ -0,0 +1,130 @@
+"""Aggregated scatter and line plots for large data.
+
+Drawing every row as a matplotlib artist stops working past a few hundred
+thousand points. Above `LARGE_PLOT_ROWS` the dashboard bins scatter points
+into a density raster the size of the axes (one colour channel per hue
+level), and reduces line plots to the first, last, min and max point of each
+pixel column, which keeps the shape of the line. Drawing cost then depends
+on the axes' size in pixels instead of the number of rows.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import seaborn as sns
+from matplotlib.colors import to_rgb
+from matplotlib.patches import Patch
+
+LARGE_PLOT_ROWS = int(os.environ.get("HUB_LARGE_PLOT_ROWS", 200_000))
+MAX_HUE_LEVELS = 9  # plus "Other", to stay within the default 10-colour palette
+
+
+def use_aggregation(data, x, y):
+    return (
+        len(data) > LARGE_PLOT_ROWS
+        and pd.api.types.is_numeric_dtype(data[x])
+        and pd.api.types.is_numeric_dtype(data[y])
+    )
+
+
+def _axes_pixels(ax):
+    box = ax.get_window_extent()
+    return max(int(box.width), 1), max(int(box.height), 1)
+
+
+def _value_range(values):
+    lo, hi = (values.min(), values.max()) if len(values) else (0.0, 1.0)
+    # A constant column still needs a non-empty range to bin into
+    return (lo - 0.5, hi + 0.5) if hi <= lo else (lo, hi)
+
+
+def hue_levels(data, hue):
+    """Hue labels as integer codes, folding rare levels into 'Other'."""
+    counts = data[hue].value_counts()
+    levels = counts.index[:MAX_HUE_LEVELS].tolist()
+    codes = pd.Categorical(data[hue], categories=levels).codes.astype(np.int64)
+    if len(counts) > MAX_HUE_LEVELS:
+        codes[codes < 0] = len(levels)
+        levels.append("Other")
+    return codes, [str(level) for level in levels]
+
+
+def density_scatter(ax, data, x, y, hue=None):
+    data = data.dropna(subset=[x, y])
+    xs = data[x].to_numpy(dtype=float)
+    ys = data[y].to_numpy(dtype=float)
+    width, height = _axes_pixels(ax)
+    x_lo, x_hi = _value_range(xs)
+    y_lo, y_hi = _value_range(ys)
+    extent = [x_lo, x_hi, y_lo, y_hi]
+    bins = [np.linspace(x_lo, x_hi, width + 1), np.linspace(y_lo, y_hi, height + 1)]
+
+    if hue is None:
+        counts, _, _ = np.histogram2d(xs, ys, bins=bins)
+        image = ax.imshow(
+            np.ma.masked_equal(np.log1p(counts.T), 0), origin="lower", extent=extent,
+            aspect="auto", cmap="viridis", interpolation="nearest",
+        )
+        ax.figure.colorbar(image, ax=ax, label="log(1 + count)")
+    else:
+        codes, levels = hue_levels(data, hue)
+        colors = np.array([to_rgb(c) for c in sns.color_palette(n_colors=len(levels))])
+        counts = np.stack([
+            np.histogram2d(xs[codes == k], ys[codes == k], bins=bins)[0].T for k in range(len(levels))
+        ], axis=-1)
+        total = counts.sum(axis=-1)
+        # Each pixel gets the count-weighted mix of its hue colours, with
+        # opacity growing with the log of the number of points in it
+        rgb = counts @ colors / np.maximum(total, 1)[..., None]
+        alpha = np.log1p(total) / max(np.log1p(total.max()), 1e-12)
+        ax.imshow(np.dstack([rgb, alpha]), origin="lower", extent=extent, aspect="auto", interpolation="nearest")
+        ax.legend(handles=[Patch(color=c, label=l) for c, l in zip(colors, levels)], title=hue)
+
+    ax.set_xlabel(x)
+    ax.set_ylabel(y)
+    ax.set_title(f"Density of {len(xs):,} points")
+
+
+def minmax_indices(xs, ys, n_bins):
+    """Positions of the first, last, min and max point in each of `n_bins` x-bins.
+
+    `xs` must be sorted. The result is sorted, so drawing the kept points in
+    order reproduces every peak and trough of the full line.
+    """
+    if len(xs) == 0:
+        return np.array([], dtype=np.int64)
+    span = xs[-1] - xs[0]
+    bins = np.zeros(len(xs), dtype=np.int64) if span == 0 else np.minimum(
+        ((xs - xs[0]) / span * n_bins).astype(np.int64), n_bins - 1
+    )
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    ends = np.r_[starts[1:], len(xs)] - 1
+    # Sorting by (bin, y) puts each bin's min first and max last
+    by_y = np.lexsort((ys, bins))
+    return np.unique(np.concatenate([starts, ends, by_y[starts], by_y[ends]]))
+
+
+def minmax_line(ax, data, x, y, hue=None):
+    data = data.dropna(subset=[x, y])
+    width, _ = _axes_pixels(ax)
+    if hue is None:
+        groups = [(None, data)]
+    else:
+        codes, levels = hue_levels(data, hue)
+        groups = [(level, data[codes == k]) for k, level in enumerate(levels)]
+
+    colors = sns.color_palette(n_colors=len(groups))
+    kept = 0
+    for (label, group), color in zip(groups, colors):
+        group = group.sort_values(x, kind="stable")
+        xs = group[x].to_numpy(dtype=float)
+        ys = group[y].to_numpy(dtype=float)
+        keep = minmax_indices(xs, ys, width)
+        ax.plot(xs[keep], ys[keep], color=color, linewidth=0.8, label=label)
+        kept += len(keep)
+
+    if hue is not None:
+        ax.legend(title=hue)
+    ax.set_xlabel(x)
+    ax.set_ylabel(y)
+    ax.set_title(f"{len(data):,} points reduced to {kept:,} (min/max per pixel)")
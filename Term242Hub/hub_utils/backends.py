@@ -0,0 +1,334 @@
+"""Query backends for slicing and summarizing a dataset.
+
+A backend answers three questions about a filter tree from
+`filters.build_tree`: which rows match (`positions`), what `describe()`
+gives for some numerical columns of the matching rows, and what
+`value_counts()` gives for one column of them. Rows are always taken from
+the pandas frame by position, so a slice has the same index and dtypes
+whichever backend found it, and summaries are returned in pandas' own
+formats and order.
+
+- pandas (default, always available): the cached masks of `FilterEngine`.
+- duckdb: SQL over an Arrow view of the loaded frame (in large file mode,
+  of the columns read from the spill, not of the spill files). DuckDB runs
+  the query on all cores and only scans the columns the query uses, with
+  the predicates pushed into the scan.
+- polars: a lazy query over the same Arrow view, optimized and run
+  multi-threaded by Polars.
+
+Both engines are optional. `available_backends()` lists the installed
+ones, and HUB_QUERY_BACKEND sets the default choice. The engines sum in a
+different order and compute in float64, so means, deviations and
+quantiles can differ from pandas in the last digits.
+"""
+import os
+import threading
+from abc import ABC, abstractmethod
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+from hub_utils.datastore import on_evict
+from hub_utils.filters import Condition, get_engine
+from hub_utils.summary import describe_columns
+from hub_utils.tracing import traced
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+BACKENDS = ["pandas", "duckdb", "polars"]
+DEFAULT_BACKEND = os.environ.get("HUB_QUERY_BACKEND", "pandas")
+DESCRIBE_ROWS = ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+# Row positions in the pandas frame, added to the Arrow view
+ROW_COLUMN = "__hub_row"
+
+
+def available_backends():
+    modules = {"pandas": pd, "duckdb": duckdb, "polars": pl}
+    return [name for name in BACKENDS if modules[name] is not None]
+
+
+class QueryBackend(ABC):
+    name = None
+
+    def __init__(self, df):
+        self.df = df
+
+    @abstractmethod
+    def positions(self, tree):
+        """Sorted positions of the rows matching `tree`, or None if it has no conditions."""
+
+    def select(self, tree, columns):
+        """The matching rows of `columns`, as `df.loc[mask, columns]` would give them."""
+        positions = self.positions(tree)
+        projected = self.df[list(columns)]
+        return projected if positions is None else projected.iloc[positions]
+
+    @abstractmethod
+    def describe(self, tree, columns, progress=None):
+        """`describe()` of the numerical `columns` over the matching rows."""
+
+    @abstractmethod
+    def value_counts(self, tree, column):
+        """`value_counts()` of `column` over the matching rows, without zero counts."""
+
+    def _is_text(self, column):
+        dtype = self.df[column].dtype
+        return not (pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_bool_dtype(dtype))
+
+    def _is_numeric(self, column):
+        dtype = self.df[column].dtype
+        return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+    def _counts_series(self, column, values, counts):
+        """Counts in first-occurrence order, sorted the way pandas' value_counts sorts them."""
+        dtype = self.df[column].dtype
+        counts = np.asarray(counts, dtype=np.int64)
+        if isinstance(dtype, pd.CategoricalDtype):
+            # pandas counts every category, in the categories' order, before sorting
+            counts = pd.Series(counts, index=pd.Index(values)).reindex(dtype.categories, fill_value=0)
+            counts = pd.Series(counts.to_numpy(), index=pd.CategoricalIndex(dtype.categories, dtype=dtype, name=column),
+                               name="count").sort_values(ascending=False, kind="stable")
+            return counts[counts > 0]
+        index = pd.Index(values, name=column).astype(dtype)
+        return pd.Series(counts, index=index, name="count").sort_values(ascending=False, kind="stable")
+
+
+class PandasBackend(QueryBackend):
+    name = "pandas"
+
+    def __init__(self, df, engine):
+        super().__init__(df)
+        self.engine = engine
+
+    def positions(self, tree):
+        mask = self.engine.evaluate(tree)
+        return None if mask is None else np.flatnonzero(mask)
+
+    def describe(self, tree, columns, progress=None):
+        return describe_columns(self.select(tree, columns), progress)
+
+    @traced("compute")
+    def value_counts(self, tree, column):
+        counts = self.select(tree, [column])[column].value_counts()
+        # Category columns also count the categories the slice left out
+        return counts[counts > 0]
+
+
+class ArrowBackend(QueryBackend):
+    """Base for the engines that query an Arrow view of the frame.
+
+    The view is built from the loaded frame. Numerical columns are shared
+    with pandas, but text columns are copied into Arrow strings, so they
+    take twice their memory while a DuckDB or Polars backend is cached.
+    """
+
+    def __init__(self, df):
+        super().__init__(df)
+        # Numerical columns are wrapped without copying where Arrow allows it;
+        # NaN becomes null, which both engines skip like pandas skips NaN
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        self.table = table.append_column(ROW_COLUMN, pa.array(np.arange(len(df), dtype=np.int64)))
+
+    def _finish_describe(self, columns, values, progress):
+        values = [np.nan if v is None else float(v) for v in values]
+        described = pd.DataFrame(
+            np.array(values, dtype=float).reshape(len(columns), len(DESCRIBE_ROWS)).T,
+            index=DESCRIBE_ROWS, columns=list(columns),
+        )
+        if progress:
+            progress(1.0, f"Summarized {len(columns)} columns", described)
+        return described
+
+
+class DuckDBBackend(ArrowBackend):
+    name = "duckdb"
+
+    def __init__(self, df):
+        super().__init__(df)
+        self._connection = duckdb.connect()
+        self._connection.register("data", self.table)
+        self._lock = threading.Lock()
+
+    def _query(self, sql, params, fetch):
+        # The connection is shared by sessions and jobs, so one query at a
+        # time; DuckDB still runs each query on all cores
+        with self._lock:
+            return fetch(self._connection.execute(sql, params))
+
+    def _column_sql(self, column):
+        quoted = '"' + column.replace('"', '""') + '"'
+        # Category columns arrive as dictionaries; compare them as text, like pandas
+        return f"CAST({quoted} AS VARCHAR)" if self._is_text(column) else quoted
+
+    def _where(self, tree, params):
+        op, children = tree
+        if not children:
+            return "TRUE"
+        parts = []
+        for child in children:
+            if isinstance(child, Condition):
+                column = self._column_sql(child.column)
+                if child.op == "=":
+                    parts.append(f"{column} IN ({', '.join('?' * len(child.value))})")
+                    params.extend(child.value)
+                elif child.op == "!=":
+                    # Missing values differ from every value, as in pandas
+                    parts.append(f"{column} IS DISTINCT FROM ?")
+                    params.append(child.value)
+                else:
+                    parts.append(f"{column} {child.op} ?")
+                    params.append(child.value)
+            else:
+                parts.append(self._where(child, params))
+        return "(" + f" {op} ".join(parts) + ")"
+
+    @traced("compute")
+    def positions(self, tree):
+        if not tree[1]:
+            return None
+        params = []
+        sql = f"SELECT {ROW_COLUMN} FROM data WHERE {self._where(tree, params)} ORDER BY {ROW_COLUMN}"
+        return self._query(sql, params, lambda result: result.fetchnumpy()[ROW_COLUMN])
+
+    @traced("compute")
+    def describe(self, tree, columns, progress=None):
+        aggregates = []
+        for column in columns:
+            value = f"CAST({self._column_sql(column)} AS DOUBLE)"
+            aggregates += [
+                f"count({value})", f"avg({value})", f"stddev_samp({value})", f"min({value})",
+                f"quantile_cont({value}, 0.25)", f"quantile_cont({value}, 0.5)",
+                f"quantile_cont({value}, 0.75)", f"max({value})",
+            ]
+        params = []
+        sql = f"SELECT {', '.join(aggregates)} FROM data WHERE {self._where(tree, params)}"
+        return self._finish_describe(columns, self._query(sql, params, lambda result: result.fetchone()), progress)
+
+    @traced("compute")
+    def value_counts(self, tree, column):
+        params = []
+        value = self._column_sql(column)
+        sql = (f"SELECT {value} AS value, count(*) AS n, min({ROW_COLUMN}) AS first FROM data "
+               f"WHERE {self._where(tree, params)} AND {value} IS NOT NULL GROUP BY {value} ORDER BY first")
+        result = self._query(sql, params, lambda result: result.fetchnumpy())
+        return self._counts_series(column, result["value"], result["n"])
+
+
+class PolarsBackend(ArrowBackend):
+    name = "polars"
+
+    def __init__(self, df):
+        super().__init__(df)
+        self.frame = pl.from_arrow(self.table)
+
+    def _column_expr(self, column):
+        # Category columns arrive as categoricals; compare them as text, like pandas
+        return pl.col(column).cast(pl.String) if self._is_text(column) else pl.col(column)
+
+    def _is_in(self, name, column, values):
+        # is_in needs one type on both sides, and picked and typed numbers mix ints and floats
+        if pd.api.types.is_integer_dtype(self.df[name].dtype):
+            # Compared as integers, so values past 2**53 keep every digit; a
+            # value with a fraction equals no integer, as in pandas
+            return column.is_in([int(v) for v in values if float(v).is_integer()])
+        if self._is_numeric(name):
+            # Widening float32 to float64 is exact, so 0.1 still misses float32(0.1), as in pandas
+            return column.cast(pl.Float64).is_in([float(v) for v in values])
+        return column.is_in(list(values))
+
+    def _predicate(self, tree):
+        op, children = tree
+        if not children:
+            return pl.lit(True)
+        parts = []
+        for child in children:
+            if isinstance(child, Condition):
+                column = self._column_expr(child.column)
+                if child.op == "=":
+                    parts.append(self._is_in(child.column, column, child.value))
+                elif child.op == "!=":
+                    # Missing values differ from every value, as in pandas
+                    parts.append(column.ne_missing(child.value))
+                else:
+                    compare = {">": column.gt, "<": column.lt, ">=": column.ge, "<=": column.le}[child.op]
+                    parts.append(compare(child.value))
+            else:
+                parts.append(self._predicate(child))
+        return reduce((lambda a, b: a & b) if op == "AND" else (lambda a, b: a | b), parts)
+
+    @traced("compute")
+    def positions(self, tree):
+        if not tree[1]:
+            return None
+        matching = self.frame.lazy().filter(self._predicate(tree)).select(ROW_COLUMN).collect()
+        return matching[ROW_COLUMN].to_numpy()
+
+    @traced("compute")
+    def describe(self, tree, columns, progress=None):
+        aggregates = []
+        for i, column in enumerate(columns):
+            value = self._column_expr(column).cast(pl.Float64)
+            aggregates += [
+                value.count().alias(f"{i}_count"), value.mean().alias(f"{i}_mean"),
+                value.std().alias(f"{i}_std"), value.min().alias(f"{i}_min"),
+                value.quantile(0.25, "linear").alias(f"{i}_25"), value.quantile(0.5, "linear").alias(f"{i}_50"),
+                value.quantile(0.75, "linear").alias(f"{i}_75"), value.max().alias(f"{i}_max"),
+            ]
+        row = self.frame.lazy().filter(self._predicate(tree)).select(aggregates).collect().row(0)
+        return self._finish_describe(columns, row, progress)
+
+    @traced("compute")
+    def value_counts(self, tree, column):
+        value = self._column_expr(column)
+        counts = (
+            self.frame.lazy()
+            .filter(self._predicate(tree) & value.is_not_null())
+            .group_by(value.alias("value"))
+            .agg(pl.len().alias("n"), pl.col(ROW_COLUMN).min().alias("first"))
+            .sort("first")
+            .collect()
+        )
+        return self._counts_series(column, counts["value"].to_numpy(), counts["n"].to_numpy())
+
+
+@st.cache_resource(max_entries=16)
+def get_backend(name, key, _df):
+    """Backend `name` for the DataFrame stored under `key`, shared by every session.
+
+    Falls back to pandas when the engine is not installed or the frame has
+    columns Arrow cannot hold (mixed types in one column). Dropped, with
+    its Arrow view, when the store evicts the frame.
+    """
+    try:
+        if name == "duckdb" and duckdb is not None:
+            return DuckDBBackend(_df)
+        if name == "polars" and pl is not None:
+            return PolarsBackend(_df)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    return PandasBackend(_df, get_engine(key, _df))
+
+
+@on_evict
+def _drop_backends(key):
+    for name in BACKENDS:
+        get_backend.clear(name, key, None)
+
+
+def backend_selector():
+    """Runtime choice of query backend, among the installed ones."""
+    names = available_backends()
+    default = DEFAULT_BACKEND if DEFAULT_BACKEND in names else "pandas"
+    return st.selectbox("Query backend:", names, index=names.index(default),
+                        help="Engine used for filtering and summaries; the results are the same.")
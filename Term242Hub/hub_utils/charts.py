@@ -0,0 +1,197 @@
+"""Browser-rendered bar, pie, histogram and box charts.
+
+The server only aggregates: counts per value, counts per bin, or the
+quartiles, whiskers and outliers of a box. It sends that small table with a
+Vega-Lite spec, and the browser draws the chart. No figure is created on the
+server, and the payload depends on the number of bars or boxes, not on the
+number of rows.
+
+`plot_chart` covers the dashboard's Histogram, Countplot and Boxplot plots
+in the layouts seaborn gives them. The colours of histograms and countplots
+are the nine most frequent hue levels plus "Other", as in the aggregated
+scatter and line plots. Plots it cannot express return None and are drawn
+with matplotlib, as before.
+"""
+import numpy as np
+import pandas as pd
+
+from hub_utils.aggplot import hue_levels
+from hub_utils.tracing import traced
+
+# Number of bins of the dashboard's histograms, as in sns.histplot(bins=20)
+PLOT_BINS = 20
+
+
+def _titled(spec, title):
+    if title:
+        spec["title"] = title
+    return spec
+
+
+def counts_table(counts):
+    """Table of a value_counts() result, keeping its order."""
+    return pd.DataFrame({
+        "value": [str(value) for value in counts.index],
+        "count": counts.to_numpy(dtype=np.int64),
+        "rank": np.arange(len(counts)),
+    })
+
+
+def bar_spec(x_title, title=None, y_title="Count", hue_title=None):
+    """Bars of a `counts_table`, in the table's order; dodged by "hue" when there is one."""
+    encoding = {
+        "x": {"field": "value", "type": "nominal", "sort": None, "title": x_title},
+        "y": {"field": "count", "type": "quantitative", "title": y_title},
+    }
+    if hue_title is not None:
+        encoding["color"] = {"field": "hue", "type": "nominal", "sort": None, "title": hue_title}
+        encoding["xOffset"] = {"field": "hue", "type": "nominal", "sort": None}
+    return _titled({"mark": {"type": "bar", "tooltip": True}, "encoding": encoding}, title)
+
+
+def pie_spec(color_title, title=None):
+    """Pie of a `counts_table`, with the share of each wedge as its label."""
+    return _titled({
+        "transform": [
+            {"joinaggregate": [{"op": "sum", "field": "count", "as": "total"}]},
+            {"calculate": "datum.count / datum.total", "as": "share"},
+        ],
+        "encoding": {
+            "theta": {"field": "count", "type": "quantitative", "stack": True},
+            "color": {"field": "value", "type": "nominal", "sort": None, "title": color_title},
+            "order": {"field": "rank"},
+        },
+        "layer": [
+            {"mark": {"type": "arc", "outerRadius": 120, "tooltip": True}},
+            {"mark": {"type": "text", "radius": 140},
+             "encoding": {"text": {"field": "share", "type": "quantitative", "format": ".1%"}}},
+        ],
+    }, title)
+
+
+def binned_spec(x_title, title=None, hue_title=None):
+    """Bars of a table of "start", "end" and "count" per bin, overlaid by "hue"."""
+    encoding = {
+        "x": {"field": "start", "type": "quantitative", "bin": {"binned": True}, "title": x_title},
+        "x2": {"field": "end"},
+        "y": {"field": "count", "type": "quantitative", "title": "Count", "stack": None},
+    }
+    mark = {"type": "bar", "tooltip": True}
+    if hue_title is not None:
+        encoding["color"] = {"field": "hue", "type": "nominal", "sort": None, "title": hue_title}
+        mark["opacity"] = 0.5
+    return _titled({"mark": mark, "encoding": encoding}, title)
+
+
+def box_stats(values, label=""):
+    """Box-plot statistics of `values` in the format of `Axes.bxp`, or None without values."""
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return None
+    q1, med, q3 = np.percentile(values, [25, 50, 75])
+    low, high = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+    inside = values[(values >= low) & (values <= high)]
+    return {
+        "label": label, "q1": q1, "med": med, "q3": q3,
+        "fliers": values[(values < low) | (values > high)],
+        "whislo": inside.min() if len(inside) else q1,
+        "whishi": inside.max() if len(inside) else q3,
+    }
+
+
+def box_spec(boxes, value_title, title=None, group_title=None, horizontal=False):
+    """Layered spec drawing `Axes.bxp`-style box statistics, one box per entry."""
+    value, group = ("x", "y") if horizontal else ("y", "x")
+    rows = [
+        {"group": str(box["label"]), **{field: float(box[field]) for field in ("q1", "med", "q3", "whislo", "whishi")}}
+        for box in boxes
+    ]
+    fliers = [{"group": str(box["label"]), "value": float(v)} for box in boxes for v in box["fliers"]]
+    group_encoding = {"field": "group", "type": "nominal", "sort": None, "title": group_title}
+
+    def layer(data, mark, field, field2=None):
+        encoding = {
+            value: {"field": field, "type": "quantitative", "title": value_title, "scale": {"zero": False}},
+            group: group_encoding,
+        }
+        if field2:
+            encoding[value + "2"] = {"field": field2}
+        return {"data": {"values": data}, "mark": mark, "encoding": encoding}
+
+    layers = [
+        layer(rows, {"type": "rule"}, "whislo", "whishi"),
+        layer(rows, {"type": "bar", "size": 40, "tooltip": True}, "q1", "q3"),
+        layer(rows, {"type": "tick", "size": 40, "thickness": 2, "color": "white"}, "med"),
+    ]
+    if fliers:
+        layers.append(layer(fliers, {"type": "point"}, "value"))
+    return _titled({"layer": layers}, title)
+
+
+def _order(series):
+    """Order of a column's levels: categories, sorted numbers, or first appearance."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.categories.tolist()
+    levels = series.dropna().unique().tolist()
+    if pd.api.types.is_numeric_dtype(series):
+        levels.sort()
+    return levels
+
+
+def _grouped_counts(data, x, hue):
+    """Counts per level of `x` (and hue level), like sns.countplot."""
+    if hue is None:
+        counts = data[x].value_counts().reindex(_order(data[x]), fill_value=0)
+        return counts_table(counts)
+    codes, levels = hue_levels(data, hue)
+    keep = codes >= 0
+    hues = pd.Categorical.from_codes(codes[keep], categories=levels)
+    counts = pd.crosstab(data[x][keep], hues, dropna=False).reindex(_order(data[x]), fill_value=0)
+    counts = counts.stack()
+    return pd.DataFrame({
+        "value": [str(value) for value in counts.index.get_level_values(0)],
+        "hue": [str(level) for level in counts.index.get_level_values(1)],
+        "count": counts.to_numpy(dtype=np.int64),
+    })
+
+
+def _binned_counts(data, x, hue):
+    """Counts per bin (and hue level), like sns.histplot(bins=20)."""
+    values = pd.to_numeric(data[x], errors="coerce").to_numpy(dtype=float)
+    present = ~np.isnan(values)
+    edges = np.histogram_bin_edges(values[present], bins=PLOT_BINS) if present.any() else np.linspace(0, 1, PLOT_BINS + 1)
+    if hue is None:
+        counts, _ = np.histogram(values[present], bins=edges)
+        return pd.DataFrame({"start": edges[:-1], "end": edges[1:], "count": counts})
+    codes, levels = hue_levels(data, hue)
+    tables = []
+    for k, level in enumerate(levels):
+        counts, _ = np.histogram(values[present & (codes == k)], bins=edges)
+        tables.append(pd.DataFrame({"start": edges[:-1], "end": edges[1:], "count": counts, "hue": str(level)}))
+    return pd.concat(tables, ignore_index=True)
+
+
+@traced("compute")
+def plot_chart(data, spec):
+    """(table, Vega-Lite spec) for a dashboard `PlotSpec`, or None if it needs matplotlib."""
+    x, hue = spec.x, spec.hue
+    numeric_x = pd.api.types.is_numeric_dtype(data[x])
+    if spec.plot_type == "Histogram" and numeric_x:
+        return _binned_counts(data, x, hue), binned_spec(x, hue_title=hue)
+    if spec.plot_type in ("Histogram", "Countplot"):
+        # Histograms of text columns count each value, like countplots
+        return _grouped_counts(data, x, hue), bar_spec(x, hue_title=hue)
+    if spec.plot_type == "Boxplot" and numeric_x:
+        if hue is None:
+            boxes = [box_stats(data[x].to_numpy(dtype=float), x)]
+        elif not pd.api.types.is_numeric_dtype(data[hue]):
+            # One horizontal box per hue level, as sns.boxplot(x=x, y=hue) draws them
+            groups = dict(list(data.groupby(hue, observed=True)[x]))
+            boxes = [box_stats(groups[level].to_numpy(dtype=float), level)
+                     for level in _order(data[hue]) if level in groups]
+        else:
+            return None
+        boxes = [box for box in boxes if box is not None]
+        return None, box_spec(boxes, x, group_title=hue, horizontal=True)
+    return None
@@ -0,0 +1,114 @@
+"""Memory-saving dtypes for freshly parsed CSVs.
+
+`pd.read_csv` stores text as one Python string per cell and every number as
+64 bits. `compact_frame` converts, column by column:
+
+- text with few distinct values (grades, categories) to `category`;
+- other all-string text to Arrow-backed strings;
+- integers to the smallest integer type that holds their range;
+- floats to float32 when every value survives the round trip exactly.
+
+Nothing is converted in a way that changes a value. Sums over a float32
+column are another matter: pandas and NumPy accumulate them in float32, so
+a mean or standard deviation computed straight from a compacted column can
+differ from the float64 one after about seven significant digits. The
+hub's summaries and tests convert float32 to float64 before aggregating
+(see `hub_utils.summary`), and plots only need values, so they are the
+same as before compaction.
+"""
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Text columns whose distinct values are at most this share of the rows become categories
+CATEGORY_MAX_RATIO = 0.5
+_MAX_REPORTS = 64
+
+
+def arrow_string_dtype():
+    """Arrow-backed strings that use NaN for missing values, like object columns."""
+    try:
+        return pd.StringDtype("pyarrow", na_value=np.nan)
+    except TypeError:
+        # pandas 2.1 and 2.2 spell the same dtype "pyarrow_numpy"
+        return pd.StringDtype("pyarrow_numpy")
+
+
+def _is_text(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return False
+    if pd.api.types.is_string_dtype(series.dtype) and series.dtype != object:
+        return True
+    # Object columns qualify only if every non-missing value is a string
+    return series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) in ("string", "empty")
+
+
+def compact_series(series):
+    if _is_text(series):
+        non_missing = series.count()
+        if non_missing and series.nunique() <= CATEGORY_MAX_RATIO * non_missing:
+            return series.astype("category")
+        if series.dtype == object:
+            try:
+                return series.astype(arrow_string_dtype())
+            except ImportError:
+                return series
+        return series
+    if pd.api.types.is_integer_dtype(series.dtype) and not pd.api.types.is_extension_array_dtype(series.dtype):
+        return pd.to_numeric(series, downcast="integer")
+    if pd.api.types.is_float_dtype(series.dtype) and series.dtype == np.float64:
+        values = series.to_numpy()
+        as_float32 = values.astype(np.float32)
+        # Same value after the round trip, or missing in both
+        with np.errstate(over="ignore"):
+            if np.array_equal(as_float32.astype(np.float64), values, equal_nan=True):
+                return series.astype(np.float32)
+    return series
+
+
+def compact_frame(df):
+    """Return the compacted frame and a per-column memory report."""
+    compacted = {}
+    rows = []
+    for column in df.columns:
+        before = df[column]
+        after = compact_series(before)
+        compacted[column] = after
+        rows.append({
+            "Column": column,
+            "Before dtype": str(before.dtype),
+            "After dtype": str(after.dtype),
+            "Before (MB)": before.memory_usage(deep=True, index=False) / 2 ** 20,
+            "After (MB)": after.memory_usage(deep=True, index=False) / 2 ** 20,
+        })
+    report = pd.DataFrame(rows, columns=["Column", "Before dtype", "After dtype", "Before (MB)", "After (MB)"])
+    return pd.DataFrame(compacted, index=df.index), report
+
+
+@st.cache_resource
+def _reports():
+    return OrderedDict()
+
+
+def save_report(key, report):
+    reports = _reports()
+    reports[key] = report
+    while len(reports) > _MAX_REPORTS:
+        reports.popitem(last=False)
+
+
+def memory_report(key):
+    return _reports().get(key)
+
+
+def show_memory_report(key):
+    """Expander with the before/after memory of a dataset loaded by `load_csv`."""
+    report = memory_report(key)
+    if report is None:
+        return
+    before, after = report["Before (MB)"].sum(), report["After (MB)"].sum()
+    saved = 1 - after / before if before else 0.0
+    with st.expander(f"Memory: {before:,.1f} MB as parsed, {after:,.1f} MB after compacting dtypes ({saved:.0%} saved)"):
+        st.dataframe(report.round(3), hide_index=True)
@@ -0,0 +1,158 @@
+"""Shared dataset store for uploaded CSV files.
+
+Datasets are keyed by the SHA-256 of the uploaded bytes, so a file is parsed
+once per server process and every session and sub-app that uploads the same
+file gets the same DataFrame back. The store keeps a memory budget and drops
+the least recently used datasets when it is exceeded. Datasets uploaded as
+several CSV shards (see `hub_utils.shards`) are keyed by their shards' hashes.
+
+Helpers that cache objects built on a stored frame key them by the store
+key and register an `on_evict` callback that drops them, so an evicted
+frame is not kept alive by them.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from hub_utils.compaction import compact_frame, save_report
+from hub_utils.tracing import span
+
+# Shared frames must behave as read-only: with copy-on-write, a sub-app that
+# modifies its DataFrame gets a private copy instead of changing the cached one.
+# pandas 3 always works this way, older versions need the option turned on.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+# Memory budget for all resident datasets (override with HUB_DATASET_BUDGET_MB)
+DEFAULT_BUDGET_MB = 1024
+
+# Called with the key of every dataset the store evicts
+_evict_callbacks = []
+
+
+def on_evict(callback):
+    """Register `callback(key)` to run when a dataset is evicted; usable as a decorator."""
+    _evict_callbacks.append(callback)
+    return callback
+
+
+class DatasetStore:
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._frames = OrderedDict()  # key -> (DataFrame, nbytes), oldest first
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._frames:
+                return None
+            self._frames.move_to_end(key)
+            return self._frames[key][0]
+
+    def get_or_load(self, key, loader):
+        """Return the dataset stored under `key`, calling `loader()` on a miss."""
+        df = self.get(key)
+        if df is not None:
+            return df
+
+        # One lock per key, so two sessions uploading the same file parse it once
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            df = self.get(key)
+            if df is None:
+                df = loader()
+                self.put(key, df)
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return df
+
+    def put(self, key, df):
+        nbytes = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            self._frames[key] = (df, nbytes)
+            self._frames.move_to_end(key)
+            evicted = self._evict()
+        # Outside the lock, as the callbacks may take locks of their own
+        for evicted_key in evicted:
+            for callback in _evict_callbacks:
+                callback(evicted_key)
+
+    def resident_bytes(self):
+        with self._lock:
+            return sum(nbytes for _, nbytes in self._frames.values())
+
+    def _evict(self):
+        # Drop least recently used datasets, but always keep the newest one
+        total = sum(nbytes for _, nbytes in self._frames.values())
+        evicted = []
+        while total > self.budget_bytes and len(self._frames) > 1:
+            key, (_, nbytes) = self._frames.popitem(last=False)
+            total -= nbytes
+            evicted.append(key)
+        return evicted
+
+
+@st.cache_resource
+def get_store():
+    budget_mb = int(os.environ.get("HUB_DATASET_BUDGET_MB", DEFAULT_BUDGET_MB))
+    return DatasetStore(budget_mb * 1024 * 1024)
+
+
+class ShardedUpload:
+    """A dataset uploaded as several CSV shards, already spilled to disk by `hub_utils.shards`."""
+
+    def __init__(self, file_id, name, key, dataset, shard_names, size):
+        self.file_id = file_id
+        self.name = name
+        self.key = key
+        self.dataset = dataset  # SpilledDataset over the parts of every shard
+        self.shard_names = shard_names
+        self.size = size  # total size of the CSV shards, uncompressed
+
+
+def dataset_key(uploaded_file):
+    """Content hash of an uploaded file, remembered for the session."""
+    if isinstance(uploaded_file, ShardedUpload):
+        return uploaded_file.key
+    hashes = st.session_state.setdefault("_dataset_hashes", {})
+    if uploaded_file.file_id not in hashes:
+        hashes[uploaded_file.file_id] = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    return hashes[uploaded_file.file_id]
+
+
+def array_key(values):
+    """Content hash of an in-memory array, for data that was not uploaded."""
+    values = np.ascontiguousarray(values)
+    digest = hashlib.sha256(f"{values.dtype}{values.shape}".encode())
+    digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+def load_csv(uploaded_file):
+    """Parse an uploaded CSV, reusing the shared copy if it was seen before.
+
+    Columns are converted to compact dtypes after parsing; the memory saved
+    is kept as a report under the dataset's key.
+    """
+    key = dataset_key(uploaded_file)
+
+    def parse():
+        with span("parse"):
+            if isinstance(uploaded_file, ShardedUpload):
+                # The shards were parsed when they were uploaded; combine their columns once
+                raw = uploaded_file.dataset.read()
+            else:
+                raw = pd.read_csv(io.BytesIO(uploaded_file.getvalue()))
+            df, report = compact_frame(raw)
+        save_report(key, report)
+        return df
+
+    return get_store().get_or_load(key, parse)
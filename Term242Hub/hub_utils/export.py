@@ -0,0 +1,106 @@
+"""Streaming export of a data slice.
+
+The export file is written batch by batch to a temporary file: one Parquet
+row group, Arrow record batch or compressed CSV block per batch, so neither
+the slice in another format nor the uncompressed output is ever held in
+memory. In large file mode the batches come straight from the spilled
+dataset, with the filter applied chunk by chunk.
+
+The file is only written when the download button is clicked. Streamlit
+then keeps the finished (compressed) file in memory while it serves it.
+"""
+import os
+import tempfile
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+from hub_utils.ingest import SPILL_DIR
+
+EXPORT_BATCH_ROWS = 100_000
+
+# name -> (file extension, MIME type, compression codec)
+EXPORT_FORMATS = {
+    "Parquet": (".parquet", "application/vnd.apache.parquet", "zstd"),
+    "Feather": (".feather", "application/vnd.apache.arrow.file", "lz4"),
+    "CSV (gzip)": (".csv.gz", "application/gzip", "gzip"),
+    "CSV (zstd)": (".csv.zst", "application/zstd", "zstd"),
+}
+
+
+def available_formats():
+    return [name for name, (_, _, codec) in EXPORT_FORMATS.items() if pa.Codec.is_available(codec)]
+
+
+def frame_batches(df, rows=EXPORT_BATCH_ROWS):
+    """Batches of an in-memory frame (views, not copies)."""
+    yield df.iloc[:rows]
+    for start in range(rows, len(df), rows):
+        yield df.iloc[start:start + rows]
+
+
+def spilled_batches(dataset, columns, positions=None):
+    """Batches of a spilled dataset, keeping only the rows at `positions` (all if None)."""
+    offset = 0
+    for chunk in dataset.iter_chunks(columns):
+        n_rows = len(chunk)
+        if positions is not None:
+            # Positions are sorted, so each chunk's rows are one contiguous run of them
+            start, stop = np.searchsorted(positions, [offset, offset + n_rows])
+            chunk = chunk.iloc[positions[start:stop] - offset]
+        offset += n_rows
+        yield chunk
+
+
+def write_export(batches, fmt, path):
+    """Write the batches to `path` in format `fmt`, one batch at a time."""
+    _, _, codec = EXPORT_FORMATS[fmt]
+    writer = schema = None
+    try:
+        for i, batch in enumerate(batches):
+            if i and not len(batch):
+                continue
+            if fmt.startswith("CSV"):
+                if writer is None:
+                    writer = pa.CompressedOutputStream(path, codec)
+                writer.write(batch.to_csv(index=False, header=i == 0).encode())
+                continue
+            table = pa.Table.from_pandas(batch, schema=schema, preserve_index=False)
+            if writer is None:
+                schema = table.schema
+                if fmt == "Parquet":
+                    writer = pq.ParquetWriter(path, schema, compression=codec)
+                else:
+                    writer = pa.ipc.new_file(path, schema, options=pa.ipc.IpcWriteOptions(compression=codec))
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def export_bytes(make_batches, fmt):
+    """Contents of the export file, written through a temporary file."""
+    os.makedirs(SPILL_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=SPILL_DIR, suffix=EXPORT_FORMATS[fmt][0])
+    os.close(fd)
+    try:
+        write_export(make_batches(), fmt, path)
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+
+@st.fragment
+def export_controls(make_batches, key, file_stem="slice"):
+    """Format picker and download button; `make_batches()` is only called on click."""
+    formats = available_formats()
+    format_col, button_col = st.columns([2, 1], vertical_alignment="bottom")
+    fmt = format_col.selectbox("Export format:", formats, key=f"{key}_format")
+    extension, mime, _ = EXPORT_FORMATS[fmt]
+    button_col.download_button(
+        "Download", data=lambda: export_bytes(make_batches, fmt), file_name=f"{file_stem}{extension}",
+        mime=mime, key=f"{key}_download", on_click="ignore",
+    )
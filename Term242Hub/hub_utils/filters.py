@@ -0,0 +1,154 @@
+"""Filter engine for the data slicing interface.
+
+Conditions are compiled into a boolean-mask expression tree instead of a
+`df.query` string. AND binds tighter than OR, as in Python and `df.query`,
+so `a AND b OR c` means `(a AND b) OR c`. Every column gets a cached index
+(categorical codes for equality, a sorted copy for range predicates) and
+every condition's mask is cached, so adding one condition only evaluates
+that condition.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from hub_utils.datastore import on_evict
+from hub_utils.tracing import traced
+
+OPERATORS = ["=", "!=", ">", "<", ">=", "<="]
+
+# `value` is a tuple of accepted values for "=", a single value otherwise
+Condition = namedtuple("Condition", ["column", "op", "value"])
+
+_MAX_CACHED_MASKS = 64
+
+
+def build_tree(conditions, logic_operators):
+    """Group conditions into an OR of AND groups.
+
+    `logic_operators[i]` joins `conditions[i]` and `conditions[i + 1]`. Empty
+    conditions (None) are skipped together with the operator that follows
+    them, matching how the slicing UI ignores blank inputs.
+    """
+    groups = []
+    joiner = None
+    for i, cond in enumerate(conditions):
+        if cond is not None:
+            if not groups or joiner == "OR":
+                groups.append([cond])
+            else:
+                groups[-1].append(cond)
+            joiner = None
+        if i < len(logic_operators) and groups and joiner is None:
+            joiner = logic_operators[i]
+    return ("OR", [("AND", group) for group in groups])
+
+
+class ColumnIndex:
+    def __init__(self, series):
+        self.n_rows = len(series)
+        self._series = series
+        self.codes, self.uniques = pd.factorize(series)
+        self._code_of = {value: code for code, value in enumerate(self.uniques)}
+        self._sorted = None
+
+    def equals(self, values):
+        codes = [self._code_of[v] for v in values if v in self._code_of]
+        return np.isin(self.codes, codes)
+
+    def _sorted_arrays(self):
+        # Built on first use, only columns used in range predicates pay for it
+        if self._sorted is None:
+            positions = np.flatnonzero(self.codes >= 0)
+            values = self._series.to_numpy()[positions]
+            order = np.argsort(values, kind="stable")
+            self._sorted = (values[order], positions[order])
+        return self._sorted
+
+    def compare(self, op, value):
+        values, positions = self._sorted_arrays()
+        side = "right" if op in (">", "<=") else "left"
+        cut = np.searchsorted(values, value, side=side)
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[positions[cut:] if op in (">", ">=") else positions[:cut]] = True
+        return mask
+
+
+class FilterEngine:
+    def __init__(self, df):
+        self.df = df
+        self._indexes = {}
+        self._masks = OrderedDict()
+        self._lock = threading.RLock()
+
+    def index(self, column):
+        with self._lock:
+            if column not in self._indexes:
+                self._indexes[column] = ColumnIndex(self.df[column])
+            return self._indexes[column]
+
+    def parse_value(self, column, text):
+        """Convert a typed-in value to the column's type."""
+        series = self.df[column]
+        if pd.api.types.is_bool_dtype(series):
+            return text.strip().lower() in ("true", "1", "yes")
+        if pd.api.types.is_numeric_dtype(series):
+            try:
+                return float(text)
+            except ValueError:
+                raise ValueError(f"'{text}' is not a number, but column '{column}' is numerical")
+        return text
+
+    def parse_condition(self, cond):
+        """`cond` with its typed-in values converted to the column's type."""
+        if cond.op == "=":
+            # Picked values already have the column's type, values typed into the picker are text
+            values = (self.parse_value(cond.column, v) if isinstance(v, str) else v for v in cond.value)
+            return cond._replace(value=tuple(values))
+        return cond._replace(value=self.parse_value(cond.column, cond.value))
+
+    def condition_mask(self, cond):
+        with self._lock:
+            if cond in self._masks:
+                self._masks.move_to_end(cond)
+                return self._masks[cond]
+
+            index = self.index(cond.column)
+            if cond.op == "=":
+                mask = index.equals(cond.value)
+            elif cond.op == "!=":
+                mask = ~index.equals([cond.value])
+            else:
+                mask = index.compare(cond.op, cond.value)
+
+            self._masks[cond] = mask
+            while len(self._masks) > _MAX_CACHED_MASKS:
+                self._masks.popitem(last=False)
+            return mask
+
+    @traced("compute")
+    def evaluate(self, tree):
+        """Boolean mask for a tree from `build_tree`, or None if it has no conditions."""
+        op, children = tree
+        if not children:
+            return None
+        masks = [self.condition_mask(child) if isinstance(child, Condition) else self.evaluate(child)
+                 for child in children]
+        reduce = np.logical_and.reduce if op == "AND" else np.logical_or.reduce
+        return reduce(masks)
+
+
+@st.cache_resource(max_entries=16)
+def get_engine(key, _df):
+    """Filter engine for the DataFrame stored under `key`, shared by every session.
+
+    Dropped with its indexes and masks when the store evicts the frame.
+    """
+    return FilterEngine(_df)
+
+
+@on_evict
+def _drop_engine(key):
+    get_engine.clear(key, None)
@@ -0,0 +1,25 @@
+"""Helpers for pages split into `st.fragment` sections.
+
+A widget inside a fragment reruns only that fragment. That is right as long
+as nothing else on the page depends on what the fragment computes; when it
+does, the fragment publishes a signature of its output with
+`publish_signature`, and the whole page reruns only if that signature
+changed.
+"""
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+
+def in_fragment_rerun():
+    """True while Streamlit reruns a single fragment rather than the whole page."""
+    ctx = get_script_run_ctx()
+    return bool(ctx and ctx.fragment_ids_this_run)
+
+
+def publish_signature(name, signature):
+    """Record a fragment's output signature; rerun the page when a fragment rerun changed it."""
+    key = f"_fragment_signature_{name}"
+    changed = key in st.session_state and st.session_state[key] != signature
+    st.session_state[key] = signature
+    if changed and in_fragment_rerun():
+        st.rerun(scope="app")
@@ -0,0 +1,60 @@
+"""Histograms that can be rebinned instantly.
+
+A column is sorted once; the counts for any number of equal-width bins then
+come from one `searchsorted` of the bin edges into the sorted values, in
+O(bins · log n) instead of a pass over every value. The edges and the
+half-open bins (the last one closed) are those of `np.histogram`, which
+pandas' `plot(kind="hist")` used before, so the counts are the same.
+
+The counts are drawn as a native Vega-Lite bar chart, which the browser
+renders, rather than as a matplotlib PNG.
+"""
+import numpy as np
+import pandas as pd
+
+from hub_utils.tracing import traced
+
+
+class SortedColumn:
+    def __init__(self, values):
+        # Sorted as float64, like the values np.histogram compares with the edges
+        self.values = np.sort(pd.to_numeric(pd.Series(values), errors="coerce").dropna().to_numpy(dtype=float))
+
+    def __len__(self):
+        return len(self.values)
+
+    def edges(self, bins):
+        low, high = self.values[0], self.values[-1]
+        if low == high:
+            # np.histogram widens a zero range the same way
+            low, high = low - 0.5, high + 0.5
+        return np.linspace(low, high, bins + 1)
+
+    def counts(self, bins):
+        """Bin edges and the number of values in each bin."""
+        edges = self.edges(bins)
+        inner = np.searchsorted(self.values, edges[1:-1], side="left")
+        positions = np.concatenate([[0], inner, [len(self.values)]])
+        return edges, np.diff(positions)
+
+    def table(self, bins):
+        edges, counts = self.counts(bins)
+        return pd.DataFrame({"start": edges[:-1], "end": edges[1:], "count": counts})
+
+
+@traced("compute")
+def sort_column(values):
+    return SortedColumn(values)
+
+
+def histogram_spec(column, title=None):
+    """Vega-Lite spec for a `SortedColumn.table`."""
+    return {
+        "title": title or f"Histogram of {column}",
+        "mark": {"type": "bar", "tooltip": True},
+        "encoding": {
+            "x": {"field": "start", "type": "quantitative", "bin": {"binned": True}, "title": column},
+            "x2": {"field": "end"},
+            "y": {"field": "count", "type": "quantitative", "title": "Frequency"},
+        },
+    }
@@ -0,0 +1,282 @@
+"""Out-of-core ingestion of large CSV uploads.
+
+Large uploads are streamed through `pd.read_csv` in chunks and written to a
+spill directory as one Parquet file per chunk. Column types are inferred as
+the chunks arrive and widened when a later chunk needs it (int -> float ->
+string), so the spill reads back with the types pandas infers over the
+whole file. Numbers widen by a cast, but text cannot be rebuilt from parsed
+values ("00123" was parsed to 123), so when a column ends up as text the
+file is spilled again with that column read as text. Analysis code then
+reads back only the columns it needs, so memory grows with the columns in
+use instead of the file size.
+
+Spills are reused across sessions while they fit in the disk budget
+(HUB_SPILL_BUDGET_MB). Every open marks a spill as used, and after each
+new spill the least recently used ones beyond the budget are deleted. A
+page that still holds a deleted spill spills its upload again.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+from hub_utils.datastore import ShardedUpload, dataset_key, get_store
+from hub_utils.tracing import traced
+
+# Uploads above this size use the out-of-core mode by default
+LARGE_FILE_MB = int(os.environ.get("HUB_LARGE_FILE_MB", 200))
+CHUNK_ROWS = 250_000
+SPILL_DIR = os.environ.get("HUB_SPILL_DIR", os.path.join(tempfile.gettempdir(), "term242hub_spill"))
+# Disk budget for spills (override with HUB_SPILL_BUDGET_MB)
+SPILL_BUDGET_MB = int(os.environ.get("HUB_SPILL_BUDGET_MB", 10 * 1024))
+
+# Column kinds in widening order, with the Arrow type each one is stored as
+KIND_ORDER = ["bool", "int", "float", "string"]
+ARROW_TYPES = {"bool": pa.bool_(), "int": pa.int64(), "float": pa.float64(), "string": pa.large_string()}
+
+
+def column_kind(series):
+    if pd.api.types.is_bool_dtype(series):
+        return "bool"
+    # Booleans with missing values are parsed into an object column
+    if pd.api.types.is_object_dtype(series) and pd.api.types.infer_dtype(series, skipna=True) == "boolean":
+        return "bool"
+    if pd.api.types.is_integer_dtype(series):
+        return "int"
+    if pd.api.types.is_float_dtype(series):
+        return "float"
+    return "string"
+
+
+def widen(kind_a, kind_b):
+    # pandas reads a column mixing booleans and numbers as text
+    if kind_a != kind_b and "bool" in (kind_a, kind_b):
+        return "string"
+    return max(kind_a, kind_b, key=KIND_ORDER.index)
+
+
+def settle_kinds(columns, kinds, null_columns):
+    """Final kinds from the ones seen in chunks that had values.
+
+    A chunk where a column is all missing is no evidence of its type, but
+    its missing values turn an int column into a float one. Columns with no
+    values at all are floats, as pandas reads them.
+    """
+    settled = {}
+    for col in columns:
+        kind = kinds.get(col, "float")
+        settled[col] = "float" if kind == "int" and col in null_columns else kind
+    return settled
+
+
+class SpilledDataset:
+    """A CSV stored column-wise on disk, read back one projection at a time."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.kinds = meta["kinds"]
+        self.columns = list(self.kinds)
+        # Columns without a single value, whose kind is only a default
+        self.empty_columns = meta.get("empty_columns", [])
+        self.n_rows = meta["n_rows"]
+        self.parts = [os.path.join(path, name) for name in meta["parts"]]
+
+    def numeric_columns(self):
+        return [col for col, kind in self.kinds.items() if kind in ("int", "float")]
+
+    def _read_part(self, part, columns):
+        table = pq.read_table(part, columns=columns)
+        # Older parts may hold a narrower type than the final one
+        schema = pa.schema([(col, ARROW_TYPES[self.kinds[col]]) for col in columns])
+        return table.cast(schema)
+
+    def iter_chunks(self, columns=None):
+        """Yield the dataset chunk by chunk as DataFrames."""
+        columns = self.columns if columns is None else list(columns)
+        for part in self.parts:
+            yield self._read_part(part, columns).to_pandas()
+
+    @traced("load")
+    def read(self, columns=None):
+        """Load the given columns (all of them by default) into one DataFrame."""
+        columns = self.columns if columns is None else list(columns)
+        if not self.parts:
+            return pd.DataFrame(columns=columns)
+        tables = [self._read_part(part, columns) for part in self.parts]
+        return pa.concat_tables(tables).to_pandas()
+
+    def head(self, n=100):
+        if not self.parts:
+            return pd.DataFrame(columns=self.columns)
+        return self._read_part(self.parts[0], self.columns).slice(0, n).to_pandas()
+
+
+@traced("parse")
+def spill_csv(source, path, chunk_rows=CHUNK_ROWS, text_columns=()):
+    """Stream a CSV into `path` and return the resulting SpilledDataset.
+
+    `text_columns` are read as text instead of being parsed.
+    """
+    if os.path.exists(os.path.join(path, "meta.json")):
+        return SpilledDataset(path)
+
+    # Write into a scratch directory first so a half-written spill is never reused
+    scratch = tempfile.mkdtemp(dir=os.path.dirname(path))
+    try:
+        columns, kinds, null_columns, parsed = None, {}, set(), set()
+        parts = []
+        n_rows = 0
+        dtype = dict.fromkeys(text_columns, str) or None
+        for i, chunk in enumerate(pd.read_csv(source, chunksize=chunk_rows, dtype=dtype)):
+            if columns is None:
+                columns = list(chunk.columns)
+            for col in chunk.columns:
+                if chunk[col].isna().all():
+                    null_columns.add(col)
+                    continue
+                kind = column_kind(chunk[col])
+                kinds[col] = widen(kinds[col], kind) if col in kinds else kind
+                if kind != "string":
+                    parsed.add(col)
+            name = f"part-{i:05d}.parquet"
+            pq.write_table(pa.Table.from_pandas(chunk, preserve_index=False), os.path.join(scratch, name))
+            parts.append(name)
+            n_rows += len(chunk)
+
+        retext = [col for col in columns or [] if col in parsed and kinds[col] == "string"]
+        if retext:
+            # Some chunks parsed a text column; read it again as text
+            shutil.rmtree(scratch, ignore_errors=True)
+            source.seek(0)
+            return spill_csv(source, path, chunk_rows, [*text_columns, *retext])
+
+        meta = {
+            "kinds": settle_kinds(columns or [], kinds, null_columns),
+            "empty_columns": [col for col in columns or [] if col not in kinds],
+            "n_rows": n_rows,
+            "parts": parts,
+        }
+        with open(os.path.join(scratch, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        os.replace(scratch, path)
+    except OSError:
+        shutil.rmtree(scratch, ignore_errors=True)
+        # Another session finished the same spill first
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            raise
+    except Exception:
+        shutil.rmtree(scratch, ignore_errors=True)
+        raise
+    return SpilledDataset(path)
+
+
+def spill_exists(dataset):
+    """Whether the spill and every part it reads are still on disk."""
+    return os.path.exists(os.path.join(dataset.path, "meta.json")) and all(map(os.path.exists, dataset.parts))
+
+
+def touch_spill(dataset):
+    """Mark a spill, and the shard spills holding its parts, as just used."""
+    for path in {dataset.path, *(os.path.dirname(part) for part in dataset.parts)}:
+        try:
+            os.utime(os.path.join(path, "meta.json"))
+        except FileNotFoundError:
+            pass
+
+
+def _scan_spills():
+    """path -> (last use, bytes on disk, spill directories its parts live in), for finished spills."""
+    spills = {}
+    for entry in os.scandir(SPILL_DIR):
+        meta_path = os.path.join(entry.path, "meta.json")
+        try:
+            # Scratch directories of spills being written have no meta.json yet
+            with open(meta_path) as f:
+                meta = json.load(f)
+            used = os.stat(meta_path).st_mtime
+            size = sum(item.stat().st_size for item in os.scandir(entry.path) if item.is_file())
+        except (FileNotFoundError, NotADirectoryError, json.JSONDecodeError):
+            continue
+        part_dirs = {os.path.dirname(os.path.join(entry.path, part)) for part in meta["parts"]}
+        spills[entry.path] = (used, size, part_dirs)
+    return spills
+
+
+def prune_spills(keep=(), budget_bytes=None):
+    """Delete the least recently used spills until the rest fit in the disk budget.
+
+    The spills in `keep` (SpilledDatasets) and the shard spills they read are
+    never deleted. A combined spill is deleted with any shard spill it reads.
+    """
+    budget_bytes = SPILL_BUDGET_MB * 1024 * 1024 if budget_bytes is None else budget_bytes
+    if not os.path.isdir(SPILL_DIR):
+        return
+    spills = _scan_spills()
+    protected = {os.path.abspath(p) for dataset in keep
+                 for p in (dataset.path, *(os.path.dirname(part) for part in dataset.parts))}
+    total = sum(size for _, size, _ in spills.values())
+    for path in sorted(spills, key=lambda p: spills[p][0]):
+        if total <= budget_bytes:
+            break
+        if path not in spills or os.path.abspath(path) in protected:
+            continue
+        doomed = [path] + [other for other, (_, _, part_dirs) in spills.items()
+                           if other != path and path in part_dirs]
+        for victim in doomed:
+            shutil.rmtree(victim, ignore_errors=True)
+            total -= spills.pop(victim)[1]
+
+
+def is_large_upload(uploaded_file):
+    return uploaded_file.size > LARGE_FILE_MB * 1024 * 1024
+
+
+@st.cache_resource(show_spinner="Streaming the file to disk...")
+def _open_spilled(key, _uploaded_file):
+    os.makedirs(SPILL_DIR, exist_ok=True)
+    _uploaded_file.seek(0)
+    dataset = spill_csv(_uploaded_file, os.path.join(SPILL_DIR, key))
+    prune_spills(keep=[dataset])
+    return dataset
+
+
+def open_spilled(uploaded_file):
+    """Out-of-core version of `load_csv`: spill the upload once, keyed by its hash."""
+    if isinstance(uploaded_file, ShardedUpload):
+        # Sharded uploads are spilled shard by shard as they arrive
+        dataset = uploaded_file.dataset
+    else:
+        key = dataset_key(uploaded_file)
+        dataset = _open_spilled(key, uploaded_file)
+        if not spill_exists(dataset):
+            # Deleted to keep the spills within their disk budget
+            _open_spilled.clear(key, uploaded_file)
+            dataset = _open_spilled(key, uploaded_file)
+    touch_spill(dataset)
+    return dataset
+
+
+def load_columns(uploaded_file, dataset, columns):
+    """Read some columns of a spilled upload through the dataset store.
+
+    Returns the frame and its store key. The key identifies the loaded
+    columns in the profile, filter and backend caches, as `dataset_key`
+    does for an upload loaded in memory, so they are dropped with the frame.
+    """
+    key = hashlib.sha256("\n".join([dataset_key(uploaded_file), *columns]).encode()).hexdigest()
+    return get_store().get_or_load(key, lambda: dataset.read(columns)), key
+
+
+def out_of_core_toggle(uploaded_file):
+    return st.checkbox(
+        "Large file mode (stream to disk and load only the columns in use)",
+        value=is_large_upload(uploaded_file),
+    )
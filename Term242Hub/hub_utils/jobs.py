@@ -0,0 +1,182 @@
+"""Background jobs for long computations in the sub-apps.
+
+A computation is submitted under a key that identifies its inputs. While it
+runs in the shared worker pool, the page shows its progress (and any partial
+result it has published) in a fragment that polls on its own, so the rest
+of the page stays interactive. When the job finishes, the page reruns once
+to show the result.
+
+Jobs are reused by key: a rerun with unchanged inputs, or another session
+asking for the same thing, attaches to the running or finished job instead
+of starting again. When a session's inputs change, its previous job in that
+slot is cancelled unless another session is still waiting for it.
+
+Job functions receive a `progress(fraction, message=None, partial=None)`
+callback. Cancellation is cooperative: the callback raises `JobCancelled`
+once the job was cancelled.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from hub_utils.pools import POOL_WORKERS, make_pool
+
+JOB_WORKERS = POOL_WORKERS
+# Finished jobs kept for reuse
+FINISHED_JOBS = 32
+POLL_SECONDS = 0.5
+# Jobs that finish this quickly are shown directly, without a progress bar
+INLINE_WAIT_SECONDS = 0.3
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, key):
+        self.key = key
+        self.progress = 0.0
+        self.message = None
+        self.partial = None
+        self.started = time.time()
+        self.future = None
+        self.watchers = set()  # ids of the sessions waiting for this job
+        self._cancel = threading.Event()
+
+    def report(self, progress=None, message=None, partial=None):
+        if self._cancel.is_set():
+            raise JobCancelled()
+        if progress is not None:
+            self.progress = min(max(float(progress), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+        if partial is not None:
+            self.partial = partial
+
+    @property
+    def failed(self):
+        """Whether the job raised, other than by being cancelled."""
+        return self.done() and not self.cancelled and self.future.exception() is not None
+
+    def cancel(self):
+        self._cancel.set()
+        self.future.cancel()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def done(self):
+        return self.future.done()
+
+    def wait(self, timeout):
+        try:
+            self.future.exception(timeout=timeout)
+        except Exception:
+            pass
+        return self.done()
+
+    def result(self):
+        return self.future.result()
+
+
+class JobRunner:
+    def __init__(self, workers=JOB_WORKERS, keep=FINISHED_JOBS):
+        self.keep = keep
+        self._pool = make_pool("hub-job", workers)
+        self._jobs = OrderedDict()  # key -> Job, least recently used first
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args, restart=False, watcher=None, **kwargs):
+        """Start `fn(*args, progress=..., **kwargs)` unless a job for `key` exists.
+
+        An existing job is returned as it is, even if it was cancelled by the
+        user, unless `restart` is set. A job that failed is started again.
+        `watcher` is registered as waiting for the job before another
+        session can release it.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or restart or job.failed:
+                job = Job(key)
+                job.future = self._pool.submit(fn, *args, progress=job.report, **kwargs)
+                self._jobs[key] = job
+                self._evict()
+            else:
+                self._jobs.move_to_end(key)
+            job.watchers.add(watcher)
+            return job
+
+    def release(self, job, session_id):
+        """Stop waiting for `job`; cancel it if no session is waiting any more."""
+        with self._lock:
+            job.watchers.discard(session_id)
+            if not job.watchers and not job.done():
+                job.cancel()
+                # Nobody asked to stop it, so asking for it again starts afresh
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+
+    def _evict(self):
+        finished = [key for key, job in self._jobs.items() if job.done()]
+        for key in finished[:max(len(finished) - self.keep, 0)]:
+            del self._jobs[key]
+
+
+@st.cache_resource
+def get_job_runner():
+    return JobRunner()
+
+
+def run_in_background(slot, key, fn, *args, **kwargs):
+    """Job for `key` in this session's `slot`, replacing the slot's previous job."""
+    runner = get_job_runner()
+    restart = st.session_state.pop(f"_restart_job_{slot}", False)
+    ctx = get_script_run_ctx()
+    session_id = ctx.session_id if ctx else None
+    job = runner.submit(key, fn, *args, restart=restart, watcher=session_id, **kwargs)
+    slots = st.session_state.setdefault("_hub_jobs", {})
+    previous = slots.get(slot)
+    if previous is not None and previous is not job:
+        runner.release(previous, session_id)
+    slots[slot] = job
+    return job
+
+
+def show_progress(job, label, render_partial=None):
+    """Progress bar, partial result and cancel button, refreshed while the job runs."""
+    @st.fragment(run_every=POLL_SECONDS)
+    def progress_panel():
+        if job.done():
+            # Rerun the whole page so the result replaces this panel
+            st.rerun()
+        st.progress(job.progress, text=job.message or label)
+        if render_partial is not None and job.partial is not None:
+            render_partial(job.partial)
+        if st.button("Cancel", key=f"cancel_{job.started}_{id(job)}"):
+            job.cancel()
+            st.rerun()
+
+    progress_panel()
+
+
+def background_result(slot, key, fn, *args, label="Working...", render_partial=None, **kwargs):
+    """Result of `fn` run in the background, or None while it is still running.
+
+    Raises the job's exception if it failed, so callers handle errors as if
+    they had called `fn` directly.
+    """
+    job = run_in_background(slot, key, fn, *args, **kwargs)
+    if job.wait(INLINE_WAIT_SECONDS) and not job.cancelled:
+        return job.result()
+    if job.cancelled:
+        st.info(f"{label.rstrip('.')} was cancelled.")
+        st.button("Run again", key=f"restart_{slot}",
+                  on_click=lambda: st.session_state.update({f"_restart_job_{slot}": True}))
+        return None
+    show_progress(job, label, render_partial)
+    return None
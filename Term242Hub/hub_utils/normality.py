@@ -0,0 +1,88 @@
+"""Normality tests that scale to large columns.
+
+Shapiro-Wilk's p-value is only reliable up to 5000 observations and the test
+slows down on long columns, so above that size it runs on a seeded random
+subsample. D'Agostino-Pearson, Jarque-Bera and Anderson-Darling only need
+moments or one sort, so they run on the full column. Columns are tested in
+a worker pool.
+"""
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from hub_utils.pools import POOL_WORKERS, make_pool
+from hub_utils.tracing import traced
+
+SHAPIRO_MAX_N = 5000
+SUBSAMPLE_SEED = 0
+NORMALITY_WORKERS = POOL_WORKERS
+
+
+def anderson_darling(values):
+    """Anderson-Darling statistic for normality with its approximate p-value.
+
+    Computed directly because the p-value support in `scipy.stats.anderson`
+    differs between scipy versions. The p-value uses the D'Agostino &
+    Stephens (1986) approximation for a mean and variance estimated from
+    the sample.
+    """
+    n = len(values)
+    z = np.sort((values - values.mean()) / values.std(ddof=1))
+    i = np.arange(1, n + 1)
+    statistic = -n - np.sum((2 * i - 1) * (stats.norm.logcdf(z) + stats.norm.logsf(z[::-1]))) / n
+    a2 = statistic * (1 + 0.75 / n + 2.25 / n ** 2)
+    if a2 >= 0.6:
+        p_value = np.exp(1.2937 - 5.709 * a2 + 0.0186 * a2 ** 2)
+    elif a2 >= 0.34:
+        p_value = np.exp(0.9177 - 4.279 * a2 - 1.38 * a2 ** 2)
+    elif a2 >= 0.2:
+        p_value = 1 - np.exp(-8.318 + 42.796 * a2 - 59.938 * a2 ** 2)
+    else:
+        p_value = 1 - np.exp(-13.436 + 101.14 * a2 - 223.73 * a2 ** 2)
+    return statistic, float(min(max(p_value, 0.0), 1.0))
+
+
+def test_column(series, alpha=0.05):
+    """Run every normality test on one column and return one result row."""
+    values = pd.to_numeric(series, errors="coerce").dropna().to_numpy(dtype=float)
+    n = len(values)
+    row = {"N": n}
+
+    shapiro_sample = values
+    if n > SHAPIRO_MAX_N:
+        rng = np.random.default_rng(SUBSAMPLE_SEED)
+        shapiro_sample = rng.choice(values, SHAPIRO_MAX_N, replace=False)
+    row["Shapiro N"] = len(shapiro_sample)
+    tests = {
+        "Shapiro-Wilk": lambda: stats.shapiro(shapiro_sample),
+        # The skewness/kurtosis tests need at least 8 and 2 observations
+        "D'Agostino-Pearson": lambda: stats.normaltest(values) if n >= 8 else (np.nan, np.nan),
+        "Jarque-Bera": lambda: stats.jarque_bera(values) if n >= 2 else (np.nan, np.nan),
+        "Anderson-Darling": lambda: anderson_darling(values) if n >= 8 else (np.nan, np.nan),
+    }
+    p_values = []
+    for name, run in tests.items():
+        try:
+            stat, p_value = run()
+        except ValueError:
+            stat, p_value = np.nan, np.nan
+        row[f"{name} Statistic"] = float(stat)
+        row[f"{name} P-value"] = float(p_value)
+        p_values.append(p_value)
+
+    rejected = [p <= alpha for p in p_values if not np.isnan(p)]
+    if not rejected:
+        row["Conclusion"] = "Not enough data"
+    elif any(rejected):
+        row["Conclusion"] = f"Data is not Normal ({sum(rejected)} of {len(rejected)} tests reject)"
+    else:
+        row["Conclusion"] = "No evidence against Normality"
+    return row
+
+
+@traced("compute")
+def test_columns(df, columns, alpha=0.05, workers=NORMALITY_WORKERS):
+    """Normality results for several columns, one row per column."""
+    with make_pool("normality", workers) as pool:
+        rows = list(pool.map(lambda col: test_column(df[col], alpha), columns))
+    return pd.DataFrame(rows, index=list(columns))
@@ -0,0 +1,165 @@
+"""All-pairs difference-in-means tests across numerical columns.
+
+Each column is prepared once (missing values dropped, sorted, moments and
+tie counts computed). The t statistics for every pair are then computed
+together from the moments, and Mann-Whitney U for a pair comes from binary
+searches into the other column's sorted values, so nothing is re-sorted per
+pair. p-values can be adjusted for multiple comparisons with Holm or
+Benjamini-Hochberg.
+"""
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from hub_utils.tracing import traced
+
+CORRECTIONS = ["Holm", "Benjamini-Hochberg", "None"]
+
+
+class PreparedColumn:
+    def __init__(self, series):
+        self.values = np.sort(pd.to_numeric(series, errors="coerce").dropna().to_numpy(dtype=float))
+        self.n = len(self.values)
+        self.mean = self.values.mean() if self.n else np.nan
+        self.var = self.values.var(ddof=1) if self.n > 1 else np.nan
+        self.uniques, self.counts = np.unique(self.values, return_counts=True)
+
+
+def prepare_columns(df, columns):
+    return {col: PreparedColumn(df[col]) for col in columns}
+
+
+@traced("compute")
+def pairwise_ttests(prepared, equal_var=False):
+    """t statistic and two-sided p-value matrices for every pair of columns."""
+    columns = list(prepared)
+    n = np.array([prepared[c].n for c in columns], dtype=float)
+    mean = np.array([prepared[c].mean for c in columns])
+    var = np.array([prepared[c].var for c in columns])
+
+    n1, n2 = n[:, None], n[None, :]
+    v1, v2 = var[:, None], var[None, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if equal_var:
+            dof = n1 + n2 - 2
+            pooled = ((n1 - 1) * v1 + (n2 - 1) * v2) / dof
+            se = np.sqrt(pooled * (1 / n1 + 1 / n2))
+        else:
+            # Welch's t-test with the Welch-Satterthwaite degrees of freedom
+            a, b = v1 / n1, v2 / n2
+            se = np.sqrt(a + b)
+            dof = (a + b) ** 2 / (a ** 2 / (n1 - 1) + b ** 2 / (n2 - 1))
+        t_stat = (mean[:, None] - mean[None, :]) / se
+        p_value = 2 * stats.t.sf(np.abs(t_stat), dof)
+    np.fill_diagonal(t_stat, np.nan)
+    np.fill_diagonal(p_value, np.nan)
+    return (pd.DataFrame(t_stat, index=columns, columns=columns),
+            pd.DataFrame(p_value, index=columns, columns=columns))
+
+
+def mann_whitney(x, y):
+    """U statistic of `x` and its two-sided p-value (normal approximation).
+
+    Matches `scipy.stats.mannwhitneyu` with its default continuity and tie
+    corrections for samples large enough to use the asymptotic method.
+    """
+    if x.n == 0 or y.n == 0:
+        return np.nan, np.nan
+    below = np.searchsorted(y.values, x.values, side="left")
+    equal = np.searchsorted(y.values, x.values, side="right") - below
+    u1 = below.sum() + 0.5 * equal.sum()
+
+    # Tie counts of the pooled sample, from the per-column counts
+    values, inverse = np.unique(np.concatenate([x.uniques, y.uniques]), return_inverse=True)
+    ties = np.bincount(inverse, weights=np.concatenate([x.counts, y.counts]))
+    n = x.n + y.n
+    sigma = np.sqrt(x.n * y.n / 12 * ((n + 1) - (ties ** 3 - ties).sum() / (n * (n - 1))))
+    u = max(u1, x.n * y.n - u1)
+    z = (u - x.n * y.n / 2 - 0.5) / sigma if sigma > 0 else 0.0
+    return u1, min(1.0, 2 * stats.norm.sf(z))
+
+
+@traced("compute")
+def pairwise_mann_whitney(prepared, progress=None):
+    columns = list(prepared)
+    u_stat = pd.DataFrame(np.nan, index=columns, columns=columns)
+    p_value = pd.DataFrame(np.nan, index=columns, columns=columns)
+    pairs = list(combinations(columns, 2))
+    for i, (a, b) in enumerate(pairs):
+        u, p = mann_whitney(prepared[a], prepared[b])
+        u_stat.loc[a, b], u_stat.loc[b, a] = u, prepared[a].n * prepared[b].n - u
+        p_value.loc[a, b] = p_value.loc[b, a] = p
+        if progress:
+            progress((i + 1) / len(pairs), f"Mann-Whitney U: {i + 1} of {len(pairs)} pairs")
+    return u_stat, p_value
+
+
+def all_pairs_tests(load_columns, columns, equal_var=False, progress=None):
+    """t and Mann-Whitney statistics and p-values for every pair of `columns`.
+
+    The t-test matrices are published as a partial result before the slower
+    Mann-Whitney tests run.
+    """
+    if progress:
+        progress(0.0, "Loading and sorting the columns...")
+    prepared = prepare_columns(load_columns(columns), columns)
+    t_stat, t_p = pairwise_ttests(prepared, equal_var)
+    if progress:
+        progress(0.2, "t-tests done, running Mann-Whitney U tests...", (t_stat, t_p))
+        mw_progress = lambda fraction, message: progress(0.2 + 0.8 * fraction, message)
+    else:
+        mw_progress = None
+    return (t_stat, t_p, *pairwise_mann_whitney(prepared, mw_progress))
+
+
+def adjust_pvalues(p_values, method):
+    """Adjust a 1-D array of p-values for multiple comparisons.
+
+    Missing p-values (a constant column, or one with fewer than two values)
+    stay missing and do not count as tests.
+    """
+    p_values = np.asarray(p_values, dtype=float)
+    if method == "None":
+        return p_values
+    if method not in ("Holm", "Benjamini-Hochberg"):
+        raise ValueError(f"Unknown correction method: {method}")
+    result = p_values.copy()
+    finite = np.flatnonzero(np.isfinite(p_values))
+    m = len(finite)
+    if m == 0:
+        return result
+    order = np.argsort(p_values[finite])
+    ranked = p_values[finite][order]
+    if method == "Holm":
+        adjusted = np.maximum.accumulate(ranked * (m - np.arange(m)))
+    else:
+        adjusted = np.minimum.accumulate((ranked * m / np.arange(1, m + 1))[::-1])[::-1]
+    result[finite[order]] = np.minimum(adjusted, 1.0)
+    return result
+
+
+def adjust_matrix(p_matrix, method):
+    """Adjust a symmetric p-value matrix, treating each pair as one test."""
+    values = p_matrix.to_numpy()
+    upper = np.triu_indices_from(values, k=1)
+    adjusted = np.full_like(values, np.nan)
+    adjusted[upper] = adjust_pvalues(values[upper], method)
+    adjusted.T[upper] = adjusted[upper]
+    return pd.DataFrame(adjusted, index=p_matrix.index, columns=p_matrix.columns)
+
+
+def pairs_table(t_stat, t_p, u_stat, u_p, method, alpha=0.05):
+    """One row per pair with raw and adjusted p-values for both tests."""
+    t_adj, u_adj = adjust_matrix(t_p, method), adjust_matrix(u_p, method)
+    rows = []
+    for a, b in combinations(t_stat.columns, 2):
+        rows.append({
+            "Column 1": a, "Column 2": b,
+            "t Statistic": t_stat.loc[a, b], "t P-value": t_p.loc[a, b], "t Adjusted P-value": t_adj.loc[a, b],
+            "U Statistic": u_stat.loc[a, b], "U P-value": u_p.loc[a, b], "U Adjusted P-value": u_adj.loc[a, b],
+            "Means Differ (t)": t_adj.loc[a, b] <= alpha,
+            "Distributions Differ (U)": u_adj.loc[a, b] <= alpha,
+        })
+    return pd.DataFrame(rows)
@@ -0,0 +1,209 @@
+"""PCA for uploaded datasets, with the solver picked from the data's shape.
+
+- Data streamed from disk (large file mode) is fitted with `IncrementalPCA`,
+  one chunk at a time, after a first pass for the column means and standard
+  deviations.
+- Wide data where only a few components are needed uses randomized SVD.
+- Everything else uses the exact full SVD.
+
+The scree plot only needs the fitted model, and the projection plot uses a
+fixed-size random sample of projected rows, so neither needs the full
+matrix in memory.
+
+Ratings data (users x items, mostly empty) is kept as a `scipy.sparse` CSR
+matrix and reduced with ARPACK, which centers implicitly, or with
+TruncatedSVD, so memory follows the number of stored ratings.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.decomposition import PCA, IncrementalPCA, TruncatedSVD
+from sklearn.preprocessing import StandardScaler
+from sklearn.utils import gen_batches
+
+from hub_utils.tracing import traced
+
+SOLVERS = ["Full SVD", "Randomized SVD", "Incremental"]
+# Randomized SVD pays off on wide data when few components are needed
+RANDOMIZED_MIN_COLUMNS = 100
+RANDOMIZED_MAX_FRACTION = 0.2
+INCREMENTAL_BATCH_ROWS = 100_000
+PROJECTION_SAMPLE = 20_000
+
+SPARSE_METHODS = ["Centered PCA", "Truncated SVD"]
+
+PCAResult = namedtuple("PCAResult", ["solver", "model", "n_rows", "scores"])
+RatingsMatrix = namedtuple("RatingsMatrix", ["matrix", "users", "items"])
+
+
+def choose_solver(n_rows, n_columns, n_components, streamed=False):
+    if streamed:
+        return "Incremental"
+    if n_columns >= RANDOMIZED_MIN_COLUMNS and n_components <= RANDOMIZED_MAX_FRACTION * min(n_rows, n_columns):
+        return "Randomized SVD"
+    return "Full SVD"
+
+
+def _numeric_rows(chunk, columns):
+    """Chunk as a float matrix, without the rows that have missing values."""
+    values = chunk[list(columns)].apply(pd.to_numeric, errors="coerce")
+    return values.dropna().to_numpy(dtype=float), values.notna().all(axis=1).to_numpy()
+
+
+def _score_columns(n_components):
+    return [f"PC{i + 1}" for i in range(n_components)]
+
+
+@traced("compute")
+def fit_in_memory(df, columns, n_components, standardize=True, solver="Full SVD", seed=0, progress=None):
+    """Fit PCA on a frame held in memory.
+
+    Progress is reported between the steps, and between the batches of the
+    incremental solver, which is where a cancelled background fit stops.
+    """
+    def report(fraction, message):
+        if progress:
+            progress(fraction, message)
+
+    report(0.0, "Scaling the columns...")
+    X, _ = _numeric_rows(df, columns)
+    X = StandardScaler(with_std=standardize).fit_transform(X)
+    report(0.2, f"Fitting PCA ({solver})...")
+    if solver == "Incremental":
+        # The batches `IncrementalPCA.fit` would use, fitted one at a time
+        model = IncrementalPCA(n_components)
+        batches = list(gen_batches(len(X), max(INCREMENTAL_BATCH_ROWS, n_components), min_batch_size=n_components))
+        for i, batch in enumerate(batches):
+            model.partial_fit(X[batch])
+            report(0.2 + 0.7 * (i + 1) / len(batches),
+                   f"Fitting PCA (Incremental): {batch.stop:,} of {len(X):,} rows")
+    else:
+        model = PCA(n_components, svd_solver="randomized" if solver == "Randomized SVD" else "full", random_state=seed)
+        model.fit(X)
+    report(0.9, "Projecting a sample of rows...")
+
+    rng = np.random.default_rng(seed)
+    sample = X if len(X) <= PROJECTION_SAMPLE else X[np.sort(rng.choice(len(X), PROJECTION_SAMPLE, replace=False))]
+    scores = pd.DataFrame(model.transform(sample), columns=_score_columns(n_components))
+    return PCAResult(solver, model, len(X), scores)
+
+
+@traced("compute")
+def fit_streaming(load_chunks, columns, n_components, n_rows, standardize=True, seed=0, progress=None):
+    """Fit `IncrementalPCA` over the chunks returned by `load_chunks()`.
+
+    `load_chunks` is called once per pass (scaling, fitting, projecting), so
+    only one chunk is held in memory at a time.
+    """
+    passes = ["Scaling", "Fitting", "Projecting"]
+
+    def report(pass_index, rows_done):
+        if progress:
+            progress((pass_index + rows_done / max(n_rows, 1)) / len(passes),
+                     f"{passes[pass_index]}: {rows_done:,} of {n_rows:,} rows (pass {pass_index + 1} of {len(passes)})")
+
+    scaler = StandardScaler(with_std=standardize)
+    rows_done = 0
+    for chunk in load_chunks():
+        X, _ = _numeric_rows(chunk, columns)
+        if len(X):
+            scaler.partial_fit(X)
+        rows_done += len(chunk)
+        report(0, rows_done)
+
+    # Every partial_fit batch needs at least n_components rows, so short
+    # chunks are merged into their neighbour
+    model = IncrementalPCA(n_components)
+    held = None
+    fitted_rows = 0
+    rows_done = 0
+    for chunk in load_chunks():
+        rows_done += len(chunk)
+        report(1, rows_done)
+        X, _ = _numeric_rows(chunk, columns)
+        X = scaler.transform(X) if len(X) else X
+        if held is None:
+            held = X
+        elif len(X) < n_components or len(held) < n_components:
+            held = np.vstack([held, X])
+        else:
+            model.partial_fit(held)
+            fitted_rows += len(held)
+            held = X
+    if held is None or len(held) < n_components:
+        raise ValueError(f"At least {n_components} complete rows are needed for {n_components} components.")
+    model.partial_fit(held)
+    fitted_rows += len(held)
+
+    # Project a random sample of rows, picked by position before reading
+    rng = np.random.default_rng(seed)
+    picks = np.sort(rng.choice(n_rows, min(PROJECTION_SAMPLE, n_rows), replace=False))
+    sampled = []
+    offset = 0
+    for chunk in load_chunks():
+        X, complete = _numeric_rows(chunk, columns)
+        local = picks[(picks >= offset) & (picks < offset + len(chunk))] - offset
+        # Positions among the complete rows of the sampled rows that are complete
+        positions = np.cumsum(complete)[local[complete[local]]] - 1
+        if len(positions):
+            sampled.append(model.transform(scaler.transform(X[positions])))
+        offset += len(chunk)
+        report(2, offset)
+    scores = np.vstack(sampled) if sampled else np.empty((0, n_components))
+    return PCAResult("Incremental", model, fitted_rows, pd.DataFrame(scores, columns=_score_columns(n_components)))
+
+
+def scree_table(result):
+    ratio = result.model.explained_variance_ratio_
+    return pd.DataFrame(
+        {
+            "Explained Variance": result.model.explained_variance_,
+            "Explained Variance Ratio": ratio,
+            "Cumulative Ratio": np.cumsum(ratio),
+        },
+        index=_score_columns(len(ratio)),
+    )
+
+
+def loadings_table(result, columns):
+    return pd.DataFrame(result.model.components_, index=_score_columns(len(result.model.components_)), columns=list(columns))
+
+
+def ratings_matrix(triplets, user_col, item_col, rating_col):
+    """CSR users x items matrix from (user, item, rating) rows.
+
+    A user rating the same item twice keeps the last rating.
+    """
+    triplets = triplets.drop_duplicates([user_col, item_col], keep="last")
+    user_codes, users = pd.factorize(triplets[user_col], sort=True)
+    item_codes, items = pd.factorize(triplets[item_col], sort=True)
+    ratings = pd.to_numeric(triplets[rating_col], errors="coerce").fillna(0).to_numpy(dtype=float)
+    matrix = sp.csr_matrix((ratings, (user_codes, item_codes)), shape=(len(users), len(items)))
+    return RatingsMatrix(matrix, users, items)
+
+
+def load_npz_ratings(file):
+    """Ratings saved with `scipy.sparse.save_npz` (COO, CSR or CSC)."""
+    matrix = sp.load_npz(file).tocsr()
+    return RatingsMatrix(matrix, pd.RangeIndex(matrix.shape[0]), pd.RangeIndex(matrix.shape[1]))
+
+
+@traced("compute")
+def fit_sparse(matrix, n_components, method="Centered PCA", seed=0):
+    if method == "Centered PCA":
+        # ARPACK centers through a linear operator, without densifying
+        model = PCA(n_components, svd_solver="arpack", random_state=seed)
+    else:
+        model = TruncatedSVD(n_components, random_state=seed)
+    scores = model.fit_transform(matrix)
+    return PCAResult(method, model, matrix.shape[0], pd.DataFrame(scores, columns=_score_columns(n_components)))
+
+
+def dense_nbytes(matrix):
+    return matrix.shape[0] * matrix.shape[1] * matrix.dtype.itemsize
+
+
+def sparse_nbytes(matrix):
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
@@ -0,0 +1,26 @@
+"""Worker pools for the hub's parallel helpers.
+
+Every pool in the hub is a thread pool, on purpose:
+
+- The work sent to the pools spends its time in NumPy, pandas, pyarrow and
+  scipy, which release the GIL in their inner loops, so threads run it in
+  parallel. Threads also share the uploaded frames and the Arrow buffers
+  instead of pickling them to a worker and back.
+- Processes are not safe to start from the Streamlit server. Forking copies
+  a process that already runs many threads, so a lock one of them held
+  stays locked in the child. "spawn" and "forkserver" start each worker by
+  re-running `__main__`, and Streamlit installs the page being run as
+  `__main__`, so every worker would run that page again.
+
+Long-lived pools are created once per server process with
+`st.cache_resource` by the module that owns them.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+POOL_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def make_pool(name, workers=POOL_WORKERS):
+    """Thread pool whose threads are named after `name`."""
+    return ThreadPoolExecutor(workers, thread_name_prefix=name)
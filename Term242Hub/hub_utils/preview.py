@@ -0,0 +1,74 @@
+"""Paginated DataFrame preview.
+
+`st.dataframe(df)` serializes the whole frame to the browser on every rerun.
+`paginated_dataframe` only sends the current page, together with the total
+row count, and sorts on the server. The preview is a fragment: paging and
+sorting rerun only the preview, not the page around it.
+"""
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+from hub_utils.tracing import span
+
+PAGE_SIZES = [25, 50, 100, 500, 1000]
+
+# Sort orders for recently previewed frames, keyed by (signature, column, ascending)
+_MAX_CACHED_ORDERS = 16
+_orders = OrderedDict()
+_orders_lock = threading.Lock()
+
+
+def sort_order(signature, df, column, ascending=True):
+    """Row positions of `df` sorted by `column` (missing values last).
+
+    `signature` identifies the rows of `df`, as the pages' dataset and
+    filter signatures do, so a slice rebuilt on a rerun, or shown in
+    another session, reuses the order.
+    """
+    key = (signature, column, ascending)
+    with _orders_lock:
+        if key in _orders:
+            _orders.move_to_end(key)
+            return _orders[key]
+
+    order = (
+        df[column]
+        .reset_index(drop=True)
+        .sort_values(ascending=ascending, kind="stable", na_position="last")
+        .index.to_numpy()
+    )
+    with _orders_lock:
+        _orders[key] = order
+        while len(_orders) > _MAX_CACHED_ORDERS:
+            _orders.popitem(last=False)
+    return order
+
+
+@st.fragment
+def paginated_dataframe(df, key, signature, page_size=100):
+    """Show one page of `df` with server-side sorting and paging controls.
+
+    `signature` identifies the rows of `df` (see `sort_order`).
+    """
+    total_rows = len(df)
+    sort_col, order_col, size_col, page_col = st.columns(4)
+    sort_by = sort_col.selectbox("Sort by", ["(none)"] + list(df.columns), key=f"{key}_sort")
+    descending = order_col.selectbox("Order", ["Ascending", "Descending"], key=f"{key}_order") == "Descending"
+    page_size = size_col.selectbox(
+        "Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(page_size), key=f"{key}_size"
+    )
+    n_pages = max(1, -(-total_rows // page_size))
+    page = page_col.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1, key=f"{key}_page")
+
+    start = (min(page, n_pages) - 1) * page_size
+    stop = min(start + page_size, total_rows)
+    if sort_by == "(none)":
+        page_df = df.iloc[start:stop]
+    else:
+        page_df = df.iloc[sort_order(signature, df, sort_by, not descending)[start:stop]]
+
+    with span("emit"):
+        st.dataframe(page_df)
+    st.caption(f"Rows {start + 1 if total_rows else 0:,}–{stop:,} of {total_rows:,} (page {page} of {n_pages})")
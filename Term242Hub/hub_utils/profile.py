@@ -0,0 +1,140 @@
+"""Column profiles shared by every widget that looks at a dataset.
+
+The apps used to recompute dataset metadata on every rerun: `select_dtypes`
+for the column pickers, the distinct values of a column for an "=" filter
+and `value_counts()` for every categorical summary and chart. A
+`DatasetProfile` is built once per dataset and shared by every session, so
+a rerun reads it instead of passing over the rows again.
+
+- A column's kind (numeric, bool, text or other) comes from its dtype, or
+  from the spill metadata in large file mode, without reading any rows.
+- The statistics of a column are computed in one pass the first time they
+  are asked for: null count, number of distinct values, min and max, the
+  sorted distinct values (up to `VALUES_CAP` of them) and the `TOP_K` most
+  frequent values with their counts, ordered as `value_counts()` orders them.
+
+In large file mode a column is read from disk once, when it is profiled.
+"""
+import threading
+
+import pandas as pd
+import streamlit as st
+
+from hub_utils.datastore import on_evict
+from hub_utils.tracing import traced
+
+# Distinct values kept sorted per column, for the "=" filter options
+VALUES_CAP = 1000
+# Most frequent values kept per column, with their counts
+TOP_K = 1000
+
+# Spill metadata kinds (see `hub_utils.ingest`) and the profile kind of each
+SPILLED_KINDS = {"bool": "bool", "int": "numeric", "float": "numeric", "string": "text"}
+
+
+def column_kind(dtype):
+    # Same classes as select_dtypes("number") and select_dtypes(["object", "category", "string"])
+    if pd.api.types.is_bool_dtype(dtype):
+        return "bool"
+    if pd.api.types.is_numeric_dtype(dtype):
+        return "numeric"
+    if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(dtype) or dtype == object:
+        return "text"
+    return "other"
+
+
+class ColumnStats:
+    def __init__(self, series, kind):
+        counts = series.value_counts()
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Categories the column does not use are counted as zero
+            counts = counts[counts > 0]
+        self.kind = kind
+        self.n_rows = len(series)
+        self.n_nulls = int(series.isna().sum())
+        self.n_unique = len(counts)
+        self.top = counts.head(TOP_K)
+
+        try:
+            unique = counts.index.sort_values()
+        except TypeError:
+            # Mixed types in one column have no order
+            unique = None
+        self.min = unique[:1].tolist()[0] if unique is not None and len(unique) else None
+        self.max = unique[-1:].tolist()[0] if unique is not None and len(unique) else None
+        if self.n_unique > VALUES_CAP:
+            self.values = None
+        else:
+            self.values = (counts.index if unique is None else unique).tolist()
+
+    @property
+    def is_complete(self):
+        """Whether `top` holds every distinct value."""
+        return self.n_unique <= len(self.top)
+
+    def options(self):
+        """Values to offer in a picker: all of them sorted, or the most frequent ones."""
+        return self.values if self.values is not None else self.top.index.tolist()
+
+
+class DatasetProfile:
+    def __init__(self, kinds, load_column):
+        self.kinds = kinds
+        self.columns = list(kinds)
+        self._load_column = load_column
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._column_locks = {}
+
+    def columns_of(self, *kinds):
+        return [col for col, kind in self.kinds.items() if kind in kinds]
+
+    def numeric_columns(self):
+        return self.columns_of("numeric")
+
+    def text_columns(self):
+        return self.columns_of("text")
+
+    def stats(self, column):
+        with self._lock:
+            if column in self._stats:
+                return self._stats[column]
+            column_lock = self._column_locks.setdefault(column, threading.Lock())
+        # One lock per column, so sessions profiling different columns do not
+        # wait for each other, and two sessions asking for the same one profile it once
+        with column_lock:
+            with self._lock:
+                stats = self._stats.get(column)
+            if stats is None:
+                stats = profile_column(self._load_column(column), self.kinds[column])
+                with self._lock:
+                    self._stats[column] = stats
+        return stats
+
+
+@traced("compute")
+def profile_column(series, kind):
+    return ColumnStats(series, kind)
+
+
+@st.cache_resource(max_entries=16)
+def frame_profile(key, _df):
+    """Profile of the DataFrame stored under `key` in the dataset store.
+
+    The profile reads columns from the frame, so it is dropped when the
+    store evicts the frame.
+    """
+    kinds = {col: column_kind(dtype) for col, dtype in _df.dtypes.items()}
+    return DatasetProfile(kinds, lambda column: _df[column])
+
+
+@on_evict
+def _drop_frame_profile(key):
+    frame_profile.clear(key, None)
+
+
+@st.cache_resource(max_entries=16)
+def spilled_profile(key, _dataset):
+    """Profile of a `SpilledDataset`; each profiled column is read from disk once."""
+    kinds = {col: SPILLED_KINDS[kind] for col, kind in _dataset.kinds.items()}
+    return DatasetProfile(kinds, lambda column: _dataset.read([column])[column])
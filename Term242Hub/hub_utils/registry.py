@@ -0,0 +1,86 @@
+"""App registry and compiled sub-app cache for the hub.
+
+The hub used to list the apps folder and re-import the selected sub-app from
+source on every rerun. The registry scans the folders once per process and
+only rescans when a directory's mtime changes (a file was added, removed or
+renamed). Sub-app sources are compiled once and recompiled only when the
+file itself changes.
+"""
+import importlib
+import os
+import threading
+import types
+
+from hub_utils.tracing import span
+
+# Libraries the sub-apps need, imported in the background at server start
+HEAVY_MODULES = ["pandas", "matplotlib.pyplot", "seaborn", "scipy.stats", "sklearn.decomposition"]
+
+
+class AppRegistry:
+    def __init__(self, apps_dir):
+        self.apps_dir = apps_dir
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._apps = {}  # topic -> sorted list of sub-app file names
+        self._code = {}  # path -> (mtime, code object)
+
+    def _dir_stamp(self):
+        dirs = [self.apps_dir] + [os.path.join(self.apps_dir, topic) for topic in self._apps]
+        return tuple((d, os.stat(d).st_mtime_ns) for d in dirs if os.path.isdir(d))
+
+    def _refresh(self):
+        with self._lock:
+            if self._stamp is not None and self._stamp == self._dir_stamp():
+                return
+            apps = {}
+            for topic in sorted(os.listdir(self.apps_dir)):
+                topic_path = os.path.join(self.apps_dir, topic)
+                if os.path.isdir(topic_path):
+                    apps[topic] = sorted(f for f in os.listdir(topic_path) if f.endswith(".py"))
+            self._apps = apps
+            self._stamp = self._dir_stamp()
+
+    def topics(self):
+        self._refresh()
+        return list(self._apps)
+
+    def sub_apps(self, topic):
+        self._refresh()
+        return self._apps.get(topic, [])
+
+    def compiled(self, app_path):
+        """Return the code object for a sub-app, recompiling only if it changed."""
+        mtime = os.stat(app_path).st_mtime_ns
+        with self._lock:
+            cached = self._code.get(app_path)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        with open(app_path, encoding="utf-8") as f:
+            code = compile(f.read(), app_path, "exec")
+        with self._lock:
+            self._code[app_path] = (mtime, code)
+        return code
+
+    def run(self, app_path):
+        # Streamlit pages must re-execute to render, but from the cached code
+        module = types.ModuleType("sub_app")
+        module.__file__ = app_path
+        with span("load"):
+            code = self.compiled(app_path)
+        exec(code, module.__dict__)
+        return module
+
+
+def _import_heavy_modules():
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+
+def start_warmup():
+    thread = threading.Thread(target=_import_heavy_modules, name="hub-warmup", daemon=True)
+    thread.start()
+    return thread
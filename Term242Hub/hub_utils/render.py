@@ -0,0 +1,229 @@
+"""Cached, parallel rendering for the plotting dashboard.
+
+Plots are rendered to PNG bytes and kept in a shared LRU cache keyed by
+(dataset signature, filter signature, plot spec), so a plot whose inputs did
+not change is never redrawn. Cache misses are rendered in a worker pool:
+a page submits every plot it is about to show with `submit_plots`, and each
+plot's fragment then waits only for its own PNG. `cached_figure` gives other pages
+the same cache for their static figures.
+
+Every figure comes from `get_figure_pool().figure()`, which owns its
+lifecycle: figures are never registered with pyplot, are cleared as soon as
+their PNG is saved, and go back to the pool with their Agg canvas, whose
+pixel buffer is reused by the next figure of the same size. Simple charts
+skip matplotlib altogether (see `hub_utils.charts`).
+"""
+import io
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+
+import matplotlib
+import seaborn as sns
+import streamlit as st
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from hub_utils.aggplot import density_scatter, minmax_line, use_aggregation
+from hub_utils.pools import POOL_WORKERS, make_pool
+from hub_utils.tracing import span, traced
+
+matplotlib.use("Agg")
+
+PLOT_TYPES = ["Histogram", "Countplot", "Boxplot", "Scatterplot", "Lineplot"]
+
+# `y` and `hue` are None when the plot does not use them
+PlotSpec = namedtuple("PlotSpec", ["plot_type", "x", "y", "hue"])
+
+# Memory budget for cached PNGs (override with HUB_FIGURE_CACHE_MB)
+FIGURE_CACHE_MB = int(os.environ.get("HUB_FIGURE_CACHE_MB", 64))
+RENDER_WORKERS = POOL_WORKERS
+
+
+def draw_plot(ax, data, spec):
+    if spec.plot_type == "Histogram":
+        sns.histplot(data=data, x=spec.x, hue=spec.hue, ax=ax, bins=20)
+    elif spec.plot_type == "Countplot":
+        sns.countplot(data=data, x=spec.x, hue=spec.hue, ax=ax)
+    elif spec.plot_type == "Boxplot":
+        sns.boxplot(data=data, x=spec.x, y=spec.hue, ax=ax)
+    elif spec.plot_type == "Scatterplot":
+        if use_aggregation(data, spec.x, spec.y):
+            density_scatter(ax, data, spec.x, spec.y, spec.hue)
+        else:
+            sns.scatterplot(data=data, x=spec.x, y=spec.y, hue=spec.hue, ax=ax)
+    elif spec.plot_type == "Lineplot":
+        if use_aggregation(data, spec.x, spec.y):
+            minmax_line(ax, data, spec.x, spec.y, spec.hue)
+        else:
+            sns.lineplot(data=data, x=spec.x, y=spec.y, hue=spec.hue, ax=ax)
+
+
+def figure_png(fig):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=150, bbox_inches="tight")
+    return buffer.getvalue()
+
+
+class FigurePool:
+    """Reusable figures with their Agg canvases, kept per set of Figure arguments."""
+
+    def __init__(self, per_key):
+        self.per_key = per_key
+        self._free = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def figure(self, **figure_kwargs):
+        key = tuple(sorted(figure_kwargs.items()))
+        with self._lock:
+            free = self._free.get(key)
+            fig = free.pop() if free else None
+        if fig is None:
+            # A bare Figure is not registered with pyplot, so it is safe to
+            # draw from a worker thread and nothing outside the pool holds it
+            fig = Figure(**figure_kwargs)
+            FigureCanvasAgg(fig)
+        try:
+            yield fig
+        finally:
+            # Cleared even if drawing failed, so no artists outlive the request
+            fig.clear()
+            with self._lock:
+                free = self._free.setdefault(key, [])
+                if len(free) < self.per_key:
+                    free.append(fig)
+
+
+@st.cache_resource
+def get_figure_pool():
+    # One free figure per render worker, plus one for the page's own thread
+    return FigurePool(RENDER_WORKERS + 1)
+
+
+def render_png(data, spec, figures):
+    """Draw one plot on a figure from the pool `figures` and return it as PNG bytes."""
+    with figures.figure() as fig:
+        draw_plot(fig.subplots(), data, spec)
+        return figure_png(fig)
+
+
+class FigureCache:
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._pngs = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            png = self._pngs.get(key)
+            if png is not None:
+                self._pngs.move_to_end(key)
+            return png
+
+    def put(self, key, png):
+        with self._lock:
+            if key in self._pngs:
+                self._nbytes -= len(self._pngs.pop(key))
+            self._pngs[key] = png
+            self._nbytes += len(png)
+            while self._nbytes > self.budget_bytes and len(self._pngs) > 1:
+                _, old = self._pngs.popitem(last=False)
+                self._nbytes -= len(old)
+
+
+@st.cache_resource
+def get_figure_cache():
+    return FigureCache(FIGURE_CACHE_MB * 1024 * 1024)
+
+
+@st.cache_resource
+def get_render_pool():
+    return make_pool("plot-render", RENDER_WORKERS)
+
+
+class RenderQueue:
+    """Plots being rendered in the worker pool, keyed like the figure cache.
+
+    A plot requested again before it is finished waits on the render already
+    in flight instead of drawing it a second time. Finished PNGs go into the
+    figure cache even if nobody is waiting on them any more.
+    """
+
+    def __init__(self, cache, pool, figures):
+        self.cache = cache
+        self.pool = pool
+        self.figures = figures
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, data, spec):
+        """The cached PNG for `key`, or a future of the PNG being rendered."""
+        png = self.cache.get(key)
+        if png is not None:
+            return png
+        with self._lock:
+            future = self._futures.get(key)
+            started = future is None
+            if started:
+                future = self.pool.submit(render_png, data, spec, self.figures)
+                self._futures[key] = future
+        if started:
+            # Outside the lock: the callback runs right away if the render already finished
+            future.add_done_callback(lambda done: self._finish(key, done))
+        return future
+
+    def _finish(self, key, future):
+        if future.exception() is None:
+            self.cache.put(key, future.result())
+        with self._lock:
+            self._futures.pop(key, None)
+
+
+@st.cache_resource
+def get_render_queue():
+    return RenderQueue(get_figure_cache(), get_render_pool(), get_figure_pool())
+
+
+def submit_plots(requests):
+    """Start rendering the cache misses of a list of (cache_key, data, spec) requests.
+
+    Pages call this with every plot they are about to show, before the plots'
+    fragments ask for their results, so the misses render side by side.
+    """
+    queue = get_render_queue()
+    return [queue.submit(key, data, spec) for key, data, spec in requests]
+
+
+@traced("render")
+def render_plots(requests):
+    """Render a list of (cache_key, data, spec) requests.
+
+    Returns one entry per request: PNG bytes, or the exception raised while
+    drawing that plot.
+    """
+    results = []
+    for item in submit_plots(requests):
+        try:
+            results.append(item if isinstance(item, bytes) else item.result())
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def cached_figure(key, draw, **figure_kwargs):
+    """PNG of the figure drawn by `draw(fig)`, rendered only on a cache miss.
+
+    `key` must identify everything the drawing depends on, typically the
+    page, the figure and a hash of the data.
+    """
+    cache = get_figure_cache()
+    png = cache.get(key)
+    if png is None:
+        with span("render"), get_figure_pool().figure(**figure_kwargs) as fig:
+            draw(fig)
+            png = figure_png(fig)
+        cache.put(key, png)
+    return png
@@ -0,0 +1,132 @@
+"""Permutation test and bootstrap confidence interval for a difference in means.
+
+Resamples are drawn in NumPy batches (one 2-D array per batch, no Python loop
+per resample) and batches run concurrently in a worker pool. Every batch
+gets its own child of one `SeedSequence` and batches are combined in order,
+so results depend only on the seed, never on worker scheduling. The
+permutation test stops early once its p-value estimate is precise enough, or
+once it is clearly on one side of the significance level.
+"""
+from collections import namedtuple
+
+import numpy as np
+from scipy import stats
+
+from hub_utils.pools import POOL_WORKERS, make_pool
+from hub_utils.tracing import traced
+
+# Max values held in one batch's resample matrix (about 16 MB of float64)
+BATCH_ELEMENTS = 2_000_000
+RESAMPLING_WORKERS = POOL_WORKERS
+
+PermutationResult = namedtuple("PermutationResult", ["observed", "p_value", "n_resamples", "stopped_early"])
+BootstrapResult = namedtuple("BootstrapResult", ["observed", "low", "high", "n_resamples"])
+
+
+def _batch_sizes(n_resamples, n_values):
+    size = max(1, min(n_resamples, BATCH_ELEMENTS // max(n_values, 1)))
+    sizes = [size] * (n_resamples // size)
+    if n_resamples % size:
+        sizes.append(n_resamples % size)
+    return sizes
+
+
+def _permutation_batch(pooled, n1, observed, seed, size):
+    """Number of label shuffles whose |difference in means| reaches the observed one."""
+    rng = np.random.default_rng(seed)
+    shuffled = rng.permuted(np.tile(pooled, (size, 1)), axis=1)
+    first = shuffled[:, :n1].sum(axis=1)
+    diffs = first / n1 - (pooled.sum() - first) / (len(pooled) - n1)
+    # Small tolerance so shuffles that tie the observed statistic count as extreme
+    return int(np.count_nonzero(np.abs(diffs) >= abs(observed) * (1 - 1e-12)))
+
+
+def _bootstrap_batch(x, y, seed, size):
+    rng = np.random.default_rng(seed)
+    x_means = x[rng.integers(0, len(x), (size, len(x)))].mean(axis=1)
+    y_means = y[rng.integers(0, len(y), (size, len(y)))].mean(axis=1)
+    return x_means - y_means
+
+
+def _run_batches(pool, fn, args, seed, sizes):
+    """Yield batch results in batch order, keeping the pool busy ahead of the consumer."""
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    pending = []
+    next_batch = 0
+    try:
+        while next_batch < len(sizes) or pending:
+            while next_batch < len(sizes) and len(pending) < 2 * RESAMPLING_WORKERS:
+                pending.append(pool.submit(fn, *args, seeds[next_batch], sizes[next_batch]))
+                next_batch += 1
+            yield pending.pop(0).result()
+    finally:
+        # Reached when the consumer stops early: drop the batches not started yet
+        for future in pending:
+            future.cancel()
+
+
+@traced("compute")
+def permutation_test(x, y, n_resamples=10_000, seed=0, alpha=0.05, tolerance=0.002,
+                     min_resamples=1_000, pool=None, progress=None):
+    """Two-sided permutation test for a difference in means.
+
+    Stops before `n_resamples` once at least `min_resamples` were drawn and
+    either the 99% interval of the p-value estimate is narrower than
+    `tolerance` on each side, or it lies entirely above or below `alpha`.
+    `progress(done, total, p_value)` is called after every batch.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    pooled = np.concatenate([x, y])
+    observed = x.mean() - y.mean()
+    sizes = _batch_sizes(n_resamples, len(pooled))
+    z = stats.norm.ppf(0.995)
+
+    own_pool = pool is None
+    pool = make_pool("resampling", RESAMPLING_WORKERS) if own_pool else pool
+    extreme = done = 0
+    stopped_early = False
+    try:
+        batches = _run_batches(pool, _permutation_batch, (pooled, len(x), observed), seed, sizes)
+        for size, count in zip(sizes, batches):
+            extreme += count
+            done += size
+            # The +1 counts the observed labelling, which keeps p above zero
+            p_value = (extreme + 1) / (done + 1)
+            if progress:
+                progress(done, n_resamples, p_value)
+            half_width = z * np.sqrt(p_value * (1 - p_value) / done)
+            if done < n_resamples and done >= min_resamples and (
+                half_width < tolerance or abs(p_value - alpha) > half_width
+            ):
+                stopped_early = True
+                batches.close()
+                break
+    finally:
+        if own_pool:
+            pool.shutdown(cancel_futures=True)
+    return PermutationResult(observed, p_value, done, stopped_early)
+
+
+@traced("compute")
+def bootstrap_ci(x, y, n_resamples=5_000, confidence=0.95, seed=0, pool=None, progress=None):
+    """Percentile bootstrap confidence interval for mean(x) - mean(y)."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    sizes = _batch_sizes(n_resamples, len(x) + len(y))
+
+    own_pool = pool is None
+    pool = make_pool("resampling", RESAMPLING_WORKERS) if own_pool else pool
+    diffs = []
+    try:
+        for diff in _run_batches(pool, _bootstrap_batch, (x, y), seed, sizes):
+            diffs.append(diff)
+            if progress:
+                progress(sum(len(d) for d in diffs), n_resamples, None)
+    finally:
+        if own_pool:
+            pool.shutdown(cancel_futures=True)
+    diffs = np.concatenate(diffs)
+    tail = (1 - confidence) / 2
+    low, high = np.quantile(diffs, [tail, 1 - tail])
+    return BootstrapResult(x.mean() - y.mean(), float(low), float(high), len(diffs))
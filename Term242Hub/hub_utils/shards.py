@@ -0,0 +1,189 @@
+"""Datasets uploaded as several CSV shards.
+
+The upload apps accept any number of CSV files, and zip or tar.gz archives of
+CSV files, as one dataset. The shards are combined in name order, so daily
+shards end up in date order.
+
+- Every shard is hashed and spilled to Parquet by `spill_csv` in a worker
+  pool. Spills are keyed by the shard's hash, so a shard parsed in an
+  earlier session (on its own, in another set of shards, or as a single
+  large file) is not parsed again.
+- The shards must have the same columns. Each column gets the widest kind
+  any shard needs (int -> float -> string), as in large file mode. A shard
+  that parsed a column which another shard makes text is spilled again with
+  that column read as text, so it keeps its exact spelling.
+- The combined dataset is one more `SpilledDataset` whose parts are the
+  shards' parts, so combining copies nothing. In memory it is read once
+  by `load_csv`; in large file mode it is read column by column.
+"""
+import hashlib
+import io
+import json
+import os
+import tarfile
+import tempfile
+import zipfile
+
+import streamlit as st
+
+from hub_utils.datastore import ShardedUpload
+from hub_utils.ingest import (
+    SPILL_DIR, SpilledDataset, prune_spills, settle_kinds, spill_csv, spill_exists, widen,
+)
+from hub_utils.pools import POOL_WORKERS, make_pool
+from hub_utils.tracing import span
+
+UPLOAD_TYPES = ["csv", "zip", "tar.gz", "tgz"]
+INGEST_WORKERS = POOL_WORKERS
+
+
+def _is_csv(name):
+    base = os.path.basename(name)
+    # Skip folders and the metadata files macOS adds to archives
+    return name.lower().endswith(".csv") and not base.startswith(".") and "__MACOSX/" not in name
+
+
+def iter_shards(uploaded_files):
+    """Yield (name, bytes) for every CSV among the uploaded files and archives."""
+    for uploaded in uploaded_files:
+        name = uploaded.name.lower()
+        if name.endswith(".zip"):
+            with zipfile.ZipFile(io.BytesIO(uploaded.getvalue())) as archive:
+                for member in archive.namelist():
+                    if _is_csv(member):
+                        yield f"{uploaded.name}/{member}", archive.read(member)
+        elif name.endswith((".tar.gz", ".tgz")):
+            with tarfile.open(fileobj=io.BytesIO(uploaded.getvalue()), mode="r:*") as archive:
+                for member in archive:
+                    if member.isfile() and _is_csv(member.name):
+                        yield f"{uploaded.name}/{member.name}", archive.extractfile(member).read()
+        else:
+            yield uploaded.name, uploaded.getvalue()
+
+
+def spill_shard(data, text_columns=()):
+    """Hash one shard and spill it, unless a spill of the same bytes exists.
+
+    `text_columns` are read as text, in a spill of their own.
+    """
+    key = hashlib.sha256(data).hexdigest()
+    if text_columns:
+        key = hashlib.sha256("\n".join([key, *text_columns]).encode()).hexdigest()
+    return key, spill_csv(io.BytesIO(data), os.path.join(SPILL_DIR, key), text_columns=text_columns)
+
+
+def combined_kinds(names, spills):
+    """Kinds of the shards' columns taken together, and the columns without values."""
+    columns = spills[0].columns
+    kinds, null_columns = {}, set()
+    for name, spill in zip(names, spills):
+        if set(spill.columns) != set(columns):
+            raise ValueError(f"Shard '{name}' has columns {spill.columns}, expected {columns}")
+        # A shard without rows has no evidence of its columns' types
+        if not spill.n_rows:
+            continue
+        for col in columns:
+            if col in spill.empty_columns:
+                null_columns.add(col)
+            else:
+                kinds[col] = widen(kinds[col], spill.kinds[col]) if col in kinds else spill.kinds[col]
+    return settle_kinds(columns, kinds, null_columns), [col for col in columns if col not in kinds]
+
+
+def text_columns(spill, kinds):
+    """Columns the shard parsed but the combined dataset reads as text."""
+    return [
+        col for col in spill.columns
+        if kinds[col] == "string" and spill.kinds[col] != "string" and col not in spill.empty_columns
+    ]
+
+
+def combine_spills(names, spills, path):
+    """One SpilledDataset over the parts of every shard, in the given order."""
+    if os.path.exists(os.path.join(path, "meta.json")):
+        return SpilledDataset(path)
+
+    kinds, empty_columns = combined_kinds(names, spills)
+    for name, spill in zip(names, spills):
+        if spill.n_rows and text_columns(spill, kinds):
+            raise ValueError(f"Shard '{name}' must be spilled again with {text_columns(spill, kinds)} as text")
+    meta = {
+        "kinds": kinds,
+        "empty_columns": empty_columns,
+        "n_rows": sum(spill.n_rows for spill in spills),
+        # Absolute paths: the parts stay in the shards' own spill directories
+        "parts": [os.path.abspath(part) for spill in spills for part in spill.parts],
+    }
+    os.makedirs(path, exist_ok=True)
+    # Written to a temporary file first, as another session may combine the same shards
+    fd, tmp_path = tempfile.mkstemp(dir=path, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(path, "meta.json"))
+    return SpilledDataset(path)
+
+
+def ingest_shards(uploaded_files, file_id):
+    os.makedirs(SPILL_DIR, exist_ok=True)
+    names, futures, size = [], [], 0
+    with make_pool("ingest", INGEST_WORKERS) as pool:
+        for name, data in iter_shards(uploaded_files):
+            # Bound the number of decompressed shards held in memory at once
+            pending = [future for future in futures if not future.done()]
+            if len(pending) >= 2 * INGEST_WORKERS:
+                pending[0].result()
+            names.append(name)
+            futures.append(pool.submit(spill_shard, data))
+            size += len(data)
+        results = [future.result() for future in futures]
+        if not results:
+            raise ValueError("The upload contains no CSV files.")
+
+        # Shards that parsed a column other shards have as text are read again
+        kinds, _ = combined_kinds(names, [spill for _, spill in results])
+        retext = {i: text_columns(spill, kinds) for i, (_, spill) in enumerate(results) if spill.n_rows}
+        retext = {i: columns for i, columns in retext.items() if columns}
+        if retext:
+            futures = {}
+            for i, (_, data) in enumerate(iter_shards(uploaded_files)):
+                if i in retext:
+                    futures[i] = pool.submit(spill_shard, data, retext[i])
+            for i, future in futures.items():
+                results[i] = (results[i][0], future.result()[1])
+
+    order = sorted(range(len(names)), key=lambda i: names[i])
+    names = [names[i] for i in order]
+    keys = [results[i][0] for i in order]
+    spills = [results[i][1] for i in order]
+    key = hashlib.sha256("\n".join(["shards"] + keys).encode()).hexdigest()
+    dataset = combine_spills(names, spills, os.path.join(SPILL_DIR, key))
+    prune_spills(keep=[dataset])
+    return ShardedUpload(file_id, f"{len(names)} CSV shards", key, dataset, names, size)
+
+
+def upload_dataset(label="Upload your dataset (CSV files, or a zip or tar.gz of CSV shards)"):
+    """File uploader for one dataset given as a CSV, several CSVs or archives of CSVs.
+
+    Returns the uploaded file for a single CSV, a `ShardedUpload` otherwise,
+    or None when nothing was uploaded or the shards could not be combined.
+    """
+    uploaded_files = st.file_uploader(label, type=UPLOAD_TYPES, accept_multiple_files=True)
+    if not uploaded_files:
+        return None
+    if len(uploaded_files) == 1 and uploaded_files[0].name.lower().endswith(".csv"):
+        return uploaded_files[0]
+
+    # Shards are hashed and spilled once per set of uploaded files in a session
+    file_id = "+".join(f.file_id for f in uploaded_files)
+    cached = st.session_state.get("_sharded_upload")
+    # Spills deleted to stay within their disk budget are parsed again
+    if cached is None or cached.file_id != file_id or not spill_exists(cached.dataset):
+        try:
+            with st.spinner("Parsing the uploaded shards..."), span("parse"):
+                cached = ingest_shards(uploaded_files, file_id)
+        except (ValueError, OSError, zipfile.BadZipFile, tarfile.TarError) as e:
+            st.error(f"Could not combine the uploaded files: {e}")
+            return None
+        st.session_state["_sharded_upload"] = cached
+    st.caption(f"{len(cached.shard_names)} CSV shards combined into one dataset of {cached.dataset.n_rows:,} rows.")
+    return cached
@@ -0,0 +1,279 @@
+"""Single-pass summary statistics for numerical columns.
+
+A `ColumnSummary` is built chunk by chunk and can be merged with summaries of
+other partitions, so a column can be summarized in parallel or straight from
+the out-of-core spill files without loading it whole. It keeps:
+
+- count, mean and variance (Welford, merged with Chan et al.'s formula),
+  plus min and max;
+- a KLL-style quantile sketch for the median and box-plot quartiles (exact
+  until the column outgrows one compactor);
+- a Misra-Gries heavy-hitters table for the mode (exact until the column
+  has more distinct values than the table has counters, approximate after).
+"""
+import numpy as np
+import pandas as pd
+
+from hub_utils.pools import POOL_WORKERS, make_pool
+from hub_utils.tracing import traced
+
+SKETCH_CAPACITY = 4096
+HEAVY_HITTERS = 64
+PARTITION_ROWS = 1_000_000
+SUMMARY_WORKERS = POOL_WORKERS
+
+
+class Moments:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        if len(values) == 0:
+            return
+        chunk = Moments()
+        chunk.count = len(values)
+        chunk.mean = float(values.mean())
+        chunk.m2 = float(((values - chunk.mean) ** 2).sum())
+        chunk.min = float(values.min())
+        chunk.max = float(values.max())
+        self.merge(chunk)
+
+    def merge(self, other):
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self):
+        # Sample standard deviation, like pandas' default ddof=1
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else float("nan")
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch in the style of KLL.
+
+    Level h holds items that each stand for 2**h values. When a level grows
+    past `capacity` it is sorted and every other item (from a random offset)
+    is promoted to the next level.
+    """
+
+    def __init__(self, capacity=SKETCH_CAPACITY, seed=0):
+        self.capacity = capacity
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        for h, items in enumerate(other.levels):
+            if h == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self._compress()
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            items = self.levels[h]
+            if len(items) > self.capacity:
+                items = np.sort(items)
+                keep = len(items) % 2
+                offset = self._rng.integers(2)
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], items[keep + offset::2]])
+                self.levels[h] = items[:keep]
+            h += 1
+
+    @property
+    def is_exact(self):
+        return len(self.levels) == 1
+
+    def items(self):
+        """Sketch items with their weights, sorted by value."""
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** h) for h, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        return values[order], weights[order]
+
+    def quantile(self, q):
+        if self.is_exact:
+            # Same linear interpolation as pandas while nothing was compacted
+            return float(np.quantile(self.levels[0], q)) if len(self.levels[0]) else float("nan")
+        values, weights = self.items()
+        cumulative = np.cumsum(weights)
+        return float(values[min(np.searchsorted(cumulative, q * cumulative[-1]), len(values) - 1)])
+
+
+class HeavyHitters:
+    """Misra-Gries frequent-items table with `size` counters.
+
+    The counts are exact until more than `size` distinct values were seen.
+    From then on every count is an underestimate, and the table only
+    guarantees to hold the values more frequent than n / size.
+    """
+
+    def __init__(self, size=HEAVY_HITTERS):
+        self.size = size
+        self.values = np.empty(0)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.is_exact = True
+
+    def update(self, values):
+        self._add(*np.unique(values, return_counts=True))
+
+    def merge(self, other):
+        self.is_exact = self.is_exact and other.is_exact
+        self._add(other.values, other.counts)
+
+    def _add(self, values, counts):
+        values, inverse = np.unique(np.concatenate([self.values, values]), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate([self.counts, counts])).astype(np.int64)
+        if len(values) > self.size:
+            # Subtracting the (size + 1)-th largest count keeps at most `size`
+            # counters and never drops an item more frequent than n / size
+            cut = np.partition(counts, len(counts) - self.size - 1)[len(counts) - self.size - 1]
+            keep = counts > cut
+            values, counts = values[keep], counts[keep] - cut
+            self.is_exact = False
+        self.values, self.counts = values, counts
+
+    def mode(self):
+        """The most frequent value while `is_exact`; afterwards a frequent value,
+        not necessarily the most frequent one."""
+        if not len(self.counts):
+            return None
+        # Ties go to the smallest value, as in pandas' Series.mode()[0]
+        return float(self.values[self.counts == self.counts.max()].min())
+
+
+class ColumnSummary:
+    def __init__(self):
+        self.moments = Moments()
+        self.sketch = QuantileSketch()
+        self.heavy = HeavyHitters()
+
+    def update(self, values):
+        values = pd.to_numeric(pd.Series(values), errors="coerce").dropna().to_numpy(dtype=float)
+        self.moments.update(values)
+        self.sketch.update(values)
+        self.heavy.update(values)
+        return self
+
+    def merge(self, other):
+        self.moments.merge(other.moments)
+        self.sketch.merge(other.sketch)
+        self.heavy.merge(other.heavy)
+        return self
+
+    @property
+    def count(self):
+        return self.moments.count
+
+    @property
+    def mean(self):
+        return self.moments.mean if self.count else float("nan")
+
+    @property
+    def std(self):
+        return self.moments.std
+
+    @property
+    def min(self):
+        return self.moments.min if self.count else float("nan")
+
+    @property
+    def max(self):
+        return self.moments.max if self.count else float("nan")
+
+    @property
+    def median(self):
+        return self.sketch.quantile(0.5)
+
+    @property
+    def mode(self):
+        """Mode as pandas reports it while `mode_is_exact`, approximate otherwise
+        (see `HeavyHitters`); `sorted_mode` gives the exact one."""
+        mode = self.heavy.mode()
+        # No value repeats often enough to be tracked: every value is equally
+        # rare, and pandas reports the smallest one
+        return self.min if mode is None else mode
+
+    @property
+    def mode_is_exact(self):
+        return self.heavy.is_exact
+
+    def box_stats(self, label=""):
+        """Box-plot statistics in the format of `Axes.bxp`."""
+        q1, med, q3 = (self.sketch.quantile(q) for q in (0.25, 0.5, 0.75))
+        low, high = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+        values, _ = self.sketch.items()
+        inside = values[(values >= low) & (values <= high)]
+        fliers = np.concatenate([values[(values < low) | (values > high)], [self.min, self.max]])
+        fliers = np.unique(fliers[(fliers < low) | (fliers > high)])
+        return {
+            "label": label, "q1": q1, "med": med, "q3": q3, "fliers": fliers,
+            "whislo": max(self.min, inside.min()) if len(inside) else q1,
+            "whishi": min(self.max, inside.max()) if len(inside) else q3,
+        }
+
+
+@traced("compute")
+def summarize_chunks(chunks, workers=SUMMARY_WORKERS):
+    """Summarize an iterable of value arrays in parallel and merge the results."""
+    total = ColumnSummary()
+    with make_pool("summary", workers) as pool:
+        pending = []
+        for chunk in chunks:
+            pending.append(pool.submit(lambda values: ColumnSummary().update(values), chunk))
+            # Bound the number of chunks held in memory at once
+            if len(pending) >= 2 * workers:
+                total.merge(pending.pop(0).result())
+        for future in pending:
+            total.merge(future.result())
+    return total
+
+
+def sorted_mode(values):
+    """Exact mode of sorted values, with ties going to the smallest value like pandas."""
+    if not len(values):
+        return float("nan")
+    starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+    runs = np.diff(np.r_[starts, len(values)])
+    return float(values[starts[np.argmax(runs)]])
+
+
+def describe_columns(df, progress=None):
+    """`df.describe()` built one column at a time, publishing each partial table."""
+    described = []
+    for i, column in enumerate(df.columns):
+        series = df[column]
+        if series.dtype == np.float32:
+            # pandas would sum a compacted float32 column in float32
+            series = series.astype(np.float64)
+        described.append(series.describe())
+        if progress:
+            progress((i + 1) / len(df.columns), f"Summarized {i + 1} of {len(df.columns)} columns",
+                     pd.concat(described, axis=1))
+    return pd.concat(described, axis=1) if described else df.describe()
+
+
+def partitions(series, rows=PARTITION_ROWS):
+    for start in range(0, len(series), rows):
+        yield series.iloc[start:start + rows]
+
+
+def summarize_series(series, partition_rows=PARTITION_ROWS):
+    return summarize_chunks(partitions(series, partition_rows))
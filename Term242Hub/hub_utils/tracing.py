@@ -0,0 +1,216 @@
+"""Per-rerun profiling spans for the hub.
+
+`main_hub.py` wraps every rerun of the selected sub-app in `trace_rerun`.
+Code running inside it opens timed spans with `span(kind)` or the `traced`
+decorator, using one of `SPAN_KINDS`. Each span records its wall time and
+the change in the process's RSS. Outside a traced rerun, or in worker
+threads, spans cost nothing.
+
+Finished reruns are kept per session for the sidebar panel, and aggregated
+per process into Prometheus-style histograms. The histograms can be
+exported to a text file (HUB_METRICS_PROM) and every rerun appended to a
+JSON-lines log (HUB_TRACE_LOG).
+"""
+import contextvars
+import functools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+SPAN_KINDS = ["load", "parse", "compute", "render", "emit"]
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RECENT_RERUNS = 20
+METRICS_PROM = os.environ.get("HUB_METRICS_PROM")
+TRACE_LOG = os.environ.get("HUB_TRACE_LOG")
+
+_current_trace = contextvars.ContextVar("hub_trace", default=None)
+
+
+def rss_mb():
+    """Current resident set size in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+class Trace:
+    def __init__(self, app):
+        self.app = app
+        self.started = time.time()
+        # (kind, seconds, rss delta in MB, depth, counted in the totals)
+        self.spans = []
+        self.total_s = None
+        self.rss_delta_mb = None
+        self._stack = []
+        self._start = time.perf_counter()
+        self._rss = rss_mb()
+
+    def finish(self):
+        self.total_s = time.perf_counter() - self._start
+        self.rss_delta_mb = rss_mb() - self._rss
+
+    def totals(self):
+        """Seconds per span kind, with an 'other' bucket for untraced time.
+
+        A span nested in a span of the same kind is not counted twice.
+        """
+        totals = dict.fromkeys(SPAN_KINDS, 0.0)
+        for kind, seconds, _, _, counted in self.spans:
+            if counted:
+                totals[kind] = totals.get(kind, 0.0) + seconds
+        top_level = sum(seconds for _, seconds, _, depth, _ in self.spans if depth == 0)
+        totals["other"] = max((self.total_s or 0.0) - top_level, 0.0)
+        return totals
+
+    def as_record(self):
+        return {
+            "app": self.app,
+            "started": self.started,
+            "total_s": self.total_s,
+            "rss_delta_mb": self.rss_delta_mb,
+            "totals": self.totals(),
+            "spans": [
+                {"kind": kind, "seconds": seconds, "rss_delta_mb": rss_delta, "depth": depth}
+                for kind, seconds, rss_delta, depth, _ in self.spans
+            ],
+        }
+
+
+@contextmanager
+def span(kind):
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    counted = kind not in trace._stack
+    depth = len(trace._stack)
+    trace._stack.append(kind)
+    start, rss_start = time.perf_counter(), rss_mb()
+    try:
+        yield
+    finally:
+        trace._stack.pop()
+        trace.spans.append((kind, time.perf_counter() - start, rss_mb() - rss_start, depth, counted))
+
+
+def traced(kind):
+    """Decorator running the whole function inside `span(kind)`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class Histogram:
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class Metrics:
+    """Span-duration histograms for every rerun in this server process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # (app, kind) -> Histogram
+
+    def record(self, trace):
+        with self._lock:
+            for kind, seconds in list(trace.totals().items()) + [("total", trace.total_s)]:
+                self._histograms.setdefault((trace.app, kind), Histogram()).observe(seconds)
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP hub_span_seconds Time per rerun spent in each kind of span.",
+            "# TYPE hub_span_seconds histogram",
+        ]
+        with self._lock:
+            for (app, kind), hist in sorted(self._histograms.items()):
+                labels = f'app="{app}",kind="{kind}"'
+                for bound, count in zip(hist.buckets, hist.counts):
+                    lines.append(f'hub_span_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'hub_span_seconds_bucket{{{labels},le="+Inf"}} {hist.count}')
+                lines.append(f"hub_span_seconds_sum{{{labels}}} {hist.sum:.6f}")
+                lines.append(f"hub_span_seconds_count{{{labels}}} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # Written to a temporary file first so scrapers never see half a file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+
+@st.cache_resource
+def get_metrics():
+    return Metrics()
+
+
+_log_lock = threading.Lock()
+
+
+def append_trace_log(path, trace):
+    with _log_lock, open(path, "a") as f:
+        f.write(json.dumps(trace.as_record()) + "\n")
+
+
+@contextmanager
+def trace_rerun(app):
+    """Trace one rerun of `app` and record it once it ends, however it ends."""
+    trace = Trace(app)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        trace.finish()
+        st.session_state.setdefault("_hub_traces", deque(maxlen=RECENT_RERUNS)).append(trace)
+        get_metrics().record(trace)
+        try:
+            if METRICS_PROM:
+                get_metrics().write_prometheus(METRICS_PROM)
+            if TRACE_LOG:
+                append_trace_log(TRACE_LOG, trace)
+        except OSError:
+            # Exporting is best effort and must never break the page
+            pass
+
+
+def recent_reruns_table():
+    rows = []
+    for trace in reversed(st.session_state.get("_hub_traces", [])):
+        row = {"App": os.path.basename(trace.app), "Total (s)": trace.total_s}
+        row.update({f"{kind} (s)": seconds for kind, seconds in trace.totals().items()})
+        row["RSS Δ (MB)"] = trace.rss_delta_mb
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def metrics_panel():
+    if st.sidebar.checkbox("Show performance metrics", key="_hub_metrics_panel"):
+        st.sidebar.write(f"Last {RECENT_RERUNS} reruns, newest first:")
+        st.sidebar.dataframe(recent_reruns_table().round(3), hide_index=True)
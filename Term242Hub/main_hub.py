@@ -1,6 +1,14 @@
 import streamlit as st
 import os
-import importlib.util
+import sys
+
+# Make the shared helpers (hub_utils) importable from every sub-app
+HUB_DIR = os.path.dirname(os.path.abspath(__file__))
+if HUB_DIR not in sys.path:
+    sys.path.insert(0, HUB_DIR)
+
+from hub_utils.registry import AppRegistry, start_warmup
+from hub_utils.tracing import metrics_panel, trace_rerun
 
 st.title("ISE 291 Term 242 Section F22 Streamlit Hub")
 st.markdown("Welcome to the class's Streamlit Hub! Use the sidebar to navigate.")
@@ -8,21 +16,39 @@ st.markdown("Welcome to the class's Streamlit Hub! Use the sidebar to navigate."
 # Absolute path to the 'apps' folder
 APPS_DIR = "Term242Hub/apps"
 
+
+# Built once per server process and shared by all sessions
+@st.cache_resource
+def get_registry():
+    return AppRegistry(APPS_DIR)
+
+
+# Import the heavy libraries in the background while the first page renders
+@st.cache_resource
+def warmup():
+    return start_warmup()
+
+
+registry = get_registry()
+warmup()
+
 # Sidebar Navigation
 st.sidebar.title("Navigation")
 
 # List topics (subfolders in 'apps')
-topics = [f for f in os.listdir(APPS_DIR) if os.path.isdir(os.path.join(APPS_DIR, f))]
+topics = registry.topics()
 topic = st.sidebar.selectbox("Choose a Topic", topics)
 
 # List sub-apps in the selected topic folder
 topic_path = os.path.join(APPS_DIR, topic)
-sub_apps = [f for f in os.listdir(topic_path) if f.endswith(".py")]
+sub_apps = registry.sub_apps(topic)
 
 sub_app = st.sidebar.selectbox("Choose a Sub-App", sub_apps)
 
-# Load and Run the Selected Sub-App
+# Load and Run the Selected Sub-App, timing where the rerun goes
 app_path = os.path.join(topic_path, sub_app)
-spec = importlib.util.spec_from_file_location("sub_app", app_path)
-sub_app_module = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(sub_app_module)
+try:
+    with trace_rerun(app_path):
+        sub_app_module = registry.run(app_path)
+finally:
+    metrics_panel()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The apps import `hub_utils` from the Term242Hub directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
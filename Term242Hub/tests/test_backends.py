@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from hub_utils import backends
+from hub_utils.backends import DuckDBBackend, PandasBackend, PolarsBackend, QueryBackend
+from hub_utils.filters import Condition, FilterEngine, build_tree
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    n = 500
+    price = rng.normal(10, 3, n)
+    price[rng.random(n) < 0.1] = np.nan
+    city = rng.choice(np.array(["Oslo", "Lima", "Pune"], dtype=object), n)
+    city[rng.random(n) < 0.1] = None
+    return pd.DataFrame({
+        "price": price,
+        "qty": rng.integers(0, 5, n),
+        # Neighbouring integers that float64 cannot tell apart
+        "big": 2 ** 53 + rng.integers(0, 3, n),
+        "small": rng.integers(0, 5, n).astype(np.float32),
+        "city": pd.Series(city, dtype="str"),
+        "grade": pd.Categorical(rng.choice(["a", "b", "c"], n), categories=["a", "b", "c", "d"]),
+    })
+
+
+def make_backend(name, df):
+    if name == "pandas":
+        return PandasBackend(df, FilterEngine(df))
+    pytest.importorskip(name)
+    return {"duckdb": DuckDBBackend, "polars": PolarsBackend}[name](df)
+
+
+TREES = [
+    build_tree([Condition("price", ">", 10.0)], []),
+    build_tree([Condition("price", "!=", 10.0)], []),
+    build_tree([Condition("city", "!=", "Oslo")], []),
+    build_tree([Condition("city", "=", ("Oslo", "Pune"))], []),
+    # Picked integers, typed floats, and a value no integer equals
+    build_tree([Condition("qty", "=", (1, 2.0, 2.5))], []),
+    build_tree([Condition("small", "=", (1, 3.0))], []),
+    build_tree([Condition("big", "=", (2 ** 53 + 1,))], []),
+    build_tree([Condition("grade", "=", ("b",))], []),
+    build_tree([Condition("qty", ">=", 2.0), Condition("price", "<", 9.0), Condition("city", "!=", "Lima")],
+               ["AND", "OR"]),
+]
+
+
+@pytest.mark.parametrize("name", ["duckdb", "polars"])
+@pytest.mark.parametrize("tree", TREES)
+def test_backends_agree_with_pandas(name, tree, df):
+    expected, backend = make_backend("pandas", df), make_backend(name, df)
+    np.testing.assert_array_equal(backend.positions(tree), expected.positions(tree))
+
+    columns = ["price", "qty", "small"]
+    pd.testing.assert_frame_equal(backend.describe(tree, columns), expected.describe(tree, columns),
+                                  check_dtype=False, rtol=1e-9)
+    for column in ["city", "qty", "grade"]:
+        pd.testing.assert_series_equal(backend.value_counts(tree, column), expected.value_counts(tree, column))
+
+
+def test_pandas_masks_match_direct_comparisons(df):
+    backend = make_backend("pandas", df)
+    tree = build_tree([Condition("price", "!=", 10.0), Condition("city", "=", ("Lima",))], ["AND"])
+    mask = (df["price"] != 10.0) & df["city"].isin(["Lima"])
+    np.testing.assert_array_equal(backend.positions(tree), np.flatnonzero(mask))
+    assert backend.positions(build_tree([], [])) is None
+
+
+def test_query_backend_is_abstract():
+    with pytest.raises(TypeError):
+        QueryBackend(pd.DataFrame())
+
+    class Partial(QueryBackend):
+        def positions(self, tree):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial(pd.DataFrame())
+    assert "pandas" in backends.available_backends()
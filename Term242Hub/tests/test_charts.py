@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib.cbook import boxplot_stats
+
+from hub_utils.charts import PLOT_BINS, box_stats, counts_table, plot_chart
+from hub_utils.render import PlotSpec
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    n = 2000
+    price = rng.normal(10, 3, n)
+    price[rng.random(n) < 0.05] = np.nan
+    return pd.DataFrame({
+        "price": price,
+        "qty": rng.integers(0, 6, n),
+        "city": pd.Series(rng.choice(["Oslo", "Lima", "Pune", None], n), dtype="str"),
+        "grade": pd.Categorical(rng.choice(["b", "a"], n), categories=["c", "b", "a"]),
+    })
+
+
+def test_histogram_counts_match_numpy(df):
+    table, _ = plot_chart(df, PlotSpec("Histogram", "price", None, None))
+    values = df["price"].dropna().to_numpy()
+    counts, edges = np.histogram(values, bins=PLOT_BINS)
+    np.testing.assert_array_equal(table["count"], counts)
+    np.testing.assert_allclose(table["start"], edges[:-1])
+    np.testing.assert_allclose(table["end"], edges[1:])
+
+
+def test_histogram_with_hue_splits_the_counts(df):
+    table, spec = plot_chart(df, PlotSpec("Histogram", "price", None, "city"))
+    edges = np.histogram_bin_edges(df["price"].dropna(), bins=PLOT_BINS)
+    for city, group in table.groupby("hue"):
+        counts, _ = np.histogram(df.loc[df["city"] == city, "price"].dropna(), bins=edges)
+        np.testing.assert_array_equal(group["count"], counts)
+    assert spec["encoding"]["color"]["field"] == "hue"
+
+
+def test_countplot_orders_levels_like_seaborn(df):
+    table, _ = plot_chart(df, PlotSpec("Countplot", "qty", None, None))
+    # Numbers sorted, counts as value_counts gives them
+    assert table["value"].tolist() == [str(v) for v in range(6)]
+    np.testing.assert_array_equal(table["count"], df["qty"].value_counts().sort_index())
+
+    table, _ = plot_chart(df, PlotSpec("Countplot", "grade", None, None))
+    assert table["value"].tolist() == ["c", "b", "a"]
+    assert table["count"].tolist() == [0, *df["grade"].value_counts()[["b", "a"]]]
+
+
+def test_countplot_with_hue_matches_crosstab(df):
+    table, _ = plot_chart(df, PlotSpec("Countplot", "qty", None, "grade"))
+    # Hue levels go from most to least frequent; unused categories count zero
+    levels = df["grade"].value_counts().index.astype(str).tolist()
+    expected = pd.crosstab(df["qty"], df["grade"].astype(str)).reindex(columns=levels, fill_value=0)
+    assert table["hue"].unique().tolist() == levels
+    for row in table.itertuples():
+        assert row.count == expected.loc[int(row.value), row.hue]
+
+
+def test_box_stats_match_matplotlib(df):
+    values = df["price"].to_numpy()
+    box = box_stats(values, "price")
+    expected = boxplot_stats(values[~np.isnan(values)])[0]
+    for field in ("q1", "med", "q3", "whislo", "whishi"):
+        assert box[field] == pytest.approx(expected[field])
+    np.testing.assert_array_equal(np.sort(box["fliers"]), np.sort(expected["fliers"]))
+    assert box_stats([np.nan]) is None
+
+
+def test_box_plot_has_one_box_per_text_level(df):
+    _, spec = plot_chart(df, PlotSpec("Boxplot", "price", None, "city"))
+    boxes = spec["layer"][1]["data"]["values"]
+    assert [box["group"] for box in boxes] == df["city"].dropna().unique().tolist()
+    for box in boxes:
+        prices = df.loc[df["city"] == box["group"], "price"].dropna()
+        assert box["med"] == pytest.approx(prices.median())
+
+
+def test_plots_without_a_native_chart_fall_back(df):
+    assert plot_chart(df, PlotSpec("Scatterplot", "price", "qty", None)) is None
+    assert plot_chart(df, PlotSpec("Boxplot", "price", None, "qty")) is None
+
+
+def test_counts_table_keeps_the_order():
+    counts = pd.Series([5, 3, 1], index=["z", "a", "m"])
+    table = counts_table(counts)
+    assert table["value"].tolist() == ["z", "a", "m"] and table["rank"].tolist() == [0, 1, 2]
@@ -0,0 +1,40 @@
+import gc
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from hub_utils.backends import available_backends, get_backend
+from hub_utils.datastore import DatasetStore
+from hub_utils.filters import Condition, build_tree, get_engine
+from hub_utils.profile import frame_profile
+
+
+def frame(seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"a": rng.normal(size=10_000), "b": rng.integers(0, 9, 10_000)})
+
+
+def test_evicted_frames_are_released(request):
+    store = DatasetStore(budget_bytes=350_000)
+    refs = []
+    for i in range(4):
+        key = f"{request.node.name}-{i}"
+        df = store.get_or_load(key, lambda: frame(i))
+        frame_profile(key, df).stats("b")
+        get_engine(key, df).condition_mask(Condition("b", ">", 4))
+        for name in available_backends():
+            get_backend(name, key, df).value_counts(build_tree([Condition("b", ">", 4)], []), "b")
+        refs.append(weakref.ref(df))
+        del df
+    gc.collect()
+    # Two 160 kB frames fit in the budget; the cached helpers do not keep the others alive
+    assert [ref() is None for ref in refs] == [True, True, False, False]
+    assert store.resident_bytes() <= store.budget_bytes
+
+
+def test_evict_keeps_the_newest_frame():
+    store = DatasetStore(budget_bytes=1)
+    store.put("a", frame(0))
+    store.put("b", frame(1))
+    assert store.get("a") is None and store.get("b") is not None
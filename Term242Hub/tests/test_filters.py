@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from hub_utils.filters import Condition, FilterEngine, build_tree
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    n = 1000
+    price = rng.normal(10, 3, n).round(1)
+    price[rng.random(n) < 0.1] = np.nan
+    return pd.DataFrame({
+        "price": price,
+        "qty": rng.integers(0, 10, n),
+        "city": pd.Series(rng.choice(["Oslo", "Lima", "Pune", None], n), dtype="str"),
+        "grade": pd.Categorical(rng.choice(["a", "b", "c"], n)),
+    })
+
+
+# (conditions, logic operators, equivalent df.query string)
+CASES = [
+    ([Condition("price", ">", 10.0)], [], "price > 10.0"),
+    ([Condition("price", "<=", 10.0)], [], "price <= 10.0"),
+    ([Condition("price", "!=", 10.0)], [], "price != 10.0"),
+    ([Condition("qty", ">=", 3)], [], "qty >= 3"),
+    ([Condition("qty", "=", (1, 2, 7))], [], "qty in [1, 2, 7]"),
+    ([Condition("city", "=", ("Oslo",))], [], "city == 'Oslo'"),
+    ([Condition("city", "!=", "Oslo")], [], "city != 'Oslo'"),
+    ([Condition("grade", "=", ("a", "c"))], [], "grade in ['a', 'c']"),
+    # AND binds tighter than OR, as in df.query
+    ([Condition("qty", ">", 5), Condition("price", "<", 9.0), Condition("city", "=", ("Lima",))],
+     ["AND", "OR"], "qty > 5 and price < 9.0 or city == 'Lima'"),
+    ([Condition("qty", ">", 5), Condition("price", "<", 9.0), Condition("city", "=", ("Lima",))],
+     ["OR", "AND"], "qty > 5 or price < 9.0 and city == 'Lima'"),
+]
+
+
+@pytest.mark.parametrize("conditions, logic, query", CASES)
+def test_engine_matches_query(df, conditions, logic, query):
+    mask = FilterEngine(df).evaluate(build_tree(conditions, logic))
+    expected = df.eval(query).to_numpy(dtype=bool)
+    np.testing.assert_array_equal(mask, expected)
+
+
+def test_masks_are_cached_and_reused(df):
+    engine = FilterEngine(df)
+    first = build_tree([Condition("qty", ">", 5)], [])
+    engine.evaluate(first)
+    cached = engine.condition_mask(Condition("qty", ">", 5))
+    both = build_tree([Condition("qty", ">", 5), Condition("price", "<", 9.0)], ["AND"])
+    np.testing.assert_array_equal(engine.evaluate(both), cached & (df["price"] < 9.0).to_numpy())
+    assert engine.condition_mask(Condition("qty", ">", 5)) is cached
+
+
+def test_blank_conditions_are_skipped():
+    a, b = Condition("qty", ">", 5), Condition("price", "<", 9.0)
+    # The OR after the blank condition goes with it
+    assert build_tree([a, None, b], ["AND", "OR"]) == ("OR", [("AND", [a, b])])
+    assert build_tree([None, None], ["AND"]) == ("OR", [])
+    assert FilterEngine(pd.DataFrame({"qty": [1]})).evaluate(build_tree([None], [])) is None
+
+
+def test_typed_values_take_the_column_type(df):
+    engine = FilterEngine(df)
+    assert engine.parse_condition(Condition("price", ">", "9.5")) == Condition("price", ">", 9.5)
+    assert engine.parse_condition(Condition("qty", "=", ("3", 4))) == Condition("qty", "=", (3.0, 4))
+    assert engine.parse_condition(Condition("city", "=", ("Oslo",))) == Condition("city", "=", ("Oslo",))
+    with pytest.raises(ValueError):
+        engine.parse_condition(Condition("price", ">", "cheap"))
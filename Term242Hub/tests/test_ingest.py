@@ -0,0 +1,73 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from hub_utils import ingest, shards
+from hub_utils.ingest import spill_csv
+
+# Every column changes type after the first chunks of three rows
+CSV = """code,flag,qty,price,mixed,empty,note
+00123,True,1,1.50,True,,a
+00124,False,2,2.25,False,,b
+00125,True,3,3.00,,,
+00126,,4,4.75,1,,d
+A0456,False,,5.00,0,,e
+00127,True,6,x,1,,f
+00128,False,7,7.50,1,,g
+"""
+
+
+def values(series):
+    # Missing values come back as None or NaN depending on the type
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def assert_same_as_read_csv(dataset, text):
+    expected = pd.read_csv(io.StringIO(text))
+    result = dataset.read()
+    assert list(result.columns) == list(expected.columns)
+    for col in expected.columns:
+        assert values(result[col]) == values(expected[col]), col
+
+
+def test_spill_reads_back_like_read_csv(tmp_path):
+    dataset = spill_csv(io.BytesIO(CSV.encode()), str(tmp_path / "spill"), chunk_rows=3)
+    assert dataset.kinds == {
+        "code": "string", "flag": "bool", "qty": "float", "price": "string",
+        "mixed": "string", "empty": "float", "note": "string",
+    }
+    assert dataset.empty_columns == ["empty"]
+    assert len(dataset.parts) == 3
+    assert_same_as_read_csv(dataset, CSV)
+    # Text keeps its exact spelling
+    assert dataset.read(["code"])["code"].tolist()[:2] == ["00123", "00124"]
+    assert dataset.read(["mixed"])["mixed"].tolist()[:2] == ["True", "False"]
+
+
+def test_spill_of_numbers_only_is_parsed_once(tmp_path):
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({"a": rng.integers(0, 100, 50), "b": rng.normal(size=50)})
+    text = frame.to_csv(index=False)
+    dataset = spill_csv(io.BytesIO(text.encode()), str(tmp_path / "spill"), chunk_rows=7)
+    assert dataset.kinds == {"a": "int", "b": "float"}
+    pd.testing.assert_frame_equal(dataset.read(), pd.read_csv(io.StringIO(text)))
+
+
+class Upload:
+    def __init__(self, name, text):
+        self.name, self.data = name, text.encode()
+
+    def getvalue(self):
+        return self.data
+
+
+def test_shards_read_back_like_their_concatenation(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "SPILL_DIR", str(tmp_path))
+    monkeypatch.setattr(shards, "SPILL_DIR", str(tmp_path))
+    first = "code,flag,qty\n00123,True,1\n00124,False,2\n"
+    second = "code,flag,qty\nA0456,1,\n00125,0,4\n"
+    upload = shards.ingest_shards([Upload("b.csv", second), Upload("a.csv", first)], "id")
+    assert upload.dataset.kinds == {"code": "string", "flag": "string", "qty": "float"}
+    # The first shard keeps its leading zeros although it was parsed as numbers on its own
+    assert_same_as_read_csv(upload.dataset, first + second.split("\n", 1)[1])
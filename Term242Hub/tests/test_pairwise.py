@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from hub_utils.pairwise import adjust_matrix, adjust_pvalues, all_pairs_tests
+
+
+def holm_reference(p_values):
+    m = len(p_values)
+    order = np.argsort(p_values)
+    adjusted = np.empty(m)
+    running = 0.0
+    for rank, i in enumerate(order):
+        running = max(running, (m - rank) * p_values[i])
+        adjusted[i] = min(running, 1.0)
+    return adjusted
+
+
+def test_benjamini_hochberg_matches_scipy():
+    p = np.random.default_rng(0).uniform(size=50) ** 3
+    np.testing.assert_allclose(adjust_pvalues(p, "Benjamini-Hochberg"), stats.false_discovery_control(p))
+
+
+def test_holm_matches_reference():
+    p = np.random.default_rng(1).uniform(size=50) ** 3
+    np.testing.assert_allclose(adjust_pvalues(p, "Holm"), holm_reference(p))
+
+
+@pytest.mark.parametrize("method", ["Holm", "Benjamini-Hochberg"])
+def test_missing_pvalues_stay_missing_and_are_not_counted(method):
+    p = np.array([0.01, np.nan, 0.04, 0.03])
+    adjusted = adjust_pvalues(p, method)
+    assert np.isnan(adjusted[1])
+    np.testing.assert_allclose(adjusted[[0, 2, 3]], adjust_pvalues(p[[0, 2, 3]], method))
+
+
+def test_holm_with_missing_pvalue():
+    np.testing.assert_allclose(adjust_pvalues([0.01, np.nan, 0.04, 0.03], "Holm")[[0, 2, 3]], [0.03, 0.06, 0.06])
+
+
+def test_all_missing_and_none():
+    assert np.isnan(adjust_pvalues([np.nan, np.nan], "Holm")).all()
+    np.testing.assert_array_equal(adjust_pvalues([0.2, 0.01], "None"), [0.2, 0.01])
+
+
+def test_all_pairs_match_scipy():
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame({
+        "a": rng.normal(0, 1, 300),
+        "b": rng.normal(0.2, 2, 250).tolist() + [np.nan] * 50,
+        "c": rng.integers(0, 5, 300).astype(float),  # many ties
+        "constant": np.ones(300),
+    })
+    columns = tuple(df.columns)
+    for equal_var in (False, True):
+        t_stat, t_p, u_stat, u_p = all_pairs_tests(lambda cols: df[list(cols)], columns, equal_var)
+        for a in ("a", "b", "c"):
+            for b in ("a", "b", "c"):
+                if a == b:
+                    continue
+                x, y = df[a].dropna(), df[b].dropna()
+                t = stats.ttest_ind(x, y, equal_var=equal_var)
+                assert t_stat.loc[a, b] == pytest.approx(t.statistic)
+                assert t_p.loc[a, b] == pytest.approx(t.pvalue)
+                u = stats.mannwhitneyu(x, y, method="asymptotic")
+                assert u_stat.loc[a, b] == pytest.approx(u.statistic)
+                assert u_p.loc[a, b] == pytest.approx(u.pvalue)
+
+
+def test_constant_column_does_not_wipe_adjusted_table():
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({"a": rng.normal(0, 1, 100), "b": rng.normal(1, 1, 100), "single": [1.0] + [np.nan] * 99})
+    _, t_p, _, _ = all_pairs_tests(lambda cols: df[list(cols)], tuple(df.columns))
+    assert np.isnan(t_p.loc["a", "single"])
+    adjusted = adjust_matrix(t_p, "Benjamini-Hochberg")
+    assert np.isfinite(adjusted.loc["a", "b"])
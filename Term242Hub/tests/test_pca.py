@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+from sklearn.decomposition import PCA, IncrementalPCA
+from sklearn.preprocessing import StandardScaler
+
+from hub_utils import pca
+from hub_utils.pca import choose_solver, fit_in_memory, fit_sparse, fit_streaming, ratings_matrix
+
+COLUMNS = list("abcdef")
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    latent = rng.normal(size=(3000, 2))
+    values = latent @ rng.normal(size=(2, 6)) + 0.3 * rng.normal(size=(3000, 6))
+    frame = pd.DataFrame(values * [1, 10, 100, 1, 5, 2], columns=COLUMNS)
+    frame.iloc[::97, 2] = np.nan
+    return frame
+
+
+def reference(df, n_components):
+    X = StandardScaler().fit_transform(df[COLUMNS].dropna())
+    return X, PCA(n_components, svd_solver="full").fit(X)
+
+
+def assert_same_components(model, expected, atol=1e-8):
+    # Components are defined up to their sign
+    signs = np.sign(np.sum(model.components_ * expected.components_, axis=1))[:, None]
+    np.testing.assert_allclose(model.components_ * signs, expected.components_, atol=atol)
+
+
+def test_full_svd_matches_sklearn(df):
+    X, expected = reference(df, 3)
+    result = fit_in_memory(df, COLUMNS, 3)
+    assert result.n_rows == len(X)
+    np.testing.assert_allclose(result.model.explained_variance_, expected.explained_variance_)
+    assert_same_components(result.model, expected)
+
+
+def test_randomized_svd_finds_the_same_components(df):
+    _, expected = reference(df, 2)
+    result = fit_in_memory(df, COLUMNS, 2, solver="Randomized SVD")
+    np.testing.assert_allclose(result.model.explained_variance_ratio_, expected.explained_variance_ratio_, rtol=1e-6)
+    assert_same_components(result.model, expected, atol=1e-6)
+
+
+def test_incremental_matches_incremental_pca_fit(df, monkeypatch):
+    monkeypatch.setattr(pca, "INCREMENTAL_BATCH_ROWS", 700)
+    X, _ = reference(df, 3)
+    fractions = []
+    result = fit_in_memory(df, COLUMNS, 3, solver="Incremental", progress=lambda f, m: fractions.append(f))
+    expected = IncrementalPCA(3, batch_size=700).fit(X)
+    np.testing.assert_allclose(result.model.components_, expected.components_)
+    # One report per batch, so a cancelled fit stops between batches
+    assert len(fractions) >= 2 + len(X) // 700 and fractions == sorted(fractions)
+
+
+def test_cancelled_fit_stops_between_steps(df):
+    class Cancelled(Exception):
+        pass
+
+    def progress(fraction, message):
+        if fraction > 0:
+            raise Cancelled()
+
+    with pytest.raises(Cancelled):
+        fit_in_memory(df, COLUMNS, 2, progress=progress)
+
+
+def test_streaming_matches_partial_fits_over_the_chunks(df):
+    chunks = [df.iloc[start:start + 500] for start in range(0, len(df), 500)]
+    result = fit_streaming(lambda: iter(chunks), COLUMNS, 3, len(df))
+
+    scaler = StandardScaler().fit(df[COLUMNS].dropna())
+    expected = IncrementalPCA(3)
+    for chunk in chunks:
+        expected.partial_fit(scaler.transform(chunk[COLUMNS].dropna()))
+    np.testing.assert_allclose(result.model.components_, expected.components_, atol=1e-8)
+    assert result.n_rows == len(df[COLUMNS].dropna())
+    # Fewer rows than the projection sample: every complete row is projected
+    assert len(result.scores) == result.n_rows
+
+    # The streamed fit is close to the exact one on this low-rank data
+    _, exact = reference(df, 3)
+    np.testing.assert_allclose(result.model.explained_variance_ratio_, exact.explained_variance_ratio_, rtol=0.02)
+
+
+def test_sparse_centered_pca_matches_dense_pca():
+    rng = np.random.default_rng(1)
+    matrix = sp.random(300, 40, density=0.1, random_state=rng, format="csr")
+    result = fit_sparse(matrix, 3)
+    expected = PCA(3, svd_solver="full").fit(matrix.toarray())
+    np.testing.assert_allclose(result.model.explained_variance_, expected.explained_variance_, rtol=1e-6)
+
+
+def test_ratings_matrix_keeps_the_last_rating():
+    triplets = pd.DataFrame({"user": [2, 1, 1, 2], "item": ["x", "y", "x", "x"], "rating": [1, 4, 5, 3]})
+    ratings = ratings_matrix(triplets, "user", "item", "rating")
+    assert list(ratings.users) == [1, 2] and list(ratings.items) == ["x", "y"]
+    np.testing.assert_array_equal(ratings.matrix.toarray(), [[5, 4], [3, 0]])
+
+
+def test_choose_solver():
+    assert choose_solver(10_000, 10, 3) == "Full SVD"
+    assert choose_solver(10_000, 500, 10) == "Randomized SVD"
+    assert choose_solver(10_000, 500, 10, streamed=True) == "Incremental"
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib.cbook import boxplot_stats
+
+from hub_utils.summary import (
+    HeavyHitters, QuantileSketch, describe_columns, sorted_mode, summarize_series,
+)
+
+
+@pytest.fixture
+def values():
+    rng = np.random.default_rng(0)
+    # Offset far from zero, where a naive sum of squares loses the variance
+    return pd.Series(np.r_[1e6 + rng.normal(0, 1, 20_000), [np.nan] * 50])
+
+
+def test_merged_moments_match_pandas(values):
+    summary = summarize_series(values, partition_rows=3_000)
+    assert summary.count == values.count()
+    assert summary.mean == pytest.approx(values.mean(), rel=1e-12)
+    assert summary.std == pytest.approx(values.std(), rel=1e-9)
+    assert (summary.min, summary.max) == (values.min(), values.max())
+
+
+def test_small_column_matches_pandas_exactly():
+    series = pd.Series([3.0, 1.0, 2.0, 2.0, np.nan, 5.0, 1.0, 2.0])
+    summary = summarize_series(series, partition_rows=3)
+    assert summary.sketch.is_exact and summary.mode_is_exact
+    assert summary.median == series.median()
+    assert summary.mode == series.mode()[0]
+    for q in (0.25, 0.75):
+        assert summary.sketch.quantile(q) == series.quantile(q)
+
+
+def test_box_stats_match_matplotlib():
+    series = pd.Series(np.r_[np.random.default_rng(1).normal(0, 1, 1000), [8.0, -9.0]])
+    expected = boxplot_stats(series.to_numpy())[0]
+    box = summarize_series(series).box_stats()
+    for field in ("q1", "med", "q3", "whislo", "whishi"):
+        assert box[field] == pytest.approx(expected[field])
+    np.testing.assert_array_equal(box["fliers"], np.unique(expected["fliers"]))
+
+
+def test_sketch_rank_error_is_bounded():
+    values = np.random.default_rng(2).exponential(size=200_000)
+    sketch = QuantileSketch(capacity=1024)
+    for chunk in np.array_split(values, 7):
+        part = QuantileSketch(capacity=1024)
+        part.update(chunk)
+        sketch.merge(part)
+    assert not sketch.is_exact
+    ordered = np.sort(values)
+    for q in (0.01, 0.25, 0.5, 0.75, 0.99):
+        rank = np.searchsorted(ordered, sketch.quantile(q)) / len(values)
+        assert abs(rank - q) < 0.01
+
+
+def test_heavy_hitters_keep_frequent_values():
+    rng = np.random.default_rng(3)
+    values = np.r_[rng.integers(0, 100_000, 50_000), np.full(2_000, 7), np.full(1_500, 11)].astype(float)
+    rng.shuffle(values)
+    table = HeavyHitters(size=64)
+    for chunk in np.array_split(values, 10):
+        part = HeavyHitters(size=64)
+        part.update(chunk)
+        table.merge(part)
+    assert not table.is_exact
+    # Misra-Gries keeps every value more frequent than n / size, with an underestimated count
+    n = len(values)
+    counts = pd.Series(values).value_counts()
+    tracked = dict(zip(table.values, table.counts))
+    for value, count in counts[counts > n / table.size].items():
+        assert value in tracked and count - n / table.size <= tracked[value] <= count
+
+
+def test_sorted_mode_matches_pandas():
+    rng = np.random.default_rng(4)
+    for _ in range(20):
+        series = pd.Series(rng.integers(0, 30, 200).astype(float))
+        assert sorted_mode(np.sort(series.to_numpy())) == series.mode()[0]
+    assert np.isnan(sorted_mode(np.empty(0)))
+
+
+def test_describe_columns_sums_float32_in_float64():
+    rng = np.random.default_rng(5)
+    wide = pd.DataFrame({"a": rng.normal(1e4, 1, 100_000).astype(np.float32), "b": rng.integers(0, 9, 100_000)})
+    expected = wide.astype(np.float64).describe()
+    pd.testing.assert_frame_equal(describe_columns(wide), expected, rtol=1e-12)